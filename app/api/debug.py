@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+from app.core.config import settings
+from app.core.loop_monitor import monitor
+
+router = APIRouter()
+
+@router.get("/debug/event-loop")
+async def event_loop_status():
+    """
+    Event-loop health: recent lag samples and the latest callbacks that blocked the
+    loop, with the endpoint, tenant fingerprint, trace id and stack that caused them.
+    Served only when DEBUG_ENDPOINTS_ENABLED is set.
+    """
+    if not settings.DEBUG_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return monitor.snapshot()
@@ -1,20 +1,101 @@
-from fastapi import APIRouter, HTTPException, Body, Header
-from app.schemas.explanation import ExplainRequest, ExplainResponse
-from app.core.ai import generate_explanation
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from app.schemas.explanation import ExplainRequest, ExplainResponse, ExplainBatchRequest, ExplainBatchItem
+from app.schemas.audit import AuditLogEntry, AuditStatus
+from app.core.ai import generate_explanation, explain_batch
+from app.core.audit import audit_repo
+from app.core.explanation_cache import explanation_cache
+from app.core.rule_explanations import rule_explanation
+from app.core.scheduler import scheduler
+from app.core.snapshots import tenant_dataset
+import hashlib
 
 router = APIRouter()
 
 @router.post("/explain-mismatch", response_model=ExplainResponse)
 async def explain_mismatch(
     request: ExplainRequest = Body(...),
-    x_tenant_id: str = Header(..., alias="X-Tenant-ID")
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    narrative: bool = Query(False, description="Ask the LLM for a richer narrative instead of the precomputed explanation")
 ):
     """
-    Generate an AI-powered explanation for a reconciliation mismatch.
+    Explain a reconciliation mismatch.
+    By default this answers instantly from the rule-based explanation precomputed at
+    ingestion; `narrative=true` escalates to the AI explanation service.
     This is a read-only operation and does not alter the invoice status.
     """
     # Guardrail: If status is MATCHED, explanation might be redundant but strictly allowed if requested.
     # We pass strictly factual data to the engine.
-    
-    response = generate_explanation(request)
+    precomputed = rule_explanation(request, await tenant_dataset(x_tenant_id))
+    if not narrative:
+        return rules_response(precomputed, request)
+
+    if not request.factual_diffs and precomputed.get("factual_diffs"):
+        request = request.model_copy(update={"factual_diffs": precomputed["factual_diffs"]})
+    response = await generate_explanation(request, tenant_id=x_tenant_id)
     return response
+
+def rules_response(precomputed: dict, request: ExplainRequest) -> ExplainResponse:
+    return ExplainResponse(
+        explanation=precomputed["explanation"],
+        root_cause=precomputed["root_cause"],
+        suggested_action=precomputed["suggested_action"],
+        original_status=request.status,
+        source="rules"
+    )
+
+def rules_responses(batch: ExplainBatchRequest, tenant_data) -> list:
+    return [rules_response(rule_explanation(item, tenant_data), item) for item in batch.items]
+
+async def rules_batch(batch: ExplainBatchRequest, tenant_id: str):
+    tenant_data = await tenant_dataset(tenant_id)
+    responses = await scheduler.run(
+        "explain", rules_responses, batch, tenant_data,
+        tenant_id=tenant_id, plan=(tenant_data or {}).get("plan"), cost=len(batch.items)
+    )
+    for index, response in enumerate(responses):
+        yield index, response
+
+@router.post("/explain-mismatch/batch")
+async def explain_mismatch_batch(
+    request: Request,
+    batch: ExplainBatchRequest = Body(...),
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    narrative: bool = Query(False, description="Ask the LLM for richer narratives instead of the precomputed explanations")
+):
+    """
+    Explain many mismatches in one call. Results stream back as NDJSON, one
+    ExplainBatchItem per line in completion order; `index` refers to the request item.
+    Each item's `original_status` is always that item's input status.
+    """
+    input_hash = hashlib.sha256(await request.body()).hexdigest()
+    plan = (await tenant_dataset(x_tenant_id) or {}).get("plan")
+    source = explain_batch(batch.items, x_tenant_id, plan) if narrative else rules_batch(batch, x_tenant_id)
+
+    async def lines():
+        hasher = hashlib.sha256()
+        completed = False
+        try:
+            async for index, response in source:
+                item = ExplainBatchItem(index=index, invoice_number=batch.items[index].invoice_number, **response.model_dump())
+                line = (item.model_dump_json() + "\n").encode("utf-8")
+                hasher.update(line)
+                yield line
+            completed = True
+        finally:
+            audit_repo.save(AuditLogEntry(
+                endpoint="/explain-mismatch/batch",
+                method="POST",
+                action_type="EXPLAIN",
+                tenant_id=x_tenant_id,
+                input_hash=input_hash,
+                output_hash=hasher.hexdigest() if completed else None,
+                status=AuditStatus.SUCCESS if completed else AuditStatus.FAILURE
+            ))
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Audit-Captured": "true"})
+
+@router.get("/explain-mismatch/cache")
+async def explanation_cache_stats(x_tenant_id: str = Header(..., alias="X-Tenant-ID")):
+    """Hit-rate and occupancy of the explanation cache (process-wide)."""
+    return explanation_cache.stats()
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, File, UploadFile, HTTPException, Header, Request
+from typing import Any, Dict
+import logging
+from datetime import datetime
+from app.db.memory import TENANT_GSTR2B
+from app.core.gstr2b import parse_gstr2b, Gstr2bFormatError, Gstr2bLimitError
+from app.core.scheduler import scheduler
+from app.core.snapshots import snapshots
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Rough size of one flattened b2b invoice in the portal JSON; costs the parse in the scheduler
+BYTES_PER_RECORD = 400
+# b2b invoices accepted per plan. Portal downloads of large taxpayers run to hundreds of
+# MB (about a million invoices), far beyond what anyone uploads as CSV (PLAN_LIMITS)
+GSTR2B_RECORD_LIMITS = {
+    "BASIC": 100_000,
+    "PRO": 500_000,
+    "ENTERPRISE": 2_000_000
+}
+
+@router.post("/gstr2b/upload")
+async def upload_gstr2b(
+    request: Request,
+    file: UploadFile = File(...),
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    x_plan: str = Header("BASIC", alias="X-Plan")
+) -> Dict[str, Any]:
+    """
+    Load the tenant's GSTR-2B as downloaded from the GST portal (JSON).
+    The document is parsed as it is read, never held whole in memory. Its b2b invoices
+    are what later invoice uploads without GSTR-2B rows are matched against; stored
+    results are never recomputed. At most GSTR2B_RECORD_LIMITS[plan] invoices are
+    accepted (413 beyond that, as for invoice uploads).
+    """
+    if x_plan not in GSTR2B_RECORD_LIMITS:
+        raise HTTPException(status_code=400, detail=f"Invalid plan '{x_plan}'")
+
+    if not file.filename.endswith('.json'):
+        raise HTTPException(status_code=400, detail="Invalid file format.")
+
+    try:
+        # Reads the spooled upload in chunks on a scheduler worker
+        imported = await scheduler.run(
+            "gstr2b", parse_gstr2b, file.file, GSTR2B_RECORD_LIMITS[x_plan],
+            tenant_id=x_tenant_id, plan=x_plan, cost=(file.size or 0) // BYTES_PER_RECORD + 1
+        )
+    except Gstr2bFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Gstr2bLimitError:
+        raise HTTPException(status_code=413, detail=f"Limit exceeded for {x_plan}")
+
+    # The body was not buffered by the audit middleware; it records this digest instead
+    request.state.input_hash = imported["content_hash"]
+    imported["timestamp"] = datetime.now().isoformat()
+    TENANT_GSTR2B[x_tenant_id] = imported
+    # Persisted by the snapshot writer thread, so later uploads match against it after a restart
+    snapshots.mark_import_dirty(x_tenant_id)
+    logger.info(f"GSTR-2B loaded for tenant: {x_tenant_id}. Records: {len(imported['records'])}")
+
+    return {
+        "status": "success",
+        "gstin": imported["gstin"],
+        "return_period": imported["return_period"],
+        "suppliers": imported["suppliers"],
+        "total_records": len(imported["records"]),
+        "skipped_sections": imported["skipped_sections"],
+        "gstr2b_version": imported["content_hash"],
+    }
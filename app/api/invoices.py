@@ -1,4 +1,4 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Header, Response
+from fastapi import APIRouter, File, UploadFile, HTTPException, Header, Query, Response
 from typing import List, Optional, Dict, Any
 import csv
 import io
@@ -7,6 +7,20 @@ from datetime import datetime
 from app.schemas.invoice import Invoice
 from app.db.memory import APP_STATE
 from app.core.reconciliation import reconcile_invoice
+from app.core.matching import Gstr2bIndex
+from app.core.gstr2b import GSTR2B_SOURCE
+from app.core.money import amount_columns, rupee_fields, sum_paise, paise_to_rupees
+from app.core.results_index import ResultsIndex, STATUS_CODES, dataset_index
+from app.schemas.reconciliation import ReconciliationStatus, MatchTolerance
+from app.core.rule_explanations import precompute_explanation
+from app.core.metrics import UPLOAD_STAGE_SECONDS, UPLOADS_DEDUPLICATED_TOTAL
+from app.core.tracing import span
+from app.core.http_cache import data_version
+from app.core.encoding import json_response
+from app.core.scheduler import scheduler
+from app.core.singleflight import SingleFlight
+from app.core.snapshots import snapshots, tenant_dataset, tenant_gstr2b
+from app.api.settings import get_tenant_tolerance
 from pydantic import ValidationError
 
 router = APIRouter()
@@ -18,71 +32,203 @@ PLAN_LIMITS = {
     "PRO": 500,
     "ENTERPRISE": 1000
 }
+# Vendors listed in a summary upload response, highest risky ITC first
+SUMMARY_TOP_VENDORS = 10
+AT_RISK_CODES = (STATUS_CODES[ReconciliationStatus.RISKY_ITC], STATUS_CODES[ReconciliationStatus.MISSING_IN_2B])
 
-@router.post("/invoices/upload")
-async def upload_invoices(
-    file: UploadFile = File(...),
-    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
-    x_plan: str = Header("BASIC", alias="X-Plan")
-):
-    if x_plan not in PLAN_LIMITS:
-        raise HTTPException(status_code=400, detail=f"Invalid plan '{x_plan}'")
-    
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Invalid file format.")
+# Identical uploads in flight for a tenant, keyed by (tenant, data version)
+upload_flight = SingleFlight("upload")
 
-    content = await file.read()
+def upload_summary(tenant_data: Dict[str, Any], top_vendors: int) -> Dict[str, Any]:
+    """Counts, exact totals and the riskiest vendors, read from the ingestion-time index."""
+    index: ResultsIndex = dataset_index(tenant_data)
+    amounts = tenant_data["amounts"]
+    at_risk = [code in AT_RISK_CODES for code in index.status_codes]
+    vendors = tenant_data.get("vendor_summary", [])
+    riskiest = sorted(vendors, key=lambda v: (-v["risky_itc_amount_paise"], -v["risky_count"], v["vendor_gstin"]))
+    return {
+        "counts": {status.value: len(index.by_status.get(code, ())) for status, code in STATUS_CODES.items()},
+        "totals": {
+            "taxable_value": paise_to_rupees(sum_paise(amounts["taxable_value"])),
+            "itc_available": paise_to_rupees(sum_paise(amounts["itc"])),
+            "risky_itc_amount": paise_to_rupees(sum_paise(amounts["itc"], at_risk)),
+        },
+        "vendor_count": len(vendors),
+        "vendor_top": [rupee_fields(v) for v in riskiest[:top_vendors]],
+        # Where the individual results live; pass data_version to detect a re-upload mid-way
+        "results_url": "/reconciliation/results",
+        "export_url": "/reports/gst-risk/export",
+    }
+
+def ingest_upload(
+    content: bytes, plan: str, tolerance: MatchTolerance, version: str, portal_gstr2b: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Decode, validate and reconcile an uploaded CSV into a tenant dataset (CPU-bound).
+    GSTR-2B rows in the CSV are matched against; without any, the tenant's portal
+    GSTR-2B download (/gstr2b/upload) is used when there is one.
+    """
     try:
-        decoded_content = content.decode('utf-8')
+        with span("upload.decode", **{"upload.bytes": len(content)}):
+            decoded_content = content.decode('utf-8')
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="Invalid encoding.")
 
-    try:
+    with UPLOAD_STAGE_SECONDS.time(stage="parse"), span("upload.parse"):
         csv_file = io.StringIO(decoded_content)
         csv_reader = csv.DictReader(csv_file)
         rows = list(csv_reader)
-        
-        if len(rows) > PLAN_LIMITS[x_plan]:
-            raise HTTPException(status_code=413, detail=f"Limit exceeded for {x_plan}")
+    
+    if len(rows) > PLAN_LIMITS[plan]:
+        raise HTTPException(status_code=413, detail=f"Limit exceeded for {plan}")
 
-        parsed_invoices: List[Invoice] = []
-        results: List[Dict[str, Any]] = []
+    parsed_invoices: List[Invoice] = []
+    row_indexes: List[int] = []
+    gstr2b_records: List[Invoice] = []
+    results: List[Dict[str, Any]] = []
 
+    with UPLOAD_STAGE_SECONDS.time(stage="validate"), span("upload.validate", **{"upload.rows": len(rows)}):
         for index, row in enumerate(rows):
             clean_row = {k.strip(): v.strip() for k, v in row.items() if k}
             try:
                 inv = Invoice(**clean_row)
-                parsed_invoices.append(inv)
-                
-                # Use AUTHORITATIVE RECONCILIATION ENGINE
-                result = reconcile_invoice(inv, index)
-                results.append(result)
-
             except ValidationError:
                 raise ValueError(f"Row {index + 2}: Invalid data")
 
-        # Update authoritative central store
-        APP_STATE[x_tenant_id] = {
-            "invoices": parsed_invoices,
-            "reconciliation": results,
-            "timestamp": datetime.now().isoformat()
-        }
+            # Rows tagged source=gstr2b are government records to match against
+            if inv.source.lower() == GSTR2B_SOURCE:
+                gstr2b_records.append(inv)
+            else:
+                parsed_invoices.append(inv)
+                row_indexes.append(index)
+
+    # Use AUTHORITATIVE RECONCILIATION ENGINE
+    with UPLOAD_STAGE_SECONDS.time(stage="reconcile"), span("upload.reconcile", **{"upload.invoices": len(parsed_invoices), "upload.gstr2b_records": len(gstr2b_records)}):
+        from_portal = not gstr2b_records and portal_gstr2b is not None
+        if from_portal:
+            # Built while the download was parsed; each upload claims records on its own fork
+            gstr2b_index = portal_gstr2b["index"].fork()
+            gstr2b_records = portal_gstr2b["records"]
+        else:
+            gstr2b_index = Gstr2bIndex(gstr2b_records)
+        for index, inv in zip(row_indexes, parsed_invoices):
+            results.append(reconcile_invoice(inv, index, gstr2b_index, tolerance))
+
+    # Explanation stage: templated explanations for every mismatch, so the
+    # interactive explain path never has to start from scratch. Kept beside the
+    # results (None for matched rows), not in them: results are returned to clients as is.
+    with UPLOAD_STAGE_SECONDS.time(stage="explain"), span("upload.explain"):
+        precomputed = [precompute_explanation(inv, r) for inv, r in zip(parsed_invoices, results)]
 
-        logger.info(f"Reconciliation COMPLETED for tenant: {x_tenant_id}. Count: {len(parsed_invoices)}")
+    with UPLOAD_STAGE_SECONDS.time(stage="index"), span("upload.index"):
+        amounts = amount_columns(parsed_invoices)
+        index = ResultsIndex(parsed_invoices, results)
+    tenant_data = {
+        "invoices": parsed_invoices,
+        "reconciliation": results,
+        "precomputed": precomputed,
+        "gstr2b": gstr2b_records,
+        "amounts": amounts,
+        "index": index,
+        "timestamp": datetime.now().isoformat(),
+        # Identifies this dataset for report ETags and caches
+        "data_version": version,
+        # Weighs the tenant's later heavy work (PDFs, batch explanations) in the scheduler
+        "plan": plan
+    }
+    if from_portal:
+        tenant_data["gstr2b_source"] = "portal"
 
-        vendor_summary_results = []
-        if x_plan in ["PRO", "ENTERPRISE"]:
-            from app.core.vendor_aggregation import aggregate_vendor_risk
+    if plan in ["PRO", "ENTERPRISE"]:
+        from app.core.vendor_aggregation import aggregate_vendor_risk
+        with UPLOAD_STAGE_SECONDS.time(stage="aggregate"), span("upload.aggregate_vendor_risk"):
             vendor_summary = aggregate_vendor_risk(parsed_invoices, results)
-            vendor_summary_results = [v.dict() for v in vendor_summary]
-            APP_STATE[x_tenant_id]["vendor_summary"] = vendor_summary_results
+        tenant_data["vendor_summary"] = [v.model_dump() for v in vendor_summary]
+    return tenant_data
+
+@router.post("/invoices/upload")
+async def upload_invoices(
+    file: UploadFile = File(...),
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    x_plan: str = Header("BASIC", alias="X-Plan"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    response: str = Query("full", pattern="^(full|summary)$", description="`summary` omits the per-invoice results"),
+    top_vendors: int = Query(SUMMARY_TOP_VENDORS, ge=0, le=100)
+):
+    """
+    Reconcile an uploaded CSV and store the results for the tenant.
+    `response=full` echoes every result; `response=summary` returns counts, totals,
+    the riskiest vendors and the data version only, so the response cost does not
+    grow with the file. Results are then paged from /reconciliation/results or
+    streamed from /reports/gst-risk/export.
+    """
+    if x_plan not in PLAN_LIMITS:
+        raise HTTPException(status_code=400, detail=f"Invalid plan '{x_plan}'")
+    
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Invalid file format.")
+
+    content = await file.read()
+    tolerance = get_tenant_tolerance(x_tenant_id)
+    portal_gstr2b = await tenant_gstr2b(x_tenant_id)
+    # Same bytes, plan, tolerance, GSTR-2B download and engine version => same dataset
+    version = data_version(content, x_plan, tolerance, portal_gstr2b and portal_gstr2b["content_hash"])
+
+    async def ingest() -> Dict[str, Any]:
+        # CPU-bound: queued fairly against other tenants' heavy work, costed by
+        # row count, and kept off the event loop
+        ingested = await scheduler.run(
+            "upload", ingest_upload, content, x_plan, tolerance, version, portal_gstr2b,
+            tenant_id=x_tenant_id, plan=x_plan, cost=content.count(b"\n") + 1
+        )
+        # Update authoritative central store
+        APP_STATE[x_tenant_id] = ingested
+        # Persisted by the snapshot writer thread, off the request path
+        snapshots.mark_dirty(x_tenant_id)
+        return ingested
+
+    try:
+        # Double-clicks and retries of the stored upload are answered from it; identical
+        # uploads racing each other share one ingestion. Either way the request is audited.
+        stored = await tenant_dataset(x_tenant_id)
+        deduplicated = stored is not None and stored.get("data_version") == version
+        if deduplicated:
+            tenant_data = stored
+            UPLOADS_DEDUPLICATED_TOTAL.inc(reason="stored")
+        else:
+            tenant_data, deduplicated = await upload_flight.do((x_tenant_id, version), ingest)
+            if deduplicated:
+                UPLOADS_DEDUPLICATED_TOTAL.inc(reason="in_flight")
+        parsed_invoices = tenant_data["invoices"]
+        results = tenant_data["reconciliation"]
+
+        if deduplicated:
+            logger.info(f"Duplicate upload for tenant: {x_tenant_id}; returning stored reconciliation. Count: {len(parsed_invoices)}")
+        else:
+            logger.info(f"Reconciliation COMPLETED for tenant: {x_tenant_id}. Count: {len(parsed_invoices)}")
+
+        vendor_summary_results = [rupee_fields(v) for v in tenant_data.get("vendor_summary", [])]
+
+        if response == "summary":
+            return json_response({
+                "status": "success",
+                "response": "summary",
+                "total_invoices": len(parsed_invoices),
+                "data_version": version,
+                "deduplicated": deduplicated,
+                **upload_summary(tenant_data, top_vendors)
+            }, accept_encoding)
 
-        return {
+        # Encoded once (enums and dates included), hashed for the audit and compressed
+        # when the client accepts it: ENTERPRISE responses are large
+        return json_response({
             "status": "success",
             "total_invoices": len(parsed_invoices),
+            "data_version": version,
+            "deduplicated": deduplicated,
             "reconciliation_results": results,
             "vendor_summary": vendor_summary_results
-        }
+        }, accept_encoding)
 
     except Exception as e:
         if isinstance(e, HTTPException): raise e
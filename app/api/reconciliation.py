@@ -0,0 +1,106 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from typing import List, Optional
+from datetime import date
+import base64
+import binascii
+import logging
+from app.core.snapshots import tenant_dataset
+from app.schemas.reconciliation import ReconciliationStatus
+from app.core.results_index import SORT_FIELDS, dataset_index
+from app.core.money import to_paise, paise_to_rupees
+from app.core.http_cache import tenant_data_version
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 500
+
+def _encode_cursor(sort: str, order: str, key: int) -> str:
+    return base64.urlsafe_b64encode(f"{sort}:{order}:{key}".encode()).decode()
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> int:
+    try:
+        c_sort, c_order, key = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if (c_sort, c_order) != (sort, order):
+            raise ValueError("cursor does not match sort order")
+        return int(key)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def _amount_filter(value: Optional[float], name: str) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return to_paise(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}.")
+
+@router.get("/reconciliation/results")
+async def list_reconciliation_results(
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    status: Optional[List[ReconciliationStatus]] = Query(None),
+    vendor_gstin: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    sort: str = Query("row", pattern="^(" + "|".join(SORT_FIELDS) + ")$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_version: Optional[str] = None
+):
+    """
+    Filterable, keyset-paginated view over the tenant's stored reconciliation results.
+    Amount filters apply to the taxable value (in rupees). Pass `next_cursor` back as
+    `cursor` to fetch the following page with the same filters and sort.
+    Passing the `data_version` returned by the upload fails with 409 once the
+    dataset has been replaced, instead of mixing pages from two uploads.
+    """
+    data = await tenant_dataset(x_tenant_id)
+    if not data or not data.get("reconciliation"):
+        raise HTTPException(status_code=404, detail="No reconciliation results found for this session.")
+    current_version = tenant_data_version(data)
+    if data_version is not None and data_version != current_version:
+        raise HTTPException(status_code=409, detail="Results have changed since this data version; restart from the first page.")
+
+    index = dataset_index(data)
+    after = _decode_cursor(cursor, sort, order) if cursor else None
+    rows, next_key = index.query(
+        statuses=status,
+        gstin=vendor_gstin,
+        date_from=date_from,
+        date_to=date_to,
+        min_amount=_amount_filter(min_amount, "min_amount"),
+        max_amount=_amount_filter(max_amount, "max_amount"),
+        sort=sort,
+        descending=order == "desc",
+        limit=limit,
+        after=after
+    )
+
+    results = data["reconciliation"]
+    invoices = data.get("invoices", [])
+    items = []
+    for row in rows:
+        r = results[row]
+        inv = invoices[row]
+        items.append({
+            "row_id": row,
+            "invoice_number": r["invoice_number"],
+            "gstin": r["gstin"],
+            "invoice_date": inv.invoice_date.isoformat(),
+            "status": r["status"],
+            "taxable_value": paise_to_rupees(inv.taxable_value_paise),
+            "itc_amount": paise_to_rupees(inv.itc_paise),
+            "explanation": r.get("explanation"),
+            "suggested_action": r.get("suggested_action"),
+            "diffs": r.get("diffs", {})
+        })
+
+    return {
+        "items": items,
+        "count": len(items),
+        "next_cursor": _encode_cursor(sort, order, next_key) if next_key is not None else None,
+        "data_version": current_version
+    }
@@ -1,28 +1,145 @@
-from fastapi import APIRouter, HTTPException, Header, Request
-from fastapi.responses import StreamingResponse
-from app.db.memory import APP_STATE
+from fastapi import APIRouter, HTTPException, Header, Request, Query
+from fastapi.responses import StreamingResponse, Response
+from app.core.snapshots import tenant_dataset
 from app.schemas.report import ReportResponse, BusinessInfo, ReconciliationSummary, VendorSummaryItem, InvoiceDetail, RiskAssessment, ReportAudit
 from app.schemas.reconciliation import ReconciliationStatus
 from app.schemas.audit import AuditLogEntry, AuditStatus
 from app.core.audit import audit_repo
+from app.core.money import amount_columns, sum_paise, paise_to_rupees
+from app.core.results_index import STATUS_CODES, status_column
 from datetime import datetime
+from app.core.metrics import REPORT_BUILD_SECONDS, PDF_RENDER_SECONDS
+from app.core.tracing import span
+from app.core.encoding import body_encoding, compress
+from app.core.export import iter_csv, iter_ndjson, export_rows, hashed, gzipped, accepts_gzip
+from app.core.http_cache import (
+    report_cache, strong_etag, weak_etag, encoded_etag, etag_matches,
+    CACHE_CONTROL_REPORT, CACHE_CONTROL_PDF, CACHE_CONTROL_EXPORT, VARY
+)
+from app.core.scheduler import scheduler
+from app.core.singleflight import SingleFlight
+from typing import Iterator, List, Optional
 import uuid
 import logging
-import io
 import hashlib
-import json
-from reportlab.lib.pagesizes import A4
-# ... (rest of imports remain same)
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
+import threading
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+AT_RISK_STATUSES = (ReconciliationStatus.RISKY_ITC, ReconciliationStatus.MISSING_IN_2B)
+AT_RISK_CODES = {STATUS_CODES[status] for status in AT_RISK_STATUSES}
+# bytes.translate table: status code -> 1 if at risk, else 0
+AT_RISK_MASK = bytes(code in AT_RISK_CODES for code in range(256))
+PORTAL_DATA_SOURCES = ["User_Upload", "GSTR2B_Portal_JSON"]
+
+PDF_CHUNK_BYTES = 64 * 1024
+
+# Concurrent identical requests share one computation: (tenant, data version[, detail])
+report_flight = SingleFlight("report")
+pdf_flight = SingleFlight("pdf")
+
+def render_pdf(report: ReportResponse, tenant_data=None):
+    # ReportLab is imported on first use, inside the worker thread (or earlier by the
+    # startup prewarm), so it never weighs on app import / time to first /health
+    from app.core.pdf_report import render_report_pdf
+    detail = "summary" if tenant_data is None else "full"
+    with PDF_RENDER_SECONDS.time(detail=detail), span("report.render_pdf", **{"report.detail": detail}):
+        return render_report_pdf(report, tenant_data)
+
+class RenderedPdf:
+    """
+    A rendered PDF, streamed by every coalesced download of it, each through its own
+    PdfReader. The spooled file is closed as soon as the last reader is closed.
+    """
+
+    def __init__(self, pdf_file, size: int, sha256: str):
+        self.file = pdf_file
+        self.size = size
+        self.sha256 = sha256
+        self._lock = threading.Lock()
+        self._readers = 0
+
+    def reader(self) -> "PdfReader":
+        # Counted when handed out, not when first iterated: coalesced callers all resume
+        # (and take their reader) before any of them has streamed a chunk
+        with self._lock:
+            self._readers += 1
+        return PdfReader(self)
+
+    def read_at(self, offset: int) -> bytes:
+        with self._lock:
+            if self.file.closed:
+                return b""
+            self.file.seek(offset)
+            return self.file.read(PDF_CHUNK_BYTES)
+
+    def release(self, reader: "PdfReader"):
+        with self._lock:
+            if reader.closed:
+                return
+            reader.closed = True
+            self._readers -= 1
+            if self._readers == 0:
+                self.file.close()
+
+class PdfReader:
+    """One download's pass over a RenderedPdf. close() returns its reference, iterated or not."""
+
+    def __init__(self, pdf: RenderedPdf):
+        self.pdf = pdf
+        self.offset = 0
+        self.closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        chunk = b"" if self.closed or self.offset >= self.pdf.size else self.pdf.read_at(self.offset)
+        if not chunk:
+            self.close()
+            raise StopIteration
+        self.offset += len(chunk)
+        return chunk
+
+    def close(self):
+        self.pdf.release(self)
+
+class PdfResponse(StreamingResponse):
+    """
+    Streams a PdfReader and closes it however the response ends: sent in full, failed,
+    or cut short by a client that disconnected before or during the body.
+    """
+
+    def __init__(self, reader: PdfReader, **kwargs):
+        super().__init__(reader, **kwargs)
+        self.reader = reader
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.reader.close()
+
+def render_pdf_hashed(report: ReportResponse, tenant_data=None) -> RenderedPdf:
+    """Render, then hash in chunks so the document is never held in memory as a single bytes object."""
+    pdf_file = render_pdf(report, tenant_data)
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: pdf_file.read(PDF_CHUNK_BYTES), b""):
+        hasher.update(chunk)
+    return RenderedPdf(pdf_file, pdf_file.tell(), hasher.hexdigest())
+
 async def internal_get_report_data(x_tenant_id: str) -> ReportResponse:
     """Helper to aggregate report data for both JSON and PDF endpoints."""
-    data = APP_STATE.get(x_tenant_id)
+    return build_report_data(x_tenant_id, await tenant_dataset(x_tenant_id))
+
+def report_data_sources(data: dict) -> List[str]:
+    # Matched against a real GSTR-2B download (/gstr2b/upload) rather than mock rules or CSV rows
+    if data.get("gstr2b_source") == "portal":
+        return PORTAL_DATA_SOURCES
+    return ReportAudit.model_fields["data_sources"].default
+
+def build_report_data(x_tenant_id: str, data: Optional[dict]) -> ReportResponse:
     if not data or not data.get("reconciliation"):
         raise HTTPException(status_code=404, detail="No reconciliation results found for this session.")
 
@@ -30,25 +147,17 @@ async def internal_get_report_data(x_tenant_id: str) -> ReportResponse:
     invoices = data.get("invoices", [])
     vendor_summary_data = data.get("vendor_summary", [])
 
-    counts = {"MATCHED": 0, "PARTIAL_MATCH": 0, "MISSING_IN_2B": 0, "RISKY_ITC": 0}
-    total_taxable = 0.0
-    total_itc = 0.0
-    risky_itc_amt = 0.0
+    # Counts and the at-risk mask come from the one-byte status column, not the results
+    # themselves: a mapped dataset reads only its status and amount columns here
+    codes = bytes(status_column(data))
+    counts = {status.name: codes.count(code) for status, code in STATUS_CODES.items()}
 
-    for r in results:
-        status_key = r["status"].name if hasattr(r["status"], "name") else str(r["status"])
-        counts[status_key] = counts.get(status_key, 0) + 1
-    
-    for inv in invoices:
-        total_taxable += float(inv.taxable_value)
-        itc = float(inv.igst + inv.cgst + inv.sgst)
-        total_itc += itc
-        
-    for r in results:
-        if r["status"] == ReconciliationStatus.RISKY_ITC or r["status"] == ReconciliationStatus.MISSING_IN_2B:
-             inv = next((i for i in invoices if i.invoice_number == r["invoice_number"]), None)
-             if inv:
-                 risky_itc_amt += float(inv.igst + inv.cgst + inv.sgst)
+    # Exact paise totals over the columnar amounts (results are aligned with invoices)
+    amounts = data.get("amounts") or amount_columns(invoices)
+    at_risk = codes.translate(AT_RISK_MASK)
+    total_taxable = sum_paise(amounts["taxable_value"])
+    total_itc = sum_paise(amounts["itc"])
+    risky_itc_amt = sum_paise(amounts["itc"], at_risk)
 
     vendors = []
     for v in vendor_summary_data:
@@ -56,19 +165,18 @@ async def internal_get_report_data(x_tenant_id: str) -> ReportResponse:
             vendor_gstin=v["vendor_gstin"],
             total_invoices=int(v.get("total_invoices", 0)),
             risky_count=int(v.get("risky_count", 0)),
-            risky_itc_amount=float(v.get("risky_itc_amount", 0.0)),
+            risky_itc_amount=paise_to_rupees(v.get("risky_itc_amount_paise", 0)),
             risk_level=v.get("vendor_risk_level", "LOW")
         ))
 
     invoice_details = []
-    for r in results[:100]:
-        inv = next((i for i in invoices if i.invoice_number == r["invoice_number"]), None)
+    for r, inv in zip(results[:100], invoices[:100]):
         invoice_details.append(InvoiceDetail(
             invoice_number=r["invoice_number"],
             gstin=r["gstin"],
             status=r["status"].value if hasattr(r["status"], "value") else str(r["status"]),
-            taxable_value=float(inv.taxable_value) if inv else 0.0,
-            itc_amount=float(inv.igst + inv.cgst + inv.sgst) if inv else 0.0,
+            taxable_value=paise_to_rupees(inv.taxable_value_paise),
+            itc_amount=paise_to_rupees(inv.itc_paise),
             suggested_action=r.get("suggested_action", "-")
         ))
 
@@ -92,133 +200,213 @@ async def internal_get_report_data(x_tenant_id: str) -> ReportResponse:
             partial_match_count=counts["PARTIAL_MATCH"],
             missing_in_2b_count=counts["MISSING_IN_2B"],
             risky_itc_count=counts["RISKY_ITC"],
-            total_taxable_value=round(total_taxable, 2),
-            total_itc_available=round(total_itc, 2),
-            risky_itc_amount=round(risky_itc_amt, 2)
+            total_taxable_value=paise_to_rupees(total_taxable),
+            total_itc_available=paise_to_rupees(total_itc),
+            risky_itc_amount=paise_to_rupees(risky_itc_amt)
         ),
         vendor_summary=vendors,
         invoice_details=invoice_details,
         risk_assessment=assessment,
-        audit=ReportAudit(report_id=str(uuid.uuid4()))
+        audit=ReportAudit(report_id=str(uuid.uuid4()), data_sources=report_data_sources(data))
     )
 
-@router.get("/reports/gst-risk", response_model=ReportResponse)
-async def get_gst_risk_report(
-    request: Request,
-    x_tenant_id: str = Header(..., alias="X-Tenant-ID")
-):
-    logger.info(f"JSON Report requested for tenant: {x_tenant_id}")
-    report = await internal_get_report_data(x_tenant_id)
-    
-    # Explicit Audit Logging for JSON
-    report_json = report.model_dump_json() if hasattr(report, "model_dump_json") else json.dumps(report.dict())
-    output_hash = hashlib.sha256(report_json.encode()).hexdigest()
-    
+async def cached_report(x_tenant_id: str, data: Optional[dict]) -> dict:
+    """
+    The report for `data` (the tenant's dataset, read once by the caller), built and
+    serialised once per data version: {"report", "body", "output_hash", "etag"}. JSON
+    and PDF share it, so both carry the same report_id and generated_at until the data changes.
+    """
+    if not data or not data.get("reconciliation"):
+        raise HTTPException(status_code=404, detail="No reconciliation results found for this session.")
+    cache = report_cache(data)
+    entry = cache.get("report")
+    if entry is None:
+        async def build() -> dict:
+            built = await scheduler.run(
+                "report", build_report_entry, x_tenant_id, data, cache["version"],
+                tenant_id=x_tenant_id, plan=data.get("plan"), cost=len(data["reconciliation"])
+            )
+            cache["report"] = built
+            return built
+
+        # Tabs opened together share one build of this data version
+        entry, _ = await report_flight.do((x_tenant_id, cache["version"]), build)
+    return entry
+
+def build_report_entry(x_tenant_id: str, data: dict, version: str) -> dict:
+    with REPORT_BUILD_SECONDS.time(), span("report.build"):
+        report = build_report_data(x_tenant_id, data)
+    body = report.model_dump_json().encode("utf-8")
+    output_hash = hashlib.sha256(body).hexdigest()
+    return {"report": report, "body": body, "output_hash": output_hash, "etag": strong_etag(version, output_hash)}
+
+def audit_report(endpoint: str, action_type: str, x_tenant_id: str, output_hash):
     audit_repo.save(AuditLogEntry(
-        endpoint="/reports/gst-risk",
+        endpoint=endpoint,
         method="GET",
-        action_type="REPORT",
+        action_type=action_type,
         tenant_id=x_tenant_id,
         output_hash=output_hash,
         status=AuditStatus.SUCCESS
     ))
-    
-    # Return JSONResponse to include internal audit signal header
-    from fastapi.responses import JSONResponse as FastAPIJSONResponse
-    return FastAPIJSONResponse(
-        content=json.loads(report_json),
-        headers={"X-Audit-Captured": "true"}
-    )
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    # Audited by the endpoint: a revalidated report is still a report served
+    return Response(status_code=304, headers={
+        "ETag": etag, "Cache-Control": cache_control, "Vary": f"Accept-Encoding, {VARY}", "X-Audit-Captured": "true"
+    })
+
+@router.get("/reports/gst-risk", response_model=ReportResponse)
+async def get_gst_risk_report(
+    request: Request,
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID")
+):
+    """
+    JSON risk report. Built once per data version; polls revalidate with
+    If-None-Match and get a 304 without the report being rebuilt or re-serialised.
+    Every request, 304 included, writes an audit entry with the report's hash.
+    """
+    logger.info(f"JSON Report requested for tenant: {x_tenant_id}")
+    entry = await cached_report(x_tenant_id, await tenant_dataset(x_tenant_id))
+    audit_report("/reports/gst-risk", "REPORT", x_tenant_id, entry["output_hash"])
+
+    # The ETag depends only on the negotiated coding: a 304 never compresses anything
+    encoding = body_encoding(entry["body"], request.headers.get("accept-encoding"))
+    etag = encoded_etag(entry["etag"], encoding)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, CACHE_CONTROL_REPORT)
+
+    # Compressed once per data version and content-coding, like the body itself
+    payload = entry["body"]
+    if encoding:
+        payload = entry.get(encoding)
+        if payload is None:
+            payload = entry.setdefault(encoding, compress(entry["body"], encoding))
+
+    # X-Audit-Captured: internal signal so the middleware does not log it again
+    headers = {
+        "ETag": etag, "Cache-Control": CACHE_CONTROL_REPORT,
+        "Vary": f"Accept-Encoding, {VARY}", "X-Audit-Captured": "true"
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload, media_type="application/json", headers=headers)
 
 @router.get("/reports/gst-risk/pdf")
 async def get_gst_risk_pdf_report(
     request: Request,
-    x_tenant_id: str = Header(..., alias="X-Tenant-ID")
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    detail: str = Query("summary", pattern="^(summary|full)$")
 ):
-    logger.info(f"PDF Report Generation STARTED for tenant: {x_tenant_id}")
+    """
+    PDF risk report. `detail=full` appends the vendor table and every invoice row,
+    rendered page by page into a spooled temp file.
+    """
+    logger.info(f"PDF Report Generation STARTED for tenant: {x_tenant_id} (detail={detail})")
     
-    try:
-        report = await internal_get_report_data(x_tenant_id)
-    except HTTPException as e:
-        raise e
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # 1. Header & Business Info
-    elements.append(Paragraph("GST Reconciliation & Risk Report", styles['Title']))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"<b>Tenant ID:</b> {report.business.tenant_id}", styles['Normal']))
-    elements.append(Paragraph(f"<b>GSTIN:</b> {report.business.gstin}", styles['Normal']))
-    elements.append(Paragraph(f"<b>Generated (UTC):</b> {report.audit.generated_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-    elements.append(Paragraph(f"<b>Engine Version:</b> {report.audit.reconciliation_version}", styles['Normal']))
-    elements.append(Paragraph(f"<b>Data Sources:</b> {', '.join(report.audit.data_sources)}", styles['Normal']))
-    elements.append(Spacer(1, 24))
-
-    # 2. Risk Assessment
-    elements.append(Paragraph("Risk Assessment", styles['Heading2']))
-    elements.append(Paragraph(f"<b>Risk Score:</b> {report.risk_assessment.risk_score}/100", styles['Normal']))
-    elements.append(Paragraph(f"<b>Finding Summary:</b> {report.risk_assessment.finding_summary}", styles['Normal']))
-    elements.append(Paragraph(f"<b>Recommendation:</b> {report.risk_assessment.recommendation}", styles['Normal']))
-    elements.append(Spacer(1, 24))
-
-    # 3. Summary Table
-    elements.append(Paragraph("Reconciliation Summary", styles['Heading2']))
-    summary_data = [
-        ["Metric", "Value"],
-        ["Total Invoices", str(report.summary.total_invoices)],
-        ["Matched", str(report.summary.matched_count)],
-        ["Missing in GSTR-2B", str(report.summary.missing_in_2b_count)],
-        ["Risky ITC Count", str(report.summary.risky_itc_count)],
-        ["Total ITC Available", f"Rs. {report.summary.total_itc_available:.2f}"],
-        ["Risky ITC Amount", f"Rs. {report.summary.risky_itc_amount:.2f}"]
-    ]
-    summary_table = Table(summary_data, colWidths=[200, 150])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 24))
-
-    # 4. Mandatory Footer
-    elements.append(Spacer(1, 48))
-    footer_text = "This report is for internal compliance only. Generated via GST Trust Authoritative Rules Engine."
-    elements.append(Paragraph(footer_text, ParagraphStyle(name='Footer', fontSize=8, textColor=colors.grey, alignment=1)))
+    # One dataset throughout: an upload landing during the awaits below must not get
+    # this dataset's PDF cached or ETagged under its new data version
+    stored = await tenant_dataset(x_tenant_id)
+    entry = await cached_report(x_tenant_id, stored)
+    report = entry["report"]
+
+    # PDFs embed a creation date, so the ETag is weak: same report, not same bytes.
+    # The hash of the PDF last served for this version is kept for the audit trail.
+    cache = report_cache(stored)
+    etag = weak_etag(cache["version"], f"pdf-{detail}")
+    pdf_hash_key = f"pdf_hash:{detail}"
+    if pdf_hash_key in cache and etag_matches(request.headers.get("if-none-match"), etag):
+        audit_report("/reports/gst-risk/pdf", "PDF_DOWNLOAD", x_tenant_id, cache[pdf_hash_key])
+        return not_modified(etag, CACHE_CONTROL_PDF)
+
+    tenant_data = stored if detail == "full" else None
+    # Rendering is costed by the rows it lays out: every invoice for the full report
+    rows = len(stored.get("invoices", [])) if tenant_data is not None else len(report.invoice_details) + len(report.vendor_summary)
+
+    def render():
+        return scheduler.run(
+            "pdf", render_pdf_hashed, report, tenant_data,
+            tenant_id=x_tenant_id, plan=stored.get("plan"), cost=rows + 1
+        )
 
     try:
-        doc.build(elements)
+        # Identical downloads in flight (same tenant, data version and detail) share one render
+        rendered, _ = await pdf_flight.do((x_tenant_id, cache["version"], detail), render)
     except Exception as e:
         logger.error(f"PDF Build Failed: {str(e)}")
         raise HTTPException(status_code=500, detail="PDF generation failed during document build.")
-
-    pdf_bytes = buffer.getvalue()
-    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    cache[pdf_hash_key] = rendered.sha256
     
     # Audit Logging
-    audit_repo.save(AuditLogEntry(
-        endpoint="/reports/gst-risk/pdf",
-        method="GET",
-        action_type="PDF_DOWNLOAD",
-        tenant_id=x_tenant_id,
-        output_hash=pdf_hash,
-        status=AuditStatus.SUCCESS
-    ))
+    audit_report("/reports/gst-risk/pdf", "PDF_DOWNLOAD", x_tenant_id, rendered.sha256)
 
     # Mark as audited to prevent middleware from double-logging
     headers = {
         "Content-Disposition": f"attachment; filename=GST_Trust_Report_{x_tenant_id[:8]}.pdf",
-        "Content-Length": str(len(pdf_bytes)),
+        "Content-Length": str(rendered.size),
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL_PDF,
+        "Vary": VARY,
         "X-Audit-Captured": "true"
     }
 
-    buffer.seek(0)
-    return StreamingResponse(
-        buffer,
+    return PdfResponse(
+        rendered.reader(),
         media_type="application/pdf",
         headers=headers
     )
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+@router.get("/reports/gst-risk/export")
+async def export_gst_risk_results(
+    request: Request,
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """
+    Stream every stored reconciliation result as CSV or NDJSON for ERP import.
+    Rows are generated lazily from the stored results; the audit entry is written
+    once the stream finishes, with the SHA-256 of the uncompressed export.
+    """
+    data = await tenant_dataset(x_tenant_id)
+    if not data or not data.get("reconciliation"):
+        raise HTTPException(status_code=404, detail="No reconciliation results found for this session.")
+
+    # The export's bytes depend only on the dataset and format; the hash of a completed
+    # export is kept so a revalidated (304) download is audited with it
+    cache = report_cache(data)
+    etag = weak_etag(cache["version"], f"export-{format}")
+    export_hash_key = f"export_hash:{format}"
+    if export_hash_key in cache and etag_matches(request.headers.get("if-none-match"), etag):
+        audit_report("/reports/gst-risk/export", "EXPORT", x_tenant_id, cache[export_hash_key])
+        return not_modified(etag, CACHE_CONTROL_EXPORT)
+
+    logger.info(f"Export ({format}) STARTED for tenant: {x_tenant_id}")
+    serialise = iter_csv if format == "csv" else iter_ndjson
+
+    def write_audit(output_hash):
+        if output_hash:
+            cache[export_hash_key] = output_hash
+        audit_repo.save(AuditLogEntry(
+            endpoint="/reports/gst-risk/export",
+            method="GET",
+            action_type="EXPORT",
+            tenant_id=x_tenant_id,
+            output_hash=output_hash,
+            status=AuditStatus.SUCCESS if output_hash else AuditStatus.FAILURE
+        ))
+
+    body = hashed(serialise(export_rows(data)), write_audit)
+    headers = {
+        "Content-Disposition": f"attachment; filename=GST_Trust_Export_{x_tenant_id[:8]}.{format}",
+        "X-Audit-Captured": "true",
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL_EXPORT,
+        "Vary": f"Accept-Encoding, {VARY}"
+    }
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
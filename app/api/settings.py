@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Body, Header
+from app.schemas.reconciliation import MatchTolerance
+from app.db.memory import TENANT_SETTINGS
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def get_tenant_tolerance(tenant_id: str) -> MatchTolerance:
+    """Tolerance configured for the tenant, or the engine defaults."""
+    return TENANT_SETTINGS.get(tenant_id, {}).get("tolerance") or MatchTolerance()
+
+@router.get("/settings/tolerance", response_model=MatchTolerance)
+async def get_tolerance(x_tenant_id: str = Header(..., alias="X-Tenant-ID")):
+    return get_tenant_tolerance(x_tenant_id)
+
+@router.put("/settings/tolerance", response_model=MatchTolerance)
+async def update_tolerance(
+    tolerance: MatchTolerance = Body(...),
+    x_tenant_id: str = Header(..., alias="X-Tenant-ID")
+):
+    """
+    Update the tenant's GSTR-2B matching tolerance.
+    Applies to subsequent uploads only; stored results are never recomputed.
+    """
+    TENANT_SETTINGS.setdefault(x_tenant_id, {})["tolerance"] = tolerance
+    logger.info(f"Tolerance updated for tenant: {x_tenant_id}")
+    return tolerance
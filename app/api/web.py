@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Request, Form, Response
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from functools import lru_cache
 from typing import Optional
 import uuid
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+@lru_cache(maxsize=None)
+def get_templates():
+    # Jinja2 is loaded when the first page is rendered, not at app import
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="app/templates")
 
 # Plan Limits for UI
 PLAN_LIMITS = {
@@ -18,11 +23,11 @@ PLAN_LIMITS = {
 
 @router.get("/", response_class=HTMLResponse)
 async def landing_page(request: Request):
-    return templates.TemplateResponse("landing.html", {"request": request})
+    return get_templates().TemplateResponse("landing.html", {"request": request})
 
 @router.get("/onboarding/setup", response_class=HTMLResponse)
 async def setup_page(request: Request):
-    return templates.TemplateResponse("setup.html", {"request": request})
+    return get_templates().TemplateResponse("setup.html", {"request": request})
 
 @router.post("/onboarding/setup")
 async def setup_session(
@@ -43,7 +48,7 @@ async def setup_session(
 
 @router.get("/onboarding/plan", response_class=HTMLResponse)
 async def select_plan_page(request: Request):
-    return templates.TemplateResponse("plan.html", {"request": request})
+    return get_templates().TemplateResponse("plan.html", {"request": request})
 
 @router.post("/onboarding/plan")
 async def save_plan(request: Request, plan: str = Form(...)):
@@ -70,7 +75,7 @@ async def app_page(request: Request):
 
     # Render App with injected context for JS to use in headers
     # "Client-side JS must NEVER generate or modify tenant_id" -> Consuming strictly from server injection is safe.
-    return templates.TemplateResponse("app.html", {
+    return get_templates().TemplateResponse("app.html", {
         "request": request,
         "tenant_id": tenant_id,
         "plan": plan,
@@ -0,0 +1,344 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+from app.core.config import settings
+from app.core.metrics import REGISTRY, Counter, Gauge
+from app.db.memory import APP_STATE
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional: budgets stay per process
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# ADMISSION CONTROL
+# Every tenant request is admitted (or refused with 429 + Retry-After) by AuditMiddleware
+# before its body is read, so an over-budget upload costs nothing but the check.
+#   1. Rate: a token bucket per (tenant, endpoint class). `rate` tokens per second refill
+#      a bucket of `burst` tokens; each request takes one.
+#   2. Concurrency: the expensive classes (upload, PDF, export, explain) also cap requests
+#      in flight per tenant. A slot is a lease that is released when the response has been
+#      sent, and expires on its own if the release never happens (worker crash, lost client).
+# Budgets are per plan: the one recorded for the tenant at upload, never the X-Plan
+# header or cookie a request claims (BASIC until the tenant has a dataset). State is
+# in-process by default; set ADMISSION_BACKEND_URL to a
+# Redis URL to share it between workers.
+
+class Budget:
+    __slots__ = ("rate", "burst", "concurrency")
+
+    def __init__(self, rate: float, burst: int, concurrency: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+
+    def __repr__(self):
+        return f"Budget(rate={self.rate}, burst={self.burst}, concurrency={self.concurrency})"
+
+# (tokens per second, bucket size, requests in flight) per plan and endpoint class
+ADMISSION_BUDGETS: Dict[str, Dict[str, Budget]] = {
+    "BASIC": {
+        "upload": Budget(10 / 60, 10, 2),
+        "pdf": Budget(20 / 60, 10, 2),
+        "export": Budget(20 / 60, 10, 2),
+        "explain": Budget(1, 20, 4),
+        "report": Budget(5, 50),
+        "api": Budget(10, 100),
+    },
+    "PRO": {
+        "upload": Budget(30 / 60, 20, 4),
+        "pdf": Budget(1, 20, 4),
+        "export": Budget(1, 20, 4),
+        "explain": Budget(5, 50, 8),
+        "report": Budget(10, 100),
+        "api": Budget(20, 200),
+    },
+    "ENTERPRISE": {
+        "upload": Budget(1, 40, 8),
+        "pdf": Budget(2, 40, 8),
+        "export": Budget(2, 40, 8),
+        "explain": Budget(10, 100, 16),
+        "report": Budget(20, 200),
+        "api": Budget(50, 400),
+    },
+}
+DEFAULT_PLAN = "BASIC"
+
+def recorded_plan(tenant_id: str) -> str:
+    """Plan stored with the tenant's dataset; resident datasets only, so admission never reads disk."""
+    tenant_data = dict.get(APP_STATE, tenant_id)
+    plan = tenant_data.get("plan") if isinstance(tenant_data, dict) else None
+    return plan if plan in ADMISSION_BUDGETS else DEFAULT_PLAN
+# Retry-After for a full concurrency cap: there is no refill time to compute
+CONCURRENCY_RETRY_SECONDS = 1
+
+def endpoint_class(method: str, path: str) -> str:
+    if path.startswith("/invoices/upload") or path.startswith("/gstr2b/upload"):
+        return "upload"
+    if path.startswith("/reports/") and path.endswith("/pdf"):
+        return "pdf"
+    if path.startswith("/reports/") and path.endswith("/export"):
+        return "export"
+    if path.startswith("/explain-mismatch") and method == "POST":
+        return "explain"
+    if path.startswith("/reports"):
+        return "report"
+    return "api"
+
+def tenant_key(tenant_id: str) -> str:
+    # Tenant ids act as credentials; shared state only ever sees a digest
+    return hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:32]
+
+class Admission:
+    """Outcome of an admission check. Admitted requests holding a lease must release it."""
+    __slots__ = ("allowed", "endpoint_class", "reason", "retry_after", "key", "lease")
+
+    def __init__(self, allowed: bool, endpoint_class: str, reason: Optional[str] = None,
+                 retry_after: float = 0.0, key: Optional[str] = None, lease: Optional[str] = None):
+        self.allowed = allowed
+        self.endpoint_class = endpoint_class
+        self.reason = reason
+        self.retry_after = retry_after
+        self.key = key
+        self.lease = lease
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+class AdmissionBackend(ABC):
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """Take one token: (allowed, seconds until a token is available)."""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: int, lease: str, ttl: float) -> bool:
+        """Hold one of `limit` slots under `lease` for at most `ttl` seconds."""
+
+    @abstractmethod
+    async def release(self, key: str, lease: str):
+        pass
+
+class InMemoryAdmissionBackend(AdmissionBackend):
+    """Per-process state. Idle buckets are full buckets, so they are dropped rather than kept."""
+
+    # Sweep idle state every this many checks
+    SWEEP_EVERY = 1024
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [tokens, updated_at, seconds to refill completely]
+        self._buckets: Dict[str, list] = {}
+        # key -> {lease: expires_at}
+        self._leases: Dict[str, Dict[str, float]] = {}
+        self._checks = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = self._clock()
+        with self._lock:
+            self._maybe_sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now, burst / rate]
+            tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (1 - tokens) / rate
+
+    async def acquire(self, key: str, limit: int, lease: str, ttl: float) -> bool:
+        now = self._clock()
+        with self._lock:
+            leases = self._leases.setdefault(key, {})
+            for expired in [held for held, expires_at in leases.items() if expires_at <= now]:
+                del leases[expired]
+            if len(leases) >= limit:
+                return False
+            leases[lease] = now + ttl
+            return True
+
+    async def release(self, key: str, lease: str):
+        with self._lock:
+            leases = self._leases.get(key)
+            if leases is not None:
+                leases.pop(lease, None)
+                if not leases:
+                    del self._leases[key]
+
+    def _maybe_sweep(self, now: float):
+        self._checks += 1
+        if self._checks % self.SWEEP_EVERY:
+            return
+        for key in [k for k, (_, updated_at, refill) in self._buckets.items() if now - updated_at >= refill]:
+            del self._buckets[key]
+        for key in [k for k, leases in self._leases.items() if all(e <= now for e in leases.values())]:
+            del self._leases[key]
+
+    def tracked_keys(self) -> int:
+        return len(self._buckets) + len(self._leases)
+
+# Redis scripts run atomically and read the server clock, so workers with skewed clocks agree
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_ACQUIRE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + ttl, ARGV[2])
+redis.call('PEXPIRE', KEYS[1], math.ceil(ttl * 1000))
+return 1
+"""
+
+class RedisAdmissionBackend(AdmissionBackend):
+    """Budgets shared by every worker pointed at the same Redis."""
+
+    def __init__(self, url: str, prefix: str = "gst:admission:"):
+        if aioredis is None:
+            raise RuntimeError("ADMISSION_BACKEND_URL is set but the 'redis' package is not installed")
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._acquire = self._redis.register_script(_ACQUIRE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, wait = await self._take(keys=[f"{self.prefix}rate:{key}"], args=[rate, burst])
+        return bool(int(allowed)), float(wait)
+
+    async def acquire(self, key: str, limit: int, lease: str, ttl: float) -> bool:
+        acquired = await self._acquire(keys=[f"{self.prefix}slots:{key}"], args=[limit, lease, ttl])
+        return bool(int(acquired))
+
+    async def release(self, key: str, lease: str):
+        await self._redis.zrem(f"{self.prefix}slots:{key}", lease)
+
+class AdmissionController:
+    """
+    Plan-aware admission checks. Backend failures admit the request (and are logged):
+    an unreachable Redis must not take the API down with it.
+    """
+
+    def __init__(self, backend: AdmissionBackend, budgets: Optional[Dict[str, Dict[str, Budget]]] = None,
+                 lease_seconds: Optional[float] = None, enabled: bool = True):
+        self.backend = backend
+        self.budgets = budgets or ADMISSION_BUDGETS
+        self.lease_seconds = lease_seconds or settings.ADMISSION_LEASE_SECONDS
+        self.enabled = enabled
+
+    def budget(self, plan: Optional[str], cls: str) -> Budget:
+        return self.budgets.get(plan or DEFAULT_PLAN, self.budgets[DEFAULT_PLAN])[cls]
+
+    async def admit(self, tenant_id: str, plan: Optional[str], method: str, path: str) -> Admission:
+        cls = endpoint_class(method, path)
+        if not self.enabled:
+            return Admission(True, cls)
+        budget = self.budget(plan, cls)
+        key = f"{tenant_key(tenant_id)}:{cls}"
+        lease = None
+        try:
+            # 1. Concurrency first: a refused slot should not also burn a token
+            if budget.concurrency:
+                candidate = uuid.uuid4().hex
+                if not await self.backend.acquire(key, budget.concurrency, candidate, self.lease_seconds):
+                    return self._reject(cls, "concurrency", CONCURRENCY_RETRY_SECONDS)
+                lease = candidate
+
+            # 2. Rate
+            allowed, wait = await self.backend.take(key, budget.rate, budget.burst)
+            if not allowed:
+                if lease:
+                    await self.backend.release(key, lease)
+                return self._reject(cls, "rate", wait)
+        except Exception as e:
+            logger.error(f"Admission backend failed, admitting request: {e}")
+            ADMISSION_ERRORS_TOTAL.inc()
+            # A slot acquired before the failure is released with the response, like any other
+            return Admission(True, cls, key=key, lease=lease)
+        return Admission(True, cls, key=key, lease=lease)
+
+    async def release(self, admission: Admission):
+        if admission.lease is None:
+            return
+        try:
+            await self.backend.release(admission.key, admission.lease)
+        except Exception as e:
+            # The lease expires on its own after ADMISSION_LEASE_SECONDS
+            logger.error(f"Admission lease release failed: {e}")
+        admission.lease = None
+
+    async def release_after(self, response, admission: Admission):
+        """Release the slot once the body has been sent; streamed bodies hold it until their last chunk."""
+        if admission.lease is None:
+            return response
+        body = getattr(response, "body_iterator", None)
+        if body is None:
+            await self.release(admission)
+            return response
+
+        async def released():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                await self.release(admission)
+
+        response.body_iterator = released()
+        return response
+
+    def _reject(self, cls: str, reason: str, retry_after: float) -> Admission:
+        ADMISSION_REJECTIONS_TOTAL.inc(endpoint_class=cls, reason=reason)
+        return Admission(False, cls, reason=reason, retry_after=retry_after)
+
+def build_backend(url: Optional[str]) -> AdmissionBackend:
+    if url:
+        try:
+            return RedisAdmissionBackend(url)
+        except Exception as e:
+            logger.error(f"Shared admission backend unavailable, using per-process budgets: {e}")
+    return InMemoryAdmissionBackend()
+
+ADMISSION_REJECTIONS_TOTAL = REGISTRY.register(Counter(
+    "gst_admission_rejections_total", "Requests refused with 429, by endpoint class and reason (rate, concurrency).",
+    ["endpoint_class", "reason"]))
+ADMISSION_ERRORS_TOTAL = REGISTRY.register(Counter(
+    "gst_admission_backend_errors_total", "Admission checks that failed open because the backend errored."))
+
+# Global Accessor
+admission = AdmissionController(build_backend(settings.ADMISSION_BACKEND_URL), enabled=settings.ADMISSION_ENABLED)
+
+REGISTRY.register(Gauge(
+    "gst_admission_tracked_keys", "Token buckets and lease sets held by the in-process admission backend.",
+    lambda: admission.backend.tracked_keys() if isinstance(admission.backend, InMemoryAdmissionBackend) else 0))
@@ -1,19 +1,46 @@
-from openai import OpenAI, OpenAIError
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
 import json
 import logging
+import threading
+import time
 from app.schemas.explanation import ExplainRequest, ExplainResponse
 from app.schemas.reconciliation import ReconciliationStatus
 from app.core.config import settings
+from app.core.metrics import LLM_CALLS_TOTAL, LLM_FALLBACKS_TOTAL, LLM_REQUEST_SECONDS
+from app.core.explanation_cache import ExplanationCache, explanation_cache, mismatch_signature, signature_fields
+from app.core.scheduler import scheduler
 
 logger = logging.getLogger(__name__)
 
-# Initialize client (assumes OPENAI_API_KEY env var is set)
-# in production this should be handled more gracefully if key is missing
-try:
-    client = OpenAI()
-except Exception:
-    client = None
-    logger.warning("OpenAI client could not be initialized. AI features will respond with fallback.")
+_client = None
+_client_initialised = False
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Shared AsyncOpenAI client (one connection pool for every request), created on
+    first use: importing the openai package is the largest single cold-start cost.
+    Returns None if it cannot be initialised, e.g. OPENAI_API_KEY is not set.
+    """
+    global _client, _client_initialised
+    if not _client_initialised:
+        with _client_lock:
+            if not _client_initialised:
+                try:
+                    from openai import AsyncOpenAI
+                    _client = AsyncOpenAI(
+                        base_url=settings.OPENAI_BASE_URL,
+                        timeout=settings.AI_TIMEOUT_SECONDS,
+                        max_retries=0
+                    )
+                except Exception:
+                    _client = None
+                    logger.warning("OpenAI client could not be initialized. AI features will respond with fallback.")
+                _client_initialised = True
+    return _client
 
 SYSTEM_PROMPT = """
 You are a pure, read-only reconciliation analyst for a GST compliance system.
@@ -25,6 +52,14 @@ RULES:
 3. DO NOT advise on tax filing compliance (legal advice).
 4. IF there is no client, return "Needs human review".
 5. Output valid JSON only.
+6. DO NOT quote invoice numbers, GSTINs or amounts; refer to "this invoice". They are not
+   given to you and are added to your explanation separately.
+
+Differences are described by shape only: for a customer vs GSTR-2B value pair,
+"direction" is 1 when GSTR-2B is higher and -1 when lower, and "pct" is the size of
+the gap (0: under 0.1%, 1: under 1%, 2: under 5%, 3: under 10%, 4: under 25%,
+5: under 100%, 6: 100% or more). Other numbers are a sign and a half-decade band
+("+4" is 100 to 316); "<text>" marks a value present but not shown.
 
 OUTPUT FORMAT:
 {
@@ -34,51 +69,337 @@ OUTPUT FORMAT:
 }
 """
 
-def generate_explanation(request: ExplainRequest) -> ExplainResponse:
-    # 1. Fallback if no client or dangerous input
-    fallback_response = ExplainResponse(
+BATCH_INSTRUCTIONS = """
+You will receive several numbered items. Explain each one independently using the same rules.
+Output a single JSON object: {"items": [{"id": <item number>, "explanation": "...", "root_cause": "...", "suggested_action": "..."}]}
+"""
+
+# Model + prompt fingerprint: changing either stops old cache entries from matching
+CACHE_NAMESPACE = f"{settings.AI_MODEL}:{hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:16]}"
+
+def fallback_response(request: ExplainRequest) -> ExplainResponse:
+    return ExplainResponse(
         explanation="Automated explanation unavailable. Please review manually.",
         root_cause="System Limitation",
         suggested_action="Manual Review",
-        original_status=request.status
+        original_status=request.status,
+        source="fallback"
     )
 
-    if not client:
-        return fallback_response
+def build_user_content(request: ExplainRequest) -> str:
+    # Only the signature fields: the answer may be shared by every invoice with this
+    # signature, so it must not be able to quote this invoice's identifiers or amounts
+    fields = signature_fields(request)
+    return f"""
+    Status: {fields["status"]}
+    Differences: {json.dumps(fields["diffs"], sort_keys=True)}
 
-    # 2. Construct Prompt
-    user_content = f"""
-    Status: {request.status.value}
-    Invoice: {request.invoice_number} (GSTIN: {request.gstin})
-    Differences: {json.dumps(request.factual_diffs)}
-    
     Explain this situation.
     """
 
-    try:
-        # 3. Call LLM
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # or gpt-4
-            messages=[
+def build_batch_content(requests: Sequence[ExplainRequest]) -> str:
+    return "\n".join(f"Item {item_id}:{build_user_content(request)}" for item_id, request in enumerate(requests))
+
+def narrative(data: dict) -> dict:
+    """The shareable (identifier-free) part of a model answer; this is what is cached."""
+    return {
+        "explanation": data.get("explanation", "No explanation provided."),
+        "root_cause": data.get("root_cause", "Unknown"),
+        "suggested_action": data.get("suggested_action", "Review"),
+    }
+
+def with_facts(explanation: str, request: ExplainRequest) -> str:
+    """The request's own invoice number, GSTIN and exact differences around a shared narrative."""
+    facts = f"Invoice {request.invoice_number} (GSTIN: {request.gstin})"
+    if request.factual_diffs:
+        facts += f", differences {json.dumps(request.factual_diffs, sort_keys=True)}"
+    return f"{facts}: {explanation}"
+
+def to_response(data: dict, request: ExplainRequest) -> ExplainResponse:
+    text = narrative(data)
+    # Guardrail: Ensure we return the ORIGINAL status, completely ignoring anything AI might imply about status
+    return ExplainResponse(
+        explanation=with_facts(text["explanation"], request),
+        root_cause=text["root_cause"],
+        suggested_action=text["suggested_action"],
+        original_status=request.status
+    )
+
+def group_by_signature(requests: Sequence[ExplainRequest], tenant_id: str) -> Dict[str, List[int]]:
+    """Request indexes per mismatch signature, in first-seen order."""
+    groups: Dict[str, List[int]] = {}
+    for index, request in enumerate(requests):
+        groups.setdefault(mismatch_signature(request, tenant_id, CACHE_NAMESPACE), []).append(index)
+    return groups
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures (errors, timeouts or slow
+    calls) and short-circuits callers to the fallback for `reset_seconds`. After
+    that, calls are let through half-open: the next success closes it, a failure
+    re-opens it.
+    """
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if self._clock() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = self.HALF_OPEN
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("AI circuit breaker OPEN: provider failing or slow, serving fallback explanations.")
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+
+class ExplanationService:
+    """
+    Non-blocking LLM explanation client.
+    Concurrency is bounded globally and per tenant, every provider call has a hard
+    timeout, and a circuit breaker serves the fallback while the provider is unhealthy.
+    Successful explanations are cached by mismatch signature when a cache is given.
+    """
+
+    def __init__(self, llm_client=None, max_concurrency: Optional[int] = None,
+                 tenant_concurrency: Optional[int] = None, breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[ExplanationCache] = None, client_factory: Optional[Callable] = None):
+        self._client = llm_client
+        self._client_factory = client_factory
+        self.cache = cache
+        self.max_concurrency = max_concurrency or settings.AI_MAX_CONCURRENCY
+        self.tenant_concurrency = tenant_concurrency or settings.AI_TENANT_CONCURRENCY
+        self.breaker = breaker or CircuitBreaker(settings.AI_BREAKER_FAILURE_THRESHOLD, settings.AI_BREAKER_RESET_SECONDS)
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        # tenant_id -> [semaphore, active users]; entries are dropped when idle
+        self._tenants: Dict[str, List] = {}
+        self.stats = {"calls": 0, "fallbacks": 0, "timeouts": 0, "errors": 0, "short_circuited": 0}
+
+    @property
+    def client(self):
+        if self._client is None and self._client_factory is not None:
+            self._client = self._client_factory()
+            self._client_factory = None
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    @asynccontextmanager
+    async def _tenant_slot(self, tenant_id: str):
+        entry = self._tenants.setdefault(tenant_id, [asyncio.Semaphore(self.tenant_concurrency), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._tenants.pop(tenant_id, None)
+
+    async def complete(self, messages: List[dict], tenant_id: str) -> Optional[dict]:
+        """
+        One guarded chat completion returning the parsed JSON object,
+        or None when the caller should fall back.
+        """
+        if self._client is None and self._client_factory is not None:
+            # First use builds the client off the event loop (it imports openai)
+            await asyncio.to_thread(getattr, self, "client")
+        if self.client is None:
+            LLM_CALLS_TOTAL.inc(outcome="unavailable")
+            return None
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            LLM_CALLS_TOTAL.inc(outcome="short_circuit")
+            return None
+
+        deadline = time.monotonic() + settings.AI_TIMEOUT_SECONDS
+        started = None
+        try:
+            async with self._tenant_slot(tenant_id):
+                # Waiting for a slot is local back-pressure, not a provider failure
+                await asyncio.wait_for(self._global.acquire(), timeout=max(deadline - time.monotonic(), 0))
+                try:
+                    started = time.monotonic()
+                    self.stats["calls"] += 1
+                    response = await asyncio.wait_for(
+                        self.client.chat.completions.create(
+                            model=settings.AI_MODEL,
+                            messages=messages,
+                            temperature=0.0, # Deterministic output
+                            response_format={"type": "json_object"}
+                        ),
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+                finally:
+                    self._global.release()
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            LLM_CALLS_TOTAL.inc(outcome="timeout")
+            # Only a timeout inside the provider call counts against the breaker
+            if started is not None:
+                LLM_REQUEST_SECONDS.observe(time.monotonic() - started, outcome="timeout")
+                self.breaker.record_failure()
+            logger.error("AI Generation Failed: timed out")
+            return None
+        except Exception as e:
+            self.stats["errors"] += 1
+            LLM_CALLS_TOTAL.inc(outcome="error")
+            if started is not None:
+                LLM_REQUEST_SECONDS.observe(time.monotonic() - started, outcome="error")
+            self.breaker.record_failure()
+            logger.error(f"AI Generation Failed: {e}")
+            return None
+
+        elapsed = time.monotonic() - started
+        LLM_REQUEST_SECONDS.observe(elapsed, outcome="ok")
+        if elapsed > settings.AI_SLOW_CALL_SECONDS:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        try:
+            data = json.loads(response.choices[0].message.content)
+        except (json.JSONDecodeError, TypeError, AttributeError, IndexError) as e:
+            self.stats["errors"] += 1
+            LLM_CALLS_TOTAL.inc(outcome="invalid")
+            logger.error(f"AI Generation Failed: {e}")
+            return None
+        LLM_CALLS_TOTAL.inc(outcome="ok")
+        return data
+
+    async def explain(self, request: ExplainRequest, tenant_id: str = "PUBLIC") -> ExplainResponse:
+        key = None
+        if self.cache is not None:
+            key = mismatch_signature(request, tenant_id, CACHE_NAMESPACE)
+            cached = await self.cache.lookup(key)
+            if cached is not None:
+                return to_response(cached, request)
+
+        data = await self.complete(
+            [
                 {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_content}
+                {"role": "user", "content": build_user_content(request)}
             ],
-            temperature=0.0, # Deterministic output
-            response_format={"type": "json_object"}
+            tenant_id
         )
-        
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        
-        # 4. Validate & Guardrail
-        # Ensure we return the ORIGINAL status, completely ignoring anything AI might imply about status
-        return ExplainResponse(
-            explanation=data.get("explanation", "No explanation provided."),
-            root_cause=data.get("root_cause", "Unknown"),
-            suggested_action=data.get("suggested_action", "Review"),
-            original_status=request.status
+        if not isinstance(data, dict):
+            self.stats["fallbacks"] += 1
+            LLM_FALLBACKS_TOTAL.inc()
+            return fallback_response(request)
+
+        if key is not None:
+            self._remember(key, data)
+        return to_response(data, request)
+
+    def _remember(self, key: str, data: dict):
+        # Fallbacks are never cached; only the narrative is, status and facts are re-attached per request
+        self.cache.set(key, narrative(data))
+
+    async def _explain_pack(self, requests: Sequence[ExplainRequest], tenant_id: str) -> List[Optional[dict]]:
+        """One provider call for a pack of distinct mismatches; None marks an item to fall back."""
+        if len(requests) == 1:
+            return [await self.complete(
+                [
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": build_user_content(requests[0])}
+                ],
+                tenant_id
+            )]
+
+        data = await self.complete(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT + BATCH_INSTRUCTIONS},
+                {"role": "user", "content": build_batch_content(requests)}
+            ],
+            tenant_id
         )
+        results: List[Optional[dict]] = [None] * len(requests)
+        items = data.get("items") if isinstance(data, dict) else None
+        for item in items if isinstance(items, list) else []:
+            item_id = item.get("id") if isinstance(item, dict) else None
+            if isinstance(item_id, int) and 0 <= item_id < len(requests):
+                results[item_id] = item
+        return results
+
+    async def explain_batch(self, requests: Sequence[ExplainRequest], tenant_id: str = "PUBLIC",
+                            plan: Optional[str] = None) -> AsyncIterator[Tuple[int, ExplainResponse]]:
+        """
+        Yield (index, response) pairs as they become available.
+        Identical mismatches (same signature) share one narrative, built from an
+        identifier-free prompt; each item's own invoice number, GSTIN and differences
+        are rendered onto it. Cache hits are yielded first, and the remaining distinct
+        mismatches are packed several per prompt and run across a pool bounded by the
+        tenant concurrency.
+        """
+        # 1. Deduplicate by signature (canonicalising every item is CPU work: scheduled)
+        groups = await scheduler.run(
+            "explain", group_by_signature, requests, tenant_id,
+            tenant_id=tenant_id, plan=plan, cost=len(requests)
+        )
+
+        # 2. Answer cache hits immediately
+        pending: List[str] = []
+        for key, indexes in groups.items():
+            cached = await self.cache.lookup(key) if self.cache is not None else None
+            if cached is None:
+                pending.append(key)
+                continue
+            for index in indexes:
+                yield index, to_response(cached, requests[index])
+
+        # 3. Pack the misses and fan out; packs wait for a pool slot before their timeout starts
+        pack_size = max(settings.AI_BATCH_PACK_SIZE, 1)
+        pool = asyncio.Semaphore(self.tenant_concurrency)
+
+        async def run_pack(keys: List[str]):
+            async with pool:
+                return keys, await self._explain_pack([requests[groups[key][0]] for key in keys], tenant_id)
+
+        tasks = [asyncio.ensure_future(run_pack(pending[i:i + pack_size])) for i in range(0, len(pending), pack_size)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                keys, results = await next_done
+                for key, data in zip(keys, results):
+                    if isinstance(data, dict):
+                        if self.cache is not None:
+                            self._remember(key, data)
+                    else:
+                        self.stats["fallbacks"] += 1
+                        LLM_FALLBACKS_TOTAL.inc(len(groups[key]))
+                    for index in groups[key]:
+                        # Guardrail: status and facts always come from that item's own request
+                        request = requests[index]
+                        yield index, to_response(data, request) if isinstance(data, dict) else fallback_response(request)
+        finally:
+            # Client went away (or we are done): stop any packs still queued or in flight
+            for task in tasks:
+                task.cancel()
+
+# Global Accessor
+explanation_service = ExplanationService(client_factory=get_client, cache=explanation_cache)
+
+async def generate_explanation(request: ExplainRequest, tenant_id: str = "PUBLIC") -> ExplainResponse:
+    return await explanation_service.explain(request, tenant_id)
 
-    except (OpenAIError, json.JSONDecodeError, Exception) as e:
-        logger.error(f"AI Generation Failed: {e}")
-        return fallback_response
+def explain_batch(requests: Sequence[ExplainRequest], tenant_id: str = "PUBLIC",
+                  plan: Optional[str] = None) -> AsyncIterator[Tuple[int, ExplainResponse]]:
+    return explanation_service.explain_batch(requests, tenant_id, plan)
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import List
 from app.schemas.audit import AuditLogEntry
 import logging
+import time
+from app.core.metrics import AUDIT_SAVE_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +22,10 @@ class InMemoryAuditRepository(AuditRepository):
 
     def save(self, entry: AuditLogEntry):
         # Append-only, immutable by design (pydantic models are mutable by default but we generally treat them as such in store)
+        started = time.perf_counter()
         self._storage.append(entry)
         logger.info(f"Audit Logged: {entry.json()}")
+        AUDIT_SAVE_SECONDS.observe(time.perf_counter() - started)
 
     def get_all(self) -> List[AuditLogEntry]:
         return list(self._storage)
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "GST Reconciliation Agent"
@@ -11,6 +12,68 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "gst_agent"
 
+    # AI Explanations
+    # Point OPENAI_BASE_URL at benchmarks/stub_llm.py for load tests
+    OPENAI_BASE_URL: Optional[str] = None
+    AI_MODEL: str = "gpt-3.5-turbo"
+    AI_TIMEOUT_SECONDS: float = 10.0
+    AI_MAX_CONCURRENCY: int = 32
+    AI_TENANT_CONCURRENCY: int = 4
+    AI_BREAKER_FAILURE_THRESHOLD: int = 5
+    AI_BREAKER_RESET_SECONDS: float = 30.0
+    # Calls slower than this count as failures towards opening the breaker
+    AI_SLOW_CALL_SECONDS: float = 5.0
+    # Explanation cache (LRU + TTL); set AI_CACHE_PATH to a SQLite file to persist it
+    AI_CACHE_MAX_ENTRIES: int = 10000
+    AI_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    AI_CACHE_PATH: Optional[str] = None
+    # Distinct mismatches packed into one prompt by /explain-mismatch/batch
+    AI_BATCH_PACK_SIZE: int = 8
+
+    # Response compression (gzip, or brotli when installed) for JSON bodies at least
+    # this large; smaller ones are not worth the CPU
+    COMPRESSION_MIN_BYTES: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+
+    # Admission control: per-tenant token buckets and concurrency caps (budgets per plan
+    # in app.core.admission). A Redis URL shares budgets between workers.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_BACKEND_URL: Optional[str] = None
+    # Concurrency slots not released by then (crashed worker, lost client) free themselves
+    ADMISSION_LEASE_SECONDS: float = 300.0
+
+    # Worker threads for CPU-heavy jobs (uploads, GSTR-2B imports, snapshot restores, report builds,
+    # PDF renders, batch explanation prep), shared by all tenants through the weighted fair scheduler in app.core.scheduler
+    SCHEDULER_WORKERS: int = 2
+
+    # Tenant dataset snapshots (app.core.snapshots): written in the background on upload
+    # and periodically, loaded back lazily after a restart. Disabled unless a directory is set.
+    SNAPSHOT_DIR: Optional[str] = None
+    SNAPSHOT_INTERVAL_SECONDS: float = 60.0
+    # Datasets with at least this many invoices are served straight from their snapshot
+    # file (mmap'd columns) once written, instead of as Python objects
+    COLUMNAR_MIN_ROWS: int = 100_000
+
+    # Import heavy optional dependencies (ReportLab, OpenAI client, Jinja2) in a
+    # background thread once the server is up, instead of on the first request
+    PREWARM_ON_STARTUP: bool = True
+
+    # Event-loop monitor: lag sampler plus a detector for callbacks that block the loop
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_LAG_SAMPLE_SECONDS: float = 0.25
+    LOOP_SLOW_CALLBACK_SECONDS: float = 0.1
+    LOOP_SLOW_CALLBACK_HISTORY: int = 50
+    # GET /debug/event-loop exposes stack traces, source paths and routes: off unless
+    # explicitly enabled, and even then only for requests carrying a tenant id
+    DEBUG_ENDPOINTS_ENABLED: bool = False
+
+    # Tracing: spans are always recorded (trace ids land in audit entries) but only
+    # exported when one of these is set. OTLP/JSON either way.
+    TRACE_SERVICE_NAME: str = "gst-agent"
+    TRACE_EXPORT_PATH: Optional[str] = None
+    TRACE_OTLP_ENDPOINT: Optional[str] = None
+
     class Config:
         case_sensitive = True
 
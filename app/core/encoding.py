@@ -0,0 +1,125 @@
+from collections.abc import Sequence
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+from pydantic import BaseModel
+from starlette.responses import Response
+from app.core.config import settings
+from app.core.tracing import span
+import gzip
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# RESPONSE ENCODING
+# Large JSON bodies are encoded exactly once, straight to bytes (orjson when available).
+# The same bytes are hashed for the audit trail and then, if the client accepts it and
+# the body is big enough to be worth it, compressed once (brotli preferred, else gzip).
+
+def _default(value: Any):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Sequence):
+        # e.g. the lazily decoded results of a dataset served from its snapshot
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; enums, dates and pydantic models are handled like FastAPI does."""
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Optional[Tuple[str, ...]] = None) -> Optional[str]:
+    """
+    Content-coding to use for an Accept-Encoding header, or None for identity.
+    Highest q-value wins; ties go to the order of `available` (brotli first).
+    """
+    available = available or available_encodings()
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    if encoding == "gzip":
+        # mtime=0 keeps the output deterministic for identical bodies
+        return gzip.compress(body, compresslevel=settings.GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content-coding '{encoding}'")
+
+def body_encoding(body: bytes, accept_encoding: Optional[str]) -> Optional[str]:
+    """The content-coding encode_body would pick, without compressing anything."""
+    if len(body) < settings.COMPRESSION_MIN_BYTES:
+        return None
+    return negotiate_encoding(accept_encoding)
+
+def encode_body(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(payload, content-coding) for a client; small bodies are sent as they are."""
+    encoding = body_encoding(body, accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
+
+def json_response(
+    content: Any,
+    accept_encoding: Optional[str],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    JSON response encoded once. The SHA-256 of the uncompressed body rides along in the
+    internal X-Audit-Output-Hash header, so AuditMiddleware neither buffers nor re-hashes it.
+    """
+    with span("response.encode") as encoding_span:
+        body = dumps(content)
+        output_hash = hashlib.sha256(body).hexdigest()
+        payload, encoding = encode_body(body, accept_encoding)
+        encoding_span.set_attribute("body.bytes", len(body))
+        encoding_span.set_attribute("body.encoded_bytes", len(payload))
+    headers = dict(headers or {})
+    headers["X-Audit-Output-Hash"] = output_hash
+    headers["Vary"] = "Accept-Encoding" + (f", {headers['Vary']}" if headers.get("Vary") else "")
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,251 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from app.core.config import settings
+from app.core.metrics import REGISTRY, CallbackCounter, Gauge
+from app.schemas.explanation import ExplainRequest
+
+logger = logging.getLogger(__name__)
+
+# EXPLANATION CACHE
+# LLM explanations are requested at temperature 0 with a fixed system prompt, and the
+# prompt carries only the status and the *shape* of the differences (never the invoice
+# number, GSTIN or exact amounts; app.core.ai adds those to each response). Requests are
+# keyed by a canonical signature of those same fields and served from an LRU + TTL
+# cache, optionally backed by a persistent store. The store never runs on the event
+# loop: writes are queued to a single write-behind thread (so they stay ordered), and
+# lookup() reads it in a worker thread on a memory miss.
+
+# Bump when the signature normalisation changes, so old entries stop matching
+SIGNATURE_VERSION = 2
+
+# Relative-difference band edges for customer-vs-GSTR-2B pairs (fractions of the customer value)
+PCT_BANDS = [0.001, 0.01, 0.05, 0.1, 0.25, 1.0]
+
+def _bucket(value: float) -> str:
+    """Sign plus half-decade magnitude band: 1-3, 3-10, 10-30, ..."""
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else "+"
+    return f"{sign}{math.floor(math.log10(abs(value)) * 2)}"
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+def _pair_shape(value: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """{customer, gstr2b[, delta]} numeric pairs reduce to direction + relative band."""
+    customer, gstr2b = _number(value.get("customer")), _number(value.get("gstr2b"))
+    if customer is None or gstr2b is None:
+        return None
+    delta = gstr2b - customer
+    if not customer:
+        return {"delta": _bucket(delta)}
+    return {"direction": (delta > 0) - (delta < 0), "pct": bisect_right(PCT_BANDS, abs(delta / customer))}
+
+def _shape(value: Any) -> Any:
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, dict):
+        pair = _pair_shape(value)
+        if pair is not None:
+            return pair
+        return {str(k): _shape(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_shape(v) for v in value]
+    number = _number(value)
+    if number is not None and math.isfinite(number):
+        return _bucket(number)
+    # Identifiers, dates and free text only contribute their presence
+    return "<text>"
+
+def signature_fields(request: ExplainRequest) -> Dict[str, Any]:
+    """What an explanation may depend on: the status and the shape of the differences."""
+    return {"status": request.status.value, "diffs": _shape(request.factual_diffs)}
+
+def mismatch_signature(request: ExplainRequest, tenant_id: str, namespace: str = "") -> str:
+    """
+    Canonical hash of (status, diff categories, bucketed values) - exactly the fields
+    the prompt is built from, so a cached narrative holds nothing invoice-specific.
+    `namespace` should identify the model and prompt, so changing either invalidates
+    entries. Keys are still tenant-scoped: narratives never cross tenants.
+    """
+    canonical = json.dumps(
+        {"v": SIGNATURE_VERSION, "ns": namespace, "tenant": tenant_id, **signature_fields(request)},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ExplanationStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[float, dict]]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, expires_at: float, value: dict):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+class SqliteExplanationStore(ExplanationStore):
+    """Persistent backing so warm entries survive restarts. Writes are tiny, single-row upserts."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[float, dict]]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, value FROM explanations WHERE key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, key: str, expires_at: float, value: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, json.dumps(value))
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM explanations WHERE key = ?", (key,))
+
+class ExplanationCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, store: Optional[ExplanationStore] = None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """Synchronous lookup, reading through to the store on a miss. Async callers use lookup()."""
+        entry = self._entries.get(key)
+        if entry is None and self.store is not None:
+            entry = self._load(key)
+        return self._served(key, entry)
+
+    async def lookup(self, key: str) -> Optional[dict]:
+        """get() for the event loop: a store read on a memory miss runs in a worker thread."""
+        entry = self._entries.get(key)
+        if entry is None and self.store is not None:
+            loaded = await asyncio.to_thread(self._load, key)
+            # A set() may have landed while the store was being read; it is newer
+            entry = self._entries.get(key) or loaded
+        return self._served(key, entry)
+
+    def set(self, key: str, value: dict):
+        expires_at = self._clock() + self.ttl_seconds
+        self._put(key, (expires_at, dict(value)))
+        if self.store is not None:
+            self._write_behind("write", self.store.set, key, expires_at, dict(value))
+
+    def flush(self):
+        """Block until every queued store write has been applied."""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def _load(self, key: str) -> Optional[Tuple[float, dict]]:
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            logger.error(f"Explanation store read failed: {e}")
+            return None
+
+    def _served(self, key: str, entry: Optional[Tuple[float, dict]]) -> Optional[dict]:
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            self._entries.pop(key, None)
+            if self.store is not None:
+                self._write_behind("delete", self.store.delete, key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._put(key, entry)
+        self.hits += 1
+        return dict(value)
+
+    def _write_behind(self, action: str, fn, *args):
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explanation-store")
+
+        def apply():
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Explanation store {action} failed: {e}")
+
+        self._writer.submit(apply)
+
+    def _put(self, key: str, entry: Tuple[float, dict]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self.store is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Global Accessor
+explanation_cache = ExplanationCache(
+    settings.AI_CACHE_MAX_ENTRIES,
+    settings.AI_CACHE_TTL_SECONDS,
+    store=SqliteExplanationStore(settings.AI_CACHE_PATH) if settings.AI_CACHE_PATH else None
+)
+
+REGISTRY.register(CallbackCounter(
+    "gst_explanation_cache_lookups_total", "Explanation cache lookups by result.",
+    lambda: {"hit": explanation_cache.hits, "miss": explanation_cache.misses}, ["result"]))
+REGISTRY.register(Gauge(
+    "gst_explanation_cache_entries", "Entries held in the in-memory explanation cache.",
+    lambda: len(explanation_cache._entries)))
@@ -0,0 +1,128 @@
+from datetime import date
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, Optional
+import csv
+import hashlib
+import io
+import json
+import zlib
+from app.core.money import format_rupees, paise_to_rupees
+from app.core.encoding import negotiate_encoding
+from app.core.results_index import STATUS_CODES
+
+# BULK EXPORT OF STORED RECONCILIATION RESULTS
+# Every stage is a generator over the precomputed results: rows are serialised in
+# small batches and never collected into a full document in memory.
+# Rows are tuples in EXPORT_COLUMNS order (amounts in paise, diffs as a dict), read
+# either from the invoice/result objects or straight from a mapped dataset's columns.
+
+EXPORT_COLUMNS = [
+    "invoice_number", "gstin", "invoice_date", "status",
+    "taxable_value", "cgst", "sgst", "igst", "itc_amount",
+    "explanation", "suggested_action", "diffs"
+]
+
+# Rows serialised per yielded chunk
+ROWS_PER_CHUNK = 500
+
+STATUS_VALUES = {code: status.value for status, code in STATUS_CODES.items()}
+
+def _status(value) -> str:
+    return value.value if hasattr(value, "value") else str(value)
+
+def object_rows(invoices: Iterable, results: Iterable[dict]) -> Iterator[tuple]:
+    for inv, r in zip(invoices, results):
+        yield (
+            r["invoice_number"], r["gstin"], inv.invoice_date.isoformat(), _status(r["status"]),
+            inv.taxable_value_paise, inv.cgst_paise, inv.sgst_paise, inv.igst_paise, inv.itc_paise,
+            r.get("explanation"), r.get("suggested_action"), r.get("diffs", {})
+        )
+
+def column_rows(columns: Any) -> Iterator[tuple]:
+    """Rows of a mapped dataset (app.core.snapshots), without building invoices or results."""
+    iso_date = lru_cache(maxsize=None)(lambda ordinal: date.fromordinal(ordinal).isoformat())
+    for number, gstin, ordinal, code, taxable, cgst, sgst, igst, itc, explanation, action, diffs in zip(
+        columns.invoice_number, columns.gstin, columns.invoice_date, columns.status,
+        columns.taxable_value, columns.cgst, columns.sgst, columns.igst, columns.itc,
+        columns.explanation, columns.suggested_action, columns.diffs
+    ):
+        yield (
+            number, gstin, iso_date(ordinal), STATUS_VALUES[code],
+            taxable, cgst, sgst, igst, itc, explanation, action, json.loads(diffs)
+        )
+
+def export_rows(tenant_data: dict) -> Iterator[tuple]:
+    columns = tenant_data.get("columns")
+    if columns is not None:
+        return column_rows(columns)
+    return object_rows(tenant_data.get("invoices", []), tenant_data["reconciliation"])
+
+def iter_csv(rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 1
+    for number, gstin, day, status, taxable, cgst, sgst, igst, itc, explanation, action, diffs in rows:
+        writer.writerow([
+            number, gstin, day, status,
+            format_rupees(taxable), format_rupees(cgst), format_rupees(sgst), format_rupees(igst), format_rupees(itc),
+            explanation, action, json.dumps(diffs, sort_keys=True) if diffs else ""
+        ])
+        pending += 1
+        if pending >= ROWS_PER_CHUNK:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_ndjson(rows: Iterable[tuple]) -> Iterator[bytes]:
+    lines = []
+    for number, gstin, day, status, taxable, cgst, sgst, igst, itc, explanation, action, diffs in rows:
+        lines.append(json.dumps({
+            "invoice_number": number,
+            "gstin": gstin,
+            "invoice_date": day,
+            "status": status,
+            "taxable_value": paise_to_rupees(taxable),
+            "cgst": paise_to_rupees(cgst),
+            "sgst": paise_to_rupees(sgst),
+            "igst": paise_to_rupees(igst),
+            "itc_amount": paise_to_rupees(itc),
+            "explanation": explanation,
+            "suggested_action": action,
+            "diffs": diffs
+        }))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+def hashed(chunks: Iterable[bytes], on_complete: Callable[[Optional[str]], None]) -> Iterator[bytes]:
+    """
+    Pass chunks through while hashing them. `on_complete` receives the SHA-256 of
+    everything emitted, or None if the stream was aborted (e.g. client disconnect).
+    """
+    hasher = hashlib.sha256()
+    completed = False
+    try:
+        for chunk in chunks:
+            hasher.update(chunk)
+            yield chunk
+        completed = True
+    finally:
+        on_complete(hasher.hexdigest() if completed else None)
+
+def gzipped(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Incremental gzip framing of a byte stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    return negotiate_encoding(accept_encoding, ("gzip",)) == "gzip"
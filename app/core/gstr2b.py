@@ -0,0 +1,276 @@
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+import codecs
+import hashlib
+import json
+import re
+from pydantic import ValidationError
+from app.schemas.invoice import Invoice
+from app.core.matching import Gstr2bIndex
+from app.core.tracing import span
+
+# GSTR-2B PORTAL JSON IMPORT
+# The portal's GSTR-2B download nests supplier invoices as data.docdata.b2b[].inv[] and
+# runs to hundreds of MB for large taxpayers, so it is never parsed as one document:
+#   - the structure around the invoices (data, docdata, b2b, supplier objects) is walked
+#     by a small incremental scanner over a bounded text buffer
+#   - every inv[] element is decoded on its own by the C JSON decoder (amounts as
+#     Decimal, so paise stay exact), flattened to an Invoice with source "gstr2b" and
+#     added to the match index straight away
+#   - sections other than b2b (b2ba, cdnr, isd, impg, ...) are skipped without decoding
+#   - with a record cap (per plan, see app.api.gstr2b), parsing stops at the first record
+#     over it, counting invoices still waiting for their supplier's ctin
+# Only the flattened records are kept; the document text is dropped as it is consumed.
+
+GSTR2B_SOURCE = "gstr2b"
+CHUNK_SIZE = 1 << 20
+# A single value (an invoice, a key) larger than this is not GSTR-2B data
+MAX_VALUE_CHARS = 16 << 20
+# Item fields summed into the flattened record, and their Invoice field names
+AMOUNT_FIELDS = {"txval": "taxable_value", "cgst": "cgst", "sgst": "sgst", "igst": "igst"}
+
+class Gstr2bFormatError(ValueError):
+    """The document is not valid JSON or not shaped like a GSTR-2B download."""
+
+class Gstr2bLimitError(ValueError):
+    """The document holds more b2b invoices than the caller allows."""
+
+class _JsonStream:
+    """Cursor over a JSON byte stream that only ever holds the unconsumed tail in memory."""
+
+    _WHITESPACE = re.compile(r"[ \t\n\r]*")
+    # Strings (skipped whole), brackets, or a lone quote: a string cut off by the buffer end
+    _STRUCTURE = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]|"')
+
+    def __init__(self, fileobj: BinaryIO):
+        self._file = fileobj
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder(parse_float=Decimal)
+        self.hasher = hashlib.sha256()
+        self.bytes_read = 0
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self._file.read(CHUNK_SIZE)
+        self.hasher.update(chunk)
+        self.bytes_read += len(chunk)
+        try:
+            text = self._text.decode(chunk, final=not chunk)
+        except UnicodeDecodeError:
+            raise Gstr2bFormatError("Invalid encoding: GSTR-2B JSON must be UTF-8.")
+        if not chunk:
+            self.eof = True
+        # Drop what has been consumed
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        if len(self.buf) > MAX_VALUE_CHARS:
+            raise Gstr2bFormatError("Malformed GSTR-2B JSON: value too large.")
+        return bool(chunk) or bool(text)
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it; '' at the end."""
+        while True:
+            self.pos = self._WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str) -> str:
+        found = self.peek()
+        if found not in expected or not found:
+            raise Gstr2bFormatError(f"Malformed GSTR-2B JSON at byte ~{self.bytes_read}: expected one of {expected!r}.")
+        self.pos += 1
+        return found
+
+    def value(self) -> Any:
+        """Decode the complete value at the cursor."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+                # A number ending exactly at the buffer end may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise Gstr2bFormatError(f"Malformed GSTR-2B JSON at byte ~{self.bytes_read}.")
+            self._fill()
+
+    def skip(self):
+        """Consume the value at the cursor without decoding it."""
+        if self.peek() not in "{[":
+            self.value()
+            return
+        depth = 0
+        while True:
+            for match in self._STRUCTURE.finditer(self.buf, self.pos):
+                token = match.group()
+                if token == '"':
+                    # Unterminated string: resume from its opening quote once more is read
+                    self.pos = match.start()
+                    break
+                if token in "[{":
+                    depth += 1
+                elif token in "]}":
+                    depth -= 1
+                    if depth == 0:
+                        self.pos = match.end()
+                        return
+            else:
+                self.pos = len(self.buf)
+            if not self._fill():
+                raise Gstr2bFormatError("Malformed GSTR-2B JSON: unexpected end of document.")
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object at the cursor; the caller consumes each value before resuming."""
+        self.take("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise Gstr2bFormatError("Malformed GSTR-2B JSON: object key is not a string.")
+            self.take(":")
+            yield key
+            if self.take(",}") == "}":
+                return
+
+    def items(self) -> Iterator[int]:
+        """Positions of the array at the cursor; the caller consumes each element before resuming."""
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        position = 0
+        while True:
+            yield position
+            position += 1
+            if self.take(",]") == "]":
+                return
+
+def _portal_date(value: str) -> date:
+    # The portal writes dates as DD-MM-YYYY
+    day, month, year = value.split("-")
+    return date(int(year), int(month), int(day))
+
+def flatten_invoice(ctin: str, inv: Dict[str, Any]) -> Invoice:
+    """One b2b invoice as a GSTR-2B record: item amounts summed, in the CSV row representation."""
+    items = inv.get("items")
+    rows = items if items else [inv]
+    amounts = {field: sum((Decimal(row.get(key) or 0) for row in rows), Decimal(0)) for key, field in AMOUNT_FIELDS.items()}
+    return Invoice(
+        gstin=ctin,
+        invoice_no=str(inv["inum"]),
+        invoice_date=_portal_date(inv["dt"]),
+        source=GSTR2B_SOURCE,
+        **amounts
+    )
+
+class _Import:
+    def __init__(self, max_records: Optional[int] = None):
+        self.max_records = max_records
+        self.records: List[Invoice] = []
+        # Built while parsing; records are never claimed here
+        self.index = Gstr2bIndex()
+        self.meta: Dict[str, Optional[str]] = {"gstin": None, "rtnprd": None}
+        self.suppliers = 0
+        self.skipped: Counter = Counter()
+
+    def admit(self, pending: int = 0):
+        """Raise if one more record, after `pending` ones not yet added, would exceed the cap."""
+        if self.max_records is not None and len(self.records) + pending >= self.max_records:
+            raise Gstr2bLimitError(f"More than {self.max_records} b2b invoices")
+
+    def add(self, supplier: int, position: int, ctin: str, inv: Any):
+        self.admit()
+        try:
+            record = flatten_invoice(ctin, inv)
+        except (ValidationError, KeyError, ValueError, TypeError, ArithmeticError, AttributeError) as e:
+            detail = e.errors()[0]["msg"] if isinstance(e, ValidationError) else f"{type(e).__name__}: {e}"
+            raise Gstr2bFormatError(f"b2b[{supplier}].inv[{position}]: invalid invoice ({detail})")
+        self.records.append(record)
+        self.index.add(record)
+
+def _supplier(stream: _JsonStream, result: _Import, supplier: int):
+    ctin = None
+    # Invoices seen before the supplier's ctin (keys are unordered in JSON)
+    pending = []
+    for key in stream.members():
+        if key == "ctin":
+            ctin = stream.value()
+            if not isinstance(ctin, str):
+                raise Gstr2bFormatError(f"b2b[{supplier}]: ctin is not a string")
+            for position, inv in pending:
+                result.add(supplier, position, ctin, inv)
+            pending = []
+        elif key == "inv":
+            for position in stream.items():
+                if ctin is None:
+                    result.admit(len(pending))
+                    pending.append((position, stream.value()))
+                else:
+                    result.add(supplier, position, ctin, stream.value())
+        else:
+            stream.skip()
+    if ctin is None:
+        raise Gstr2bFormatError(f"b2b[{supplier}]: missing supplier GSTIN (ctin)")
+    result.suppliers += 1
+
+def _docdata(stream: _JsonStream, result: _Import):
+    for key in stream.members():
+        if key == "b2b":
+            for supplier in stream.items():
+                _supplier(stream, result, supplier)
+        else:
+            result.skipped[key] += 1
+            stream.skip()
+
+def _document(stream: _JsonStream, result: _Import):
+    # Both the full download ({"data": {...}}) and its inner object are accepted
+    for key in stream.members():
+        if key == "data":
+            _document(stream, result)
+        elif key == "docdata":
+            _docdata(stream, result)
+        elif key in result.meta:
+            result.meta[key] = stream.value()
+        else:
+            stream.skip()
+
+def parse_gstr2b(fileobj: BinaryIO, max_records: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Stream a portal GSTR-2B JSON download into records and a ready match index (CPU-bound).
+    Raises Gstr2bFormatError on malformed JSON or invoices, and Gstr2bLimitError as soon
+    as a b2b invoice beyond `max_records` is reached.
+    """
+    stream = _JsonStream(fileobj)
+    result = _Import(max_records)
+    with span("gstr2b.parse") as parsing:
+        if stream.peek() != "{":
+            raise Gstr2bFormatError("Malformed GSTR-2B JSON: expected an object.")
+        _document(stream, result)
+        if stream.peek() != "":
+            raise Gstr2bFormatError("Malformed GSTR-2B JSON: trailing data after the document.")
+        parsing.set_attribute("gstr2b.bytes", stream.bytes_read)
+        parsing.set_attribute("gstr2b.records", len(result.records))
+
+    return {
+        "records": result.records,
+        # Sorted once here; every reconciliation then matches against its own claim-free fork
+        "index": result.index.fork(),
+        "gstin": result.meta["gstin"],
+        "return_period": result.meta["rtnprd"],
+        "suppliers": result.suppliers,
+        "skipped_sections": sorted(result.skipped),
+        "content_hash": stream.hasher.hexdigest(),
+        "bytes": stream.bytes_read,
+    }
@@ -0,0 +1,74 @@
+from typing import Optional
+from app.schemas.reconciliation import MatchTolerance
+from app.core.reconciliation import ENGINE_VERSION
+import hashlib
+
+# DATA VERSIONS & CONDITIONAL GET
+# Every stored dataset carries a data version: a hash of exactly what produced it
+# (uploaded bytes, plan, matching tolerance, engine version). Reports are a pure
+# function of the dataset, so anything built from it is cached against the version
+# and served with an ETag; If-None-Match then answers 304 without rebuilding.
+
+# Per-endpoint Cache-Control. Report data is tenant-specific, so shared caches (the
+# CDN) must not store it ("private"); browsers may keep a copy but must revalidate
+# every time ("no-cache"), which is a cheap 304 while the data version is unchanged.
+CACHE_CONTROL_REPORT = "private, no-cache"
+CACHE_CONTROL_PDF = "private, no-cache"
+CACHE_CONTROL_EXPORT = "private, no-cache"
+# Responses differ per tenant, identified by header or cookie
+VARY = "X-Tenant-ID, Cookie"
+
+def data_version(content: bytes, plan: str, tolerance: MatchTolerance, gstr2b_hash: Optional[str] = None) -> str:
+    """Version of a dataset: identical inputs to the same engine give the same version."""
+    hasher = hashlib.sha256()
+    hasher.update(f"{ENGINE_VERSION}\0{plan}\0{tolerance.model_dump_json()}\0".encode("utf-8"))
+    if gstr2b_hash:
+        # Matched against a portal GSTR-2B download: a new download is a new dataset
+        hasher.update(f"gstr2b:{gstr2b_hash}\0".encode("utf-8"))
+    hasher.update(content)
+    return hasher.hexdigest()
+
+def tenant_data_version(tenant_data: dict) -> str:
+    """The dataset's version; datasets stored without one get a per-dataset version."""
+    version = tenant_data.get("data_version")
+    if version is None:
+        seed = f"{id(tenant_data)}\0{tenant_data.get('timestamp')}\0{len(tenant_data.get('invoices', []))}"
+        version = hashlib.sha256(seed.encode("utf-8")).hexdigest()
+        tenant_data["data_version"] = version
+    return version
+
+def strong_etag(version: str, content_hash: str) -> str:
+    return f'"{version[:16]}-{content_hash[:16]}"'
+
+def weak_etag(version: str, variant: str) -> str:
+    # Weak: semantically the same representation, not byte-identical (e.g. PDF metadata)
+    return f'W/"{version[:16]}-{variant}"'
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong ETags differ per content-coding: "v-h" becomes "v-h-gzip"."""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match evaluation (RFC 9110: weak comparison, list or '*')."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque(candidate) == _opaque(etag) for candidate in if_none_match.split(","))
+
+def report_cache(tenant_data: dict) -> dict:
+    """
+    Per-dataset cache of built representations. It lives on the dataset itself, so a
+    new upload (which replaces the dataset) discards it with the data it was built from.
+    """
+    cache = tenant_data.get("_report_cache")
+    if cache is None or cache.get("version") != tenant_data_version(tenant_data):
+        cache = {"version": tenant_data_version(tenant_data)}
+        tenant_data["_report_cache"] = cache
+    return cache
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_SLOW_CALLBACKS_TOTAL, EVENT_LOOP_SLOW_CALLBACK_SECONDS
+from app.core.tracing import trace_id_in
+
+logger = logging.getLogger(__name__)
+
+# EVENT-LOOP LAG MONITOR
+# Two cheap, always-on probes:
+#   1. A lag sampler task: sleeps a fixed interval and records how late it wakes up.
+#   2. A slow-callback detector: every callback the loop runs is timed (two clock reads).
+#      Callbacks over the threshold are attributed to the request whose context they
+#      ran in (endpoint, tenant, trace id). A watchdog thread grabs the loop thread's
+#      stack while a callback is still stalled, so the report shows the blocking line.
+# Tenant ids act as credentials, so stalls only ever carry a tenant fingerprint.
+
+# Stack frames kept per stall, innermost last
+STACK_DEPTH = 12
+# Lag samples kept for the debug endpoint
+LAG_HISTORY = 240
+
+_current_request: ContextVar[Optional[tuple]] = ContextVar("loop_monitor_request", default=None)
+
+def tenant_fingerprint(tenant_id: Optional[str]) -> Optional[str]:
+    """Stable, non-reversible tenant reference for diagnostics."""
+    if not tenant_id:
+        return None
+    return hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:12]
+
+def bind_request(scope: dict, tenant_id: Optional[str]) -> Token:
+    """Attach the request to the current context; callbacks it schedules inherit it."""
+    return _current_request.set((scope, tenant_fingerprint(tenant_id)))
+
+def unbind_request(token: Token):
+    _current_request.reset(token)
+
+def _describe_callback(handle: asyncio.Handle) -> str:
+    callback = getattr(handle, "_callback", None)
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        return f"Task {owner.get_name()} ({getattr(coro, '__qualname__', coro)})"
+    return getattr(callback, "__qualname__", None) or repr(callback)[:120]
+
+def _request_details(handle: asyncio.Handle) -> Dict[str, Any]:
+    context = getattr(handle, "_context", None)
+    if context is None:
+        return {"route": None, "method": None, "path": None, "tenant": None, "trace_id": None}
+    bound = context.get(_current_request)
+    scope, tenant = bound if bound else ({}, None)
+    route = scope.get("route")
+    return {
+        "route": getattr(route, "path", None),
+        "method": scope.get("method"),
+        "path": scope.get("path"),
+        "tenant": tenant,
+        "trace_id": trace_id_in(context),
+    }
+
+class LoopMonitor:
+    def __init__(self, sample_seconds: float, slow_callback_seconds: float, history: int):
+        self.sample_seconds = sample_seconds
+        self.slow_callback_seconds = slow_callback_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lags: Deque[float] = deque(maxlen=LAG_HISTORY)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread: Optional[int] = None
+        # Written by the loop thread around each callback, read by the watchdog
+        self._callback_started: Optional[float] = None
+        self._stall_stack: Optional[tuple] = None
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Start monitoring `loop` (default: the running loop). Must be called on the loop's thread."""
+        if self.running:
+            return
+        self.loop = loop or asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        try:
+            self._sampler = self.loop.create_task(self._sample(), name="loop-lag-sampler")
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+            # Last, so a failed start never leaves the hook behind
+            _install_hook()
+        except BaseException:
+            self.stop()
+            raise
+
+    def stop(self):
+        if not self.running:
+            return
+        _remove_hook()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.cancel()
+        self.loop = None
+        self._sampler = None
+        self._watchdog = None
+
+    async def _sample(self):
+        while True:
+            expected = time.perf_counter() + self.sample_seconds
+            await asyncio.sleep(self.sample_seconds)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.lags.append(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+    def _watch(self):
+        interval = self.slow_callback_seconds / 2
+        while not self._stop.wait(interval):
+            started = self._callback_started
+            if started is None or time.perf_counter() - started < self.slow_callback_seconds:
+                continue
+            if self._stall_stack is not None and self._stall_stack[0] == started:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                stack = traceback.format_stack(frame, limit=STACK_DEPTH)
+                self._stall_stack = (started, [line.rstrip() for line in stack])
+
+    def on_slow_callback(self, handle: asyncio.Handle, started: float, elapsed: float):
+        details = _request_details(handle)
+        stack = self._stall_stack[1] if self._stall_stack and self._stall_stack[0] == started else None
+        stall = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed * 1000, 2),
+            "callback": _describe_callback(handle),
+            **details,
+            "stack": stack,
+        }
+        self.stalls.append(stall)
+        route = details["route"] or ("<no request>" if details["path"] is None else "<unrouted>")
+        EVENT_LOOP_SLOW_CALLBACKS_TOTAL.inc(route=route)
+        EVENT_LOOP_SLOW_CALLBACK_SECONDS.observe(elapsed, route=route)
+        logger.warning(
+            f"Event loop blocked for {stall['duration_ms']}ms by {stall['callback']} "
+            f"(route={route}, tenant={details['tenant']}, trace_id={details['trace_id']})"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        lags = sorted(self.lags)
+        return {
+            "running": self.running,
+            "sample_seconds": self.sample_seconds,
+            "slow_callback_threshold_ms": self.slow_callback_seconds * 1000,
+            "lag": {
+                "samples": len(lags),
+                "last_ms": round(self.lags[-1] * 1000, 2) if lags else None,
+                "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2) if lags else None,
+                "max_ms": round(lags[-1] * 1000, 2) if lags else None,
+            },
+            "slow_callbacks": list(reversed(self.stalls)),
+        }
+
+# Global Accessor
+monitor = LoopMonitor(
+    settings.LOOP_LAG_SAMPLE_SECONDS,
+    settings.LOOP_SLOW_CALLBACK_SECONDS,
+    settings.LOOP_SLOW_CALLBACK_HISTORY
+)
+
+# CALLBACK TIMING HOOK
+# asyncio runs every ready callback (task steps included) through Handle._run, which is
+# wrapped only while the monitor runs: start() installs the wrapper, stop() puts the
+# original back. Loops that do not use asyncio.Handle (e.g. uvloop) keep the lag sampler only.
+
+# The unwrapped Handle._run while the hook is installed, else None
+_original_run = None
+
+def _timed_run(self):
+    original = _original_run
+    if original is None:
+        # Removed while this handle was already dispatched (another loop thread)
+        return asyncio.Handle._run(self)
+    if self._loop is not monitor.loop:
+        return original(self)
+    started = time.perf_counter()
+    monitor._callback_started = started
+    try:
+        return original(self)
+    finally:
+        monitor._callback_started = None
+        elapsed = time.perf_counter() - started
+        if elapsed >= monitor.slow_callback_seconds:
+            try:
+                monitor.on_slow_callback(self, started, elapsed)
+            except Exception as e:
+                logger.error(f"Slow callback recording failed: {e}")
+
+def _install_hook():
+    global _original_run
+    if _original_run is not None:
+        return
+    _original_run = asyncio.Handle._run
+    asyncio.Handle._run = _timed_run
+
+def _remove_hook():
+    global _original_run
+    # Someone else wrapped Handle._run after us: leave the chain intact (we stay a pass-through)
+    if _original_run is None or asyncio.Handle._run is not _timed_run:
+        return
+    asyncio.Handle._run = _original_run
+    _original_run = None
@@ -0,0 +1,160 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple, Iterable, Any
+from app.schemas.invoice import Invoice
+from app.schemas.reconciliation import MatchTolerance
+from app.core.money import to_paise, paise_to_rupees
+
+# GSTR-2B CANDIDATE INDEX
+# Used only by the authoritative engine in app/core/reconciliation.py.
+# Records are bucketed per supplier GSTIN and kept sorted by taxable value so that
+# candidates within the tolerance band are found by binary search instead of a scan.
+
+TAX_HEADS = ("cgst", "sgst", "igst")
+
+def _allowance(value_paise: int, abs_tol: float, pct_tol: float) -> int:
+    """Allowed deviation in paise. Tolerances are configured in rupees / percent."""
+    return max(to_paise(abs_tol), int(abs(value_paise) * pct_tol / 100.0))
+
+def _paise(inv: Invoice, field: str) -> int:
+    return getattr(inv, f"{field}_paise")
+
+class Gstr2bIndex:
+    """
+    Sorted per-GSTIN view over GSTR-2B records.
+    Each record may be claimed by at most one customer invoice, so matching the
+    same upload twice in the same order always yields the same pairs.
+    """
+
+    def __init__(self, records: Iterable[Invoice] = ()):
+        self._records: List[Invoice] = []
+        self._by_gstin: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._by_number: Dict[Tuple[str, str], List[int]] = {}
+        self._claimed = set()
+        self._sorted = True
+        for rec in records:
+            self.add(rec)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, record: Invoice):
+        pos = len(self._records)
+        self._records.append(record)
+        keys, positions = self._by_gstin.setdefault(record.gstin, ([], []))
+        keys.append(record.taxable_value_paise)
+        positions.append(pos)
+        self._by_number.setdefault((record.gstin, record.invoice_number), []).append(pos)
+        self._sorted = False
+
+    def _ensure_sorted(self):
+        if self._sorted:
+            return
+        for gstin, (keys, positions) in self._by_gstin.items():
+            # Tie-break on insertion position to keep ordering stable and deterministic
+            order = sorted(range(len(keys)), key=lambda i: (keys[i], positions[i]))
+            self._by_gstin[gstin] = ([keys[i] for i in order], [positions[i] for i in order])
+        self._sorted = True
+
+    def fork(self) -> "Gstr2bIndex":
+        """
+        Same records with no claims, for matching another upload against them. Forks share
+        the (sorted, read-only) buckets, so records must not be added to the original afterwards.
+        """
+        self._ensure_sorted()
+        fork = Gstr2bIndex()
+        fork._records = self._records
+        fork._by_gstin = self._by_gstin
+        fork._by_number = self._by_number
+        return fork
+
+    def record(self, pos: int) -> Invoice:
+        return self._records[pos]
+
+    def claim(self, pos: int):
+        self._claimed.add(pos)
+
+    def candidates(self, inv: Invoice, tolerance: MatchTolerance) -> List[int]:
+        """Unclaimed records for the same supplier whose amounts and date fall inside the tolerance."""
+        self._ensure_sorted()
+        bucket = self._by_gstin.get(inv.gstin)
+        if not bucket:
+            return []
+        keys, positions = bucket
+
+        band = _allowance(inv.taxable_value_paise, tolerance.taxable_value_abs, tolerance.taxable_value_pct)
+        lo = bisect_left(keys, inv.taxable_value_paise - band)
+        hi = bisect_right(keys, inv.taxable_value_paise + band)
+
+        tax_allowances = [
+            (head, _paise(inv, head), _allowance(_paise(inv, head), tolerance.tax_abs, tolerance.tax_pct))
+            for head in TAX_HEADS
+        ]
+
+        found = []
+        for pos in positions[lo:hi]:
+            if pos in self._claimed:
+                continue
+            rec = self._records[pos]
+            if abs((rec.invoice_date - inv.invoice_date).days) > tolerance.date_window_days:
+                continue
+            if all(abs(value - _paise(rec, head)) <= allowed for head, value, allowed in tax_allowances):
+                found.append(pos)
+        return found
+
+    def best_match(self, inv: Invoice, tolerance: MatchTolerance) -> Optional[int]:
+        """Closest candidate: same invoice number first, then smallest total delta, then nearest date."""
+        found = self.candidates(inv, tolerance)
+        if not found:
+            return None
+
+        def rank(pos: int):
+            rec = self._records[pos]
+            amount_delta = abs(inv.taxable_value_paise - rec.taxable_value_paise) + sum(
+                abs(_paise(inv, head) - _paise(rec, head)) for head in TAX_HEADS
+            )
+            return (
+                rec.invoice_number != inv.invoice_number,
+                amount_delta,
+                abs((rec.invoice_date - inv.invoice_date).days),
+                rec.invoice_number,
+                pos,
+            )
+
+        return min(found, key=rank)
+
+    def same_number(self, inv: Invoice) -> Optional[int]:
+        """First unclaimed record carrying the same supplier GSTIN and invoice number."""
+        for pos in self._by_number.get((inv.gstin, inv.invoice_number), []):
+            if pos not in self._claimed:
+                return pos
+        return None
+
+def compute_diffs(inv: Invoice, rec: Invoice) -> Dict[str, Any]:
+    """
+    Precise per-field deltas (customer minus GSTR-2B). Only differing fields are reported.
+    Deltas are computed on exact paise and expressed in rupees.
+    """
+    diffs: Dict[str, Any] = {"gstr2b_invoice_number": rec.invoice_number}
+
+    if rec.invoice_number != inv.invoice_number:
+        diffs["invoice_number"] = {"customer": inv.invoice_number, "gstr2b": rec.invoice_number}
+
+    for field in ("taxable_value",) + TAX_HEADS:
+        customer_paise = _paise(inv, field)
+        gstr2b_paise = _paise(rec, field)
+        delta = customer_paise - gstr2b_paise
+        if delta != 0:
+            diffs[field] = {
+                "customer": paise_to_rupees(customer_paise),
+                "gstr2b": paise_to_rupees(gstr2b_paise),
+                "delta": paise_to_rupees(delta),
+            }
+
+    delta_days = (inv.invoice_date - rec.invoice_date).days
+    if delta_days != 0:
+        diffs["invoice_date"] = {
+            "customer": inv.invoice_date.isoformat(),
+            "gstr2b": rec.invoice_date.isoformat(),
+            "delta_days": delta_days,
+        }
+    return diffs
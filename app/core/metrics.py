@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import sys
+import threading
+import time
+from app.db.memory import APP_STATE
+
+# METRICS REGISTRY (Prometheus text exposition format)
+# Deliberately tiny and dependency-free. Each labelled series has its own lock, held
+# only for a couple of integer updates, so there is no global lock on the hot path.
+# Gauges that describe state (tenants, memory) are computed when /metrics is scraped.
+
+# Seconds; covers sub-millisecond middleware work up to long PDF renders and LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric(ABC):
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        pass
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class _SeriesMetric(_Metric):
+    """A metric holding one child per label set, updated by the instrumented code."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _child(self, labels: Dict[str, str]):
+        key = tuple(str(labels[n]) for n in self.labelnames) if self.labelnames else ()
+        child = self._series.get(key)
+        if child is None:
+            with self._lock:
+                child = self._series.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        pass
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+class Counter(_SeriesMetric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1, **labels):
+        child = self._child(labels)
+        with child.lock:
+            child.value += amount
+
+    def value(self, **labels) -> float:
+        return self._child(labels).value
+
+    def samples(self):
+        for key, child in list(self._series.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "lock")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+class Histogram(_SeriesMetric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def _new_child(self):
+        return _HistogramChild(len(self.buckets))
+
+    def observe(self, value: float, **labels):
+        child = self._child(labels)
+        slot = bisect_left(self.buckets, value)
+        with child.lock:
+            child.counts[slot] += 1
+            child.sum += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        return sum(self._child(labels).counts)
+
+    def samples(self):
+        for key, child in list(self._series.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+class Gauge(_Metric):
+    """Gauge whose value(s) are read from a callback at scrape time."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], object], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def samples(self):
+        value = self._callback()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for key, v in items:
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+
+class CallbackCounter(Gauge):
+    """Counter mirrored from state kept elsewhere (e.g. cache hit counts)."""
+    type_name = "counter"
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        blocks = []
+        for metric in self._metrics:
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                blocks.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(blocks) + "\n"
+
+# APP_STATE SIZE ESTIMATE
+# A full deep walk of a million-row tenant would make scrapes expensive, so large
+# lists are measured on a sample of rows and extrapolated. Cached per tenant dataset.
+
+SIZE_SAMPLE_ROWS = 64
+
+def _deep_sizeof(obj, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+def _estimate(obj) -> int:
+    if isinstance(obj, list) and len(obj) > SIZE_SAMPLE_ROWS:
+        step = len(obj) // SIZE_SAMPLE_ROWS
+        sample = obj[::step][:SIZE_SAMPLE_ROWS]
+        seen: set = set()
+        per_row = sum(_deep_sizeof(v, seen) for v in sample) / len(sample)
+        return sys.getsizeof(obj) + int(per_row * len(obj))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_estimate(v) for v in obj.values())
+    if hasattr(obj, "__dict__") and not isinstance(obj, type):
+        # e.g. ResultsIndex: recurse so its large lists are sampled too
+        return sys.getsizeof(obj) + _estimate(vars(obj))
+    return _deep_sizeof(obj, set())
+
+def tenant_bytes(tenant_data: dict) -> int:
+    """Approximate resident bytes of one tenant's dataset, cached on the dataset itself."""
+    cached = tenant_data.get("_approx_bytes")
+    if cached is None:
+        cached = _estimate({k: v for k, v in tenant_data.items() if k != "_approx_bytes"})
+        tenant_data["_approx_bytes"] = cached
+    return cached
+
+# Global Accessor
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "gst_http_request_seconds", "End-to-end request latency seen by AuditMiddleware.", ["method", "route", "status"]))
+MIDDLEWARE_OVERHEAD_SECONDS = REGISTRY.register(Histogram(
+    "gst_middleware_overhead_seconds", "Time spent in AuditMiddleware itself (hashing, audit), excluding the endpoint."))
+UPLOAD_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "gst_upload_stage_seconds", "Invoice upload time per stage.", ["stage"]))
+UPLOADS_DEDUPLICATED_TOTAL = REGISTRY.register(Counter(
+    "gst_uploads_deduplicated_total", "Uploads answered without re-ingesting: matched the stored dataset or joined an identical in-flight upload.", ["reason"]))
+REPORT_BUILD_SECONDS = REGISTRY.register(Histogram(
+    "gst_report_build_seconds", "Time to aggregate the GST risk report from stored results."))
+PDF_RENDER_SECONDS = REGISTRY.register(Histogram(
+    "gst_pdf_render_seconds", "ReportLab render time for risk report PDFs.", ["detail"]))
+AUDIT_SAVE_SECONDS = REGISTRY.register(Histogram(
+    "gst_audit_save_seconds", "Latency of handing an audit entry to the audit repository."))
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "gst_llm_request_seconds", "Latency of LLM provider calls.", ["outcome"]))
+LLM_CALLS_TOTAL = REGISTRY.register(Counter(
+    "gst_llm_calls_total", "Explanation service call outcomes (ok, timeout, error, invalid, short_circuit, unavailable).", ["outcome"]))
+LLM_FALLBACKS_TOTAL = REGISTRY.register(Counter(
+    "gst_llm_fallbacks_total", "Explanations answered with the static fallback response."))
+
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "gst_event_loop_lag_seconds", "How late the event-loop lag sampler woke up."))
+EVENT_LOOP_SLOW_CALLBACKS_TOTAL = REGISTRY.register(Counter(
+    "gst_event_loop_slow_callbacks_total", "Event-loop callbacks that blocked the loop beyond the threshold, by route.", ["route"]))
+EVENT_LOOP_SLOW_CALLBACK_SECONDS = REGISTRY.register(Histogram(
+    "gst_event_loop_slow_callback_seconds", "Duration of event-loop callbacks over the slow threshold, by route.", ["route"]))
+
+RESIDENT_TENANTS = REGISTRY.register(Gauge(
+    "gst_resident_tenants", "Tenants with a dataset in APP_STATE.", lambda: len(APP_STATE)))
+APP_STATE_BYTES = REGISTRY.register(Gauge(
+    "gst_app_state_bytes", "Approximate bytes held in APP_STATE (sampled estimate).",
+    lambda: sum(tenant_bytes(data) for data in list(APP_STATE.values()) if isinstance(data, dict))))
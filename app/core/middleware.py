@@ -4,16 +4,61 @@ from starlette.responses import Response, JSONResponse, StreamingResponse as Sta
 from starlette.concurrency import iterate_in_threadpool
 import hashlib
 import json
+import time
 from app.core.audit import audit_repo
 from app.schemas.audit import AuditLogEntry, AuditStatus
+from app.core.metrics import HTTP_REQUEST_SECONDS, MIDDLEWARE_OVERHEAD_SECONDS
+from app.core.tracing import span, SPAN_KIND_SERVER
+from app.core import loop_monitor
+from app.core.admission import admission, recorded_plan
 import logging
 from typing import Callable
 
 logger = logging.getLogger(__name__)
 
+# Uploads parsed as they stream (multi-hundred-MB GSTR-2B downloads) are not buffered
+# here for hashing; the endpoint hashes the document while reading it and leaves the
+# digest in request.state.input_hash
+STREAMED_BODY_PATHS = ("/gstr2b/upload",)
+
 class AuditMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: Callable):
+        # Root span of the request; every span opened below (and every audit entry
+        # written while it is active) carries its trace id
+        with span(
+            f"HTTP {request.method}",
+            traceparent=request.headers.get("traceparent"),
+            kind=SPAN_KIND_SERVER,
+            **{"http.method": request.method, "http.target": request.url.path}
+        ) as root:
+            # Lets the loop monitor attribute stalls to this endpoint and tenant
+            bound = loop_monitor.bind_request(
+                request.scope, request.cookies.get("gst_tenant_id") or request.headers.get("X-Tenant-ID")
+            )
+            try:
+                response = await self._audited_dispatch(request, call_next)
+            except BaseException:
+                admitted = getattr(request.state, "admission", None)
+                if admitted is not None:
+                    await admission.release(admitted)
+                raise
+            finally:
+                loop_monitor.unbind_request(bound)
+            admitted = getattr(request.state, "admission", None)
+            if admitted is not None:
+                response = await admission.release_after(response, admitted)
+            route = getattr(request.scope.get("route"), "path", None)
+            if route:
+                root.name = f"HTTP {request.method} {route}"
+                root.set_attribute("http.route", route)
+            root.set_attribute("http.status_code", response.status_code)
+            response.headers["X-Trace-ID"] = root.trace_id
+            return response
+
+    async def _audited_dispatch(self, request: Request, call_next: Callable):
         # 1. Capture Request Details
+        started = time.perf_counter()
+        endpoint_seconds = 0.0
         endpoint = request.url.path
         method = request.method
         
@@ -21,7 +66,7 @@ class AuditMiddleware(BaseHTTPMiddleware):
         action_type = "UNKNOWN"
         if "upload" in endpoint:
             action_type = "UPLOAD"
-        elif "reconcile" in endpoint:
+        elif "reconcile" in endpoint or "reconciliation" in endpoint:
             action_type = "RECONCILE"
         elif "explain" in endpoint:
             action_type = "EXPLAIN"
@@ -29,13 +74,19 @@ class AuditMiddleware(BaseHTTPMiddleware):
             action_type = "REPORT"
         elif "health" in endpoint:
             action_type = "HEALTH_CHECK"
+        elif endpoint == "/metrics":
+            action_type = "METRICS"
+        elif endpoint.startswith("/debug"):
+            action_type = "DEBUG"
+        elif "settings" in endpoint:
+            action_type = "SETTINGS"
 
         # 2. Strict Tenant ID Check
         # Check cookies first (for web UI), then fall back to headers (for API clients)
         tenant_id = request.cookies.get("gst_tenant_id") or request.headers.get("X-Tenant-ID")
         
         # Exclude entry points and static assets from strict tenant check
-        public_prefixes = ["/onboarding", "/static", "/health"]
+        public_prefixes = ["/onboarding", "/static", "/health", "/metrics"]
         is_public = endpoint == "/" or any(endpoint.startswith(p) for p in public_prefixes)
         
         logger.debug(f"Request to {endpoint}, tenant_id={tenant_id}, is_public={is_public}")
@@ -43,96 +94,95 @@ class AuditMiddleware(BaseHTTPMiddleware):
         if not tenant_id and not is_public:
              # If strictly enforcing, we return 400 immediately.
              # We still want to audit this failure.
-             tenant_id_for_log = "MISSING"
-             status = AuditStatus.FAILURE
-             
-             # We need to construct the 400 response
              response = JSONResponse(
                  status_code=400, 
                  content={"detail": "Missing tenant identifier"}
              )
-             
-             # Log the rejection
-             try:
-                entry = AuditLogEntry(
-                    endpoint=endpoint,
-                    method=method,
-                    action_type=action_type,
-                    tenant_id=tenant_id_for_log,
-                    input_hash=None,
-                    output_hash=None,
-                    status=status
-                )
-                audit_repo.save(entry)
-             except Exception as e:
-                 logger.error(f"Audit Logging Failed: {e}")
-                 
+             self._audit_rejection(endpoint, method, action_type, "MISSING")
              return response
         
         # For public routes without tenant_id, use "PUBLIC" as tenant identifier for logging
         if not tenant_id and is_public:
             tenant_id = "PUBLIC"
 
-        # 3. Capture & Hash Input (Skip for methods without bodies to preserve stream integrity)
+        # 3. Admission Control
+        # Token bucket + concurrency cap per tenant and endpoint class, checked before
+        # the body is read so a refused upload costs nothing
+        if not is_public:
+            # Budgets follow the plan recorded for the tenant, not what the request claims
+            admitted = await admission.admit(tenant_id, recorded_plan(tenant_id), method, endpoint)
+            if not admitted.allowed:
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": f"Too many {admitted.endpoint_class} requests for this tenant; retry later."},
+                    headers={"Retry-After": admitted.retry_after_header}
+                )
+                self._audit_rejection(endpoint, method, action_type, tenant_id)
+                return response
+            request.state.admission = admitted
+
+        # 4. Capture & Hash Input (Skip for methods without bodies to preserve stream integrity)
         input_hash = None
         request_body_bytes = b""
         
-        if method in ["POST", "PUT", "PATCH"]:
+        if method in ["POST", "PUT", "PATCH"] and endpoint not in STREAMED_BODY_PATHS:
             try:
-                request_body_bytes = await request.body()
-                input_hash = hashlib.sha256(request_body_bytes).hexdigest()
-                
-                # Re-inject body (ASGI compliant)
-                async def receive():
-                    return {"type": "http.request", "body": request_body_bytes, "more_body": False}
-                request._receive = receive
+                with span("audit.hash_request_body") as hashing:
+                    request_body_bytes = await request.body()
+                    input_hash = hashlib.sha256(request_body_bytes).hexdigest()
+                    hashing.set_attribute("body.bytes", len(request_body_bytes))
+                # No re-injection needed: BaseHTTPMiddleware replays a body read here to
+                # the endpoint, then forwards http.disconnect (which streamed responses wait on)
             except Exception:
                 pass 
 
-        # 4. Process Request
+        # 5. Process Request
         response = None
         status = AuditStatus.FAILURE
         output_hash = None
         audited_already = False
         
         try:
+            endpoint_started = time.perf_counter()
             response = await call_next(request)
+            endpoint_seconds = time.perf_counter() - endpoint_started
             
-            # 5. Check if already audited by endpoint (Internal Header check)
+            # 6. Check if already audited by endpoint (Internal Header check)
             if response.headers.get("X-Audit-Captured") == "true":
                 audited_already = True
                 logger.debug(f"Request to {endpoint} already audited. Signal detected. Skipping middleware log.")
                 
-                # Remove internal header before returning
-                if hasattr(response, "headers"):
-                    if isinstance(response, StarletteStreamingResponse):
-                        response.headers.pop("X-Audit-Captured", None)
-                        return response
-                    
-                    new_headers = dict(response.headers)
-                    new_headers.pop("X-Audit-Captured", None)
-                    return Response(
-                        content=response.body if hasattr(response, "body") else b"",
-                        status_code=response.status_code,
-                        headers=new_headers,
-                        media_type=response.media_type
-                    )
+                # Remove internal header and pass the body through untouched.
+                # The response from call_next is always a stream, so streamed
+                # endpoints (PDF, exports) are never buffered here.
+                del response.headers["X-Audit-Captured"]
                 return response
 
             if 200 <= response.status_code < 300:
                 status = AuditStatus.SUCCESS
+
+            # Endpoints that encoded their body themselves (app.core.encoding) pass its
+            # hash along; the body is then streamed through without being buffered again
+            precomputed_hash = response.headers.get("X-Audit-Output-Hash")
+            if precomputed_hash:
+                output_hash = precomputed_hash
+                del response.headers["X-Audit-Output-Hash"]
+                return response
             
-            # 6. Capture & Hash Output (EXCEPT for StreamingResponse)
+            # 7. Capture & Hash Output (EXCEPT for StreamingResponse)
             if isinstance(response, StarletteStreamingResponse):
                 # Streams are handled via endpoint-level auditing to avoid loading large files into memory.
                 logger.debug(f"StreamingResponse detected for {endpoint}, bypassing middleware body capture.")
                 return response
 
-            response_body_bytes = b""
-            async for chunk in response.body_iterator:
-                response_body_bytes += chunk
-            
-            output_hash = hashlib.sha256(response_body_bytes).hexdigest()
+            with span("audit.hash_response_body") as hashing:
+                chunks = []
+                async for chunk in response.body_iterator:
+                    chunks.append(chunk)
+                response_body_bytes = b"".join(chunks)
+
+                output_hash = hashlib.sha256(response_body_bytes).hexdigest()
+                hashing.set_attribute("body.bytes", len(response_body_bytes))
             
             # Reconstruct response
             response = Response(
@@ -146,8 +196,10 @@ class AuditMiddleware(BaseHTTPMiddleware):
             status = AuditStatus.FAILURE
             raise e
         finally:
-            # 7. Log Event (Only if not already audited by endpoint)
+            # 8. Log Event (Only if not already audited by endpoint)
             if not audited_already:
+                if input_hash is None:
+                    input_hash = getattr(request.state, "input_hash", None)
                 try:
                     entry = AuditLogEntry(
                         endpoint=endpoint,
@@ -162,4 +214,31 @@ class AuditMiddleware(BaseHTTPMiddleware):
                 except Exception as log_error:
                     logger.error(f"Audit Logging Failed: {log_error}")
 
+            # Route template (not the raw path) keeps label cardinality bounded
+            route = request.scope.get("route")
+            elapsed = time.perf_counter() - started
+            HTTP_REQUEST_SECONDS.observe(
+                elapsed,
+                method=method,
+                route=getattr(route, "path", "unmatched"),
+                status=response.status_code if response is not None else 500
+            )
+            MIDDLEWARE_OVERHEAD_SECONDS.observe(max(elapsed - endpoint_seconds, 0.0))
+
         return response
+
+    def _audit_rejection(self, endpoint: str, method: str, action_type: str, tenant_id: str):
+        """Requests refused before reaching an endpoint are still audited."""
+        try:
+            entry = AuditLogEntry(
+                endpoint=endpoint,
+                method=method,
+                action_type=action_type,
+                tenant_id=tenant_id,
+                input_hash=None,
+                output_hash=None,
+                status=AuditStatus.FAILURE
+            )
+            audit_repo.save(entry)
+        except Exception as e:
+            logger.error(f"Audit Logging Failed: {e}")
@@ -0,0 +1,108 @@
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import compress
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+import math
+import re
+
+# MONEY CORE
+# All amounts are held as integer paise (1 rupee = 100 paise) from parsing onwards.
+# Conversion back to rupees happens only at the JSON / PDF boundary.
+
+PAISE_PER_RUPEE = 100
+
+# Signed int64 column type used for per-tenant amount columns
+PAISE_TYPECODE = "q"
+
+# A decimal point that is not followed by exactly two digits and a row break
+_BAD_POINT = re.compile(r"\.(?![0-9][0-9](?:\n|\Z))")
+
+def to_paise(value: Union[str, int, float, Decimal]) -> int:
+    """
+    Parse a rupee amount into integer paise without going through binary floats.
+    Sub-paisa digits are rounded half-up, matching how GST portals round.
+    """
+    if isinstance(value, str):
+        # Hot path for CSV values such as "1234.56"
+        rupees, _, fraction = value.partition(".")
+        if len(fraction) == 2 and rupees.isdigit() and fraction.isdigit() and value.isascii():
+            return int(rupees + fraction)
+    elif isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError("Amount must be strictly numeric")
+        # str() gives the shortest string that round-trips (0.1 -> "0.1"), and Decimal
+        # also accepts the exponent form small and large floats print in (1e-05)
+        value = Decimal(str(value))
+        return int((value * PAISE_PER_RUPEE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    elif isinstance(value, bool):
+        raise ValueError("Amount must be numeric")
+    elif isinstance(value, int):
+        return value * PAISE_PER_RUPEE
+    elif isinstance(value, Decimal):
+        return int((value * PAISE_PER_RUPEE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    else:
+        raise ValueError("Amount must be strictly numeric")
+
+    # General path: "[-]digits[.digits]" with optional surrounding whitespace
+    text = value.strip()
+    negative = text.startswith("-")
+    rupees, _, fraction = (text[1:] if negative else text).partition(".")
+    if not text.isascii() or not rupees.isdigit() or not (fraction.isdigit() or (not fraction and "." not in text)):
+        raise ValueError("Amount must be strictly numeric")
+
+    if len(fraction) == 2:
+        paise = int(rupees + fraction)
+    else:
+        paise = int(rupees) * PAISE_PER_RUPEE + int(fraction[:2].ljust(2, "0") if fraction else 0)
+        if len(fraction) > 2 and fraction[2] >= "5":
+            paise += 1
+    return -paise if negative else paise
+
+def paise_to_rupees(paise: int) -> float:
+    """Nearest float to the exact rupee value; used only for JSON numbers."""
+    return paise / PAISE_PER_RUPEE
+
+def format_rupees(paise: int) -> str:
+    """Exact two-decimal display string, e.g. 123456 -> '1234.56'."""
+    sign = "-" if paise < 0 else ""
+    rupees, rem = divmod(abs(paise), PAISE_PER_RUPEE)
+    return f"{sign}{rupees}.{rem:02d}"
+
+def rupee_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON boundary helper: replaces every '<name>_paise' key with '<name>' in rupees."""
+    return {
+        (key[:-len("_paise")] if key.endswith("_paise") else key):
+        (paise_to_rupees(value) if key.endswith("_paise") else value)
+        for key, value in data.items()
+    }
+
+def paise_column(values: Iterable[int]) -> array:
+    return array(PAISE_TYPECODE, values)
+
+def parse_paise_column(values: Sequence[str]) -> array:
+    """
+    Bulk variant of to_paise for a column of rupee strings.
+    When every value is "digits.dd" (the common export format) the column is
+    validated and converted with a handful of C-level passes over one joined string.
+    """
+    joined = "\n".join(values)
+    if values and joined.count(".") == len(values) and not _BAD_POINT.search(joined):
+        digits = joined.replace(".", "")
+        if digits.isascii() and digits.replace("\n", "").isdigit():
+            return array(PAISE_TYPECODE, map(int, digits.split("\n")))
+    return paise_column(to_paise(v) for v in values)
+
+def sum_paise(column: Sequence[int], mask: Optional[Iterable[bool]] = None) -> int:
+    """
+    Exact sum of a paise column, optionally restricted to rows where mask is true.
+    Runs as a single C-level pass over the array (no per-row Python arithmetic).
+    """
+    if mask is None:
+        return sum(column)
+    return sum(compress(column, mask))
+
+def amount_columns(invoices: Sequence) -> Dict[str, array]:
+    """Columnar paise view of a tenant's invoices, built once at ingestion."""
+    taxable = paise_column(inv.taxable_value_paise for inv in invoices)
+    itc = paise_column(inv.itc_paise for inv in invoices)
+    return {"taxable_value": taxable, "itc": itc}
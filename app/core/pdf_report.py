@@ -0,0 +1,197 @@
+from collections import deque
+from tempfile import SpooledTemporaryFile
+from typing import Iterator, Iterable, Optional, Sequence
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from app.schemas.report import ReportResponse
+from app.core.money import format_rupees
+
+# PDF RENDERING FOR GST RISK REPORTS
+# Consumes the same precomputed report / reconciliation results as the JSON endpoint.
+# Detailed reports are fed to ReportLab through a lazy flowable stream, so only the
+# rows for the page being laid out exist as flowables at any time, and the finished
+# document is written to a spooled temp file instead of an in-memory buffer.
+
+# Keep this many bytes of PDF output in RAM before spilling to disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+# Rows per detail table chunk; roughly one A4 page at the detail font size
+ROWS_PER_CHUNK = 60
+# Fixed detail row height (points) so ReportLab skips per-cell height measurement
+DETAIL_ROW_HEIGHT = 11
+# Flowables kept ahead of the layout position (enough for keepWithNext headings)
+LOOKAHEAD = 2
+
+HEADER_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+])
+
+DETAIL_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTSIZE', (0, 0), (-1, -1), 7),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (4, 1), (5, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('TOPPADDING', (0, 0), (-1, -1), 1),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 1)
+])
+
+INVOICE_COLUMNS = ["Invoice No", "Vendor GSTIN", "Date", "Status", "Taxable (Rs.)", "ITC (Rs.)"]
+INVOICE_COL_WIDTHS = [85, 95, 55, 85, 70, 60]
+VENDOR_COLUMNS = ["Vendor GSTIN", "Invoices", "Matched", "Missing", "Risky", "Risky ITC (Rs.)", "Risk"]
+VENDOR_COL_WIDTHS = [95, 50, 50, 50, 45, 80, 50]
+
+FOOTER_TEXT = "This report is for internal compliance only. Generated via GST Trust Authoritative Rules Engine."
+
+class LazyFlowables:
+    """
+    List-like adaptor that ReportLab's build loop consumes from the front.
+    Only a small window of flowables is materialised from the source iterator;
+    split remainders that ReportLab pushes back are kept in the same window.
+    """
+
+    def __init__(self, source: Iterable):
+        self._source = iter(source)
+        self._window = deque()
+
+    def _fill(self, count: int):
+        while len(self._window) < count:
+            try:
+                self._window.append(next(self._source))
+            except StopIteration:
+                return
+
+    def __len__(self) -> int:
+        self._fill(LOOKAHEAD)
+        return len(self._window)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self._fill(key.stop if key.stop is not None else LOOKAHEAD)
+            return list(self._window)[key]
+        self._fill(key + 1)
+        return self._window[key]
+
+    def __setitem__(self, key, values):
+        if not (isinstance(key, slice) and key.start in (0, None) and key.stop == 0):
+            raise TypeError("LazyFlowables only supports prepending via [0:0] assignment")
+        self._window.extendleft(reversed(list(values)))
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            for _ in range(len(range(*key.indices(len(self._window))))):
+                self._window.popleft()
+        elif key == 0:
+            self._window.popleft()
+        else:
+            del self._window[key]
+
+    def insert(self, index: int, value):
+        self._window.insert(index, value)
+
+def summary_flowables(report: ReportResponse, styles) -> Iterator:
+    # 1. Header & Business Info
+    yield Paragraph("GST Reconciliation & Risk Report", styles['Title'])
+    yield Spacer(1, 12)
+    yield Paragraph(f"<b>Tenant ID:</b> {report.business.tenant_id}", styles['Normal'])
+    yield Paragraph(f"<b>GSTIN:</b> {report.business.gstin}", styles['Normal'])
+    yield Paragraph(f"<b>Generated (UTC):</b> {report.audit.generated_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
+    yield Paragraph(f"<b>Engine Version:</b> {report.audit.reconciliation_version}", styles['Normal'])
+    yield Paragraph(f"<b>Data Sources:</b> {', '.join(report.audit.data_sources)}", styles['Normal'])
+    yield Spacer(1, 24)
+
+    # 2. Risk Assessment
+    yield Paragraph("Risk Assessment", styles['Heading2'])
+    yield Paragraph(f"<b>Risk Score:</b> {report.risk_assessment.risk_score}/100", styles['Normal'])
+    yield Paragraph(f"<b>Finding Summary:</b> {report.risk_assessment.finding_summary}", styles['Normal'])
+    yield Paragraph(f"<b>Recommendation:</b> {report.risk_assessment.recommendation}", styles['Normal'])
+    yield Spacer(1, 24)
+
+    # 3. Summary Table
+    yield Paragraph("Reconciliation Summary", styles['Heading2'])
+    summary_data = [
+        ["Metric", "Value"],
+        ["Total Invoices", str(report.summary.total_invoices)],
+        ["Matched", str(report.summary.matched_count)],
+        ["Missing in GSTR-2B", str(report.summary.missing_in_2b_count)],
+        ["Risky ITC Count", str(report.summary.risky_itc_count)],
+        ["Total ITC Available", f"Rs. {report.summary.total_itc_available:.2f}"],
+        ["Risky ITC Amount", f"Rs. {report.summary.risky_itc_amount:.2f}"]
+    ]
+    summary_table = Table(summary_data, colWidths=[200, 150])
+    summary_table.setStyle(HEADER_STYLE)
+    yield summary_table
+    yield Spacer(1, 24)
+
+def _chunks(rows: Iterable[list], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def vendor_flowables(vendor_summary: Sequence[dict], styles) -> Iterator:
+    yield PageBreak()
+    yield Paragraph("Vendor Risk Summary", styles['Heading2'])
+    rows = (
+        [
+            v["vendor_gstin"], str(v.get("total_invoices", 0)), str(v.get("matched_count", 0)),
+            str(v.get("missing_in_2b_count", 0)), str(v.get("risky_count", 0)),
+            format_rupees(v.get("risky_itc_amount_paise", 0)), str(v.get("vendor_risk_level", "LOW"))
+        ]
+        for v in vendor_summary
+    )
+    for chunk in _chunks(rows, ROWS_PER_CHUNK):
+        yield Table([VENDOR_COLUMNS] + chunk, colWidths=VENDOR_COL_WIDTHS, rowHeights=DETAIL_ROW_HEIGHT, repeatRows=1, style=DETAIL_STYLE)
+
+def invoice_flowables(invoices: Sequence, results: Sequence[dict], styles) -> Iterator:
+    yield PageBreak()
+    yield Paragraph("Invoice Details", styles['Heading2'])
+    rows = (
+        [
+            r["invoice_number"], r["gstin"], inv.invoice_date.isoformat(),
+            r["status"].value if hasattr(r["status"], "value") else str(r["status"]),
+            format_rupees(inv.taxable_value_paise), format_rupees(inv.itc_paise)
+        ]
+        for inv, r in zip(invoices, results)
+    )
+    for chunk in _chunks(rows, ROWS_PER_CHUNK):
+        yield Table([INVOICE_COLUMNS] + chunk, colWidths=INVOICE_COL_WIDTHS, rowHeights=DETAIL_ROW_HEIGHT, repeatRows=1, style=DETAIL_STYLE)
+
+def report_flowables(report: ReportResponse, tenant_data: Optional[dict] = None) -> Iterator:
+    """Flowables for the summary report, plus vendor and invoice tables when tenant_data is given."""
+    styles = getSampleStyleSheet()
+    yield from summary_flowables(report, styles)
+
+    if tenant_data is not None:
+        yield from vendor_flowables(tenant_data.get("vendor_summary", []), styles)
+        yield from invoice_flowables(tenant_data.get("invoices", []), tenant_data["reconciliation"], styles)
+
+    # 4. Mandatory Footer
+    yield Spacer(1, 48)
+    yield Paragraph(FOOTER_TEXT, ParagraphStyle(name='Footer', fontSize=8, textColor=colors.grey, alignment=1))
+
+def render_report_pdf(report: ReportResponse, tenant_data: Optional[dict] = None) -> SpooledTemporaryFile:
+    """
+    Build the PDF into a spooled temp file positioned at offset 0.
+    The caller owns the returned file and must close it.
+    Page content is compressed as it is laid out; ReportLab keeps finished pages
+    until the document is saved, so memory grows with page count, not row objects.
+    """
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    try:
+        doc = SimpleDocTemplate(output, pagesize=A4, pageCompression=1)
+        doc.build(LazyFlowables(report_flowables(report, tenant_data)))
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
@@ -0,0 +1,37 @@
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# BACKGROUND PREWARM
+# Heavy dependencies are imported lazily so the process answers /health as soon as
+# possible after start. Once it does, this loads them in a worker thread so the
+# first real PDF / explanation / page request does not pay the import cost either.
+
+def _reportlab():
+    from app.core.pdf_report import getSampleStyleSheet
+    getSampleStyleSheet()
+
+def _openai():
+    from app.core.ai import get_client
+    get_client()
+
+def _templates():
+    from app.api.web import get_templates
+    get_templates()
+
+STEPS = {"reportlab": _reportlab, "openai": _openai, "templates": _templates}
+
+def prewarm() -> Dict[str, float]:
+    """Run every warm-up step; returns seconds spent per step. Never raises."""
+    timings: Dict[str, float] = {}
+    for name, step in STEPS.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Prewarm step '{name}' failed: {e}")
+        timings[name] = round(time.perf_counter() - started, 4)
+    logger.info(f"Prewarm completed: {timings}")
+    return timings
@@ -1,25 +1,43 @@
-from app.schemas.reconciliation import ReconciliationStatus, ReconciliationResult
+from typing import Optional
+from app.schemas.reconciliation import ReconciliationStatus, MatchTolerance
 from app.schemas.invoice import Invoice
+from app.core.matching import Gstr2bIndex, compute_diffs
 
 # AUTHORITATIVE RECONCILIATION ENGINE – DO NOT DUPLICATE
 # This module is the single source of truth for all reconciliation logic.
 # PHASE-1 LOCKED: This engine is restricted to basic matching (Matched, Partial, Missing, Risky).
 # DO NOT add multi-month reconciliation or auto-filing logic here until Phase-2.
 
-def reconcile_invoice(inv: Invoice, index: int = 0) -> dict:
+ENGINE_VERSION = "1.1.0"
+
+# Rs. 10,000 expressed in paise
+HIGH_VALUE_THRESHOLD_PAISE = 10000 * 100
+
+def reconcile_invoice(
+    inv: Invoice,
+    index: int = 0,
+    gstr2b: Optional[Gstr2bIndex] = None,
+    tolerance: Optional[MatchTolerance] = None
+) -> dict:
     """
     Authoritative matching logic for a single invoice.
     Returns a result dict consistent with Phase-1 API expectations.
+
+    When GSTR-2B records are supplied the invoice is matched against them using
+    the tenant's tolerance; otherwise the Phase-1 mock rules apply.
     """
+    if gstr2b is not None and len(gstr2b) > 0:
+        return _reconcile_against_2b(inv, gstr2b, tolerance or MatchTolerance())
+
     status = ReconciliationStatus.MATCHED
     explanation = "Exact match found in GSTR-2B government data."
     action = "No action required."
 
-    if inv.taxable_value > 10000:
+    if inv.taxable_value_paise > HIGH_VALUE_THRESHOLD_PAISE:
         status = ReconciliationStatus.RISKY_ITC
         explanation = "High value invoice. Verify if vendor has filed GSTR-1."
         action = "Hold payment until GSTR-2B reflection."
-    elif inv.igst > 0 and (inv.cgst == 0 or inv.sgst == 0):
+    elif inv.igst_paise > 0 and (inv.cgst_paise == 0 or inv.sgst_paise == 0):
         status = ReconciliationStatus.PARTIAL_MATCH
         explanation = "IGST/CGST mismatch. Place of supply check required."
         action = "Verify GST extraction logic."
@@ -33,5 +51,45 @@ def reconcile_invoice(inv: Invoice, index: int = 0) -> dict:
         "gstin": inv.gstin,
         "status": status,
         "explanation": explanation,
-        "suggested_action": action
+        "suggested_action": action,
+        "diffs": {}
+    }
+
+def _reconcile_against_2b(inv: Invoice, gstr2b: Gstr2bIndex, tolerance: MatchTolerance) -> dict:
+    diffs = {}
+
+    pos = gstr2b.best_match(inv, tolerance)
+    if pos is not None:
+        gstr2b.claim(pos)
+        diffs = compute_diffs(inv, gstr2b.record(pos))
+        status = ReconciliationStatus.MATCHED
+        if len(diffs) == 1:
+            explanation = "Exact match found in GSTR-2B government data."
+        else:
+            explanation = "Matched with GSTR-2B within the configured tolerance."
+        action = "No action required."
+    else:
+        pos = gstr2b.same_number(inv)
+        if pos is not None:
+            gstr2b.claim(pos)
+            diffs = compute_diffs(inv, gstr2b.record(pos))
+            status = ReconciliationStatus.PARTIAL_MATCH
+            explanation = "Invoice found in GSTR-2B but values differ beyond the configured tolerance."
+            action = "Reconcile amounts with vendor before claiming ITC."
+        elif inv.taxable_value_paise > HIGH_VALUE_THRESHOLD_PAISE:
+            status = ReconciliationStatus.RISKY_ITC
+            explanation = "High value invoice not reflected in GSTR-2B. Verify if vendor has filed GSTR-1."
+            action = "Hold payment until GSTR-2B reflection."
+        else:
+            status = ReconciliationStatus.MISSING_IN_2B
+            explanation = "Invoice not found in government GSTR-2B records."
+            action = "Follow up with vendor to file GSTR-1."
+
+    return {
+        "invoice_number": inv.invoice_number,
+        "gstin": inv.gstin,
+        "status": status,
+        "explanation": explanation,
+        "suggested_action": action,
+        "diffs": diffs
     }
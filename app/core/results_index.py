@@ -0,0 +1,185 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Iterable, Tuple
+from app.schemas.reconciliation import ReconciliationStatus
+
+# PER-TENANT SECONDARY INDEXES OVER RECONCILED RESULTS
+# Built once at ingestion, read-only afterwards. Results are never recomputed here.
+#
+# Sort orders are stored as sorted lists of composite keys (key * n_rows + row_id), so a
+# single bisect locates both a value range and a keyset cursor position, ties included.
+
+SORT_FIELDS = ("row", "amount", "date")
+
+# Above this many candidate rows it is cheaper to walk the requested sort order
+# and test predicates than to materialise and sort the candidate set.
+MATERIALISE_LIMIT = 5000
+
+STATUS_CODES = {status: code for code, status in enumerate(ReconciliationStatus)}
+
+class ResultsIndex:
+    def __init__(self, invoices: Sequence, results: Sequence[dict]):
+        self._build(
+            bytearray(STATUS_CODES[ReconciliationStatus(r["status"])] for r in results),
+            [r["gstin"] for r in results],
+            array("q", (inv.taxable_value_paise for inv in invoices)),
+            array("l", (inv.invoice_date.toordinal() for inv in invoices)),
+        )
+
+    @classmethod
+    def from_columns(cls, status_codes: Sequence[int], gstins: Sequence[str], amounts: Sequence[int], dates: Sequence[int]) -> "ResultsIndex":
+        """Index over existing columns (e.g. mmap views of a snapshot), which are used as they are."""
+        index = cls.__new__(cls)
+        index._build(status_codes, gstins, amounts, dates)
+        return index
+
+    def _build(self, status_codes: Sequence[int], gstins: Sequence[str], amounts: Sequence[int], dates: Sequence[int]):
+        n = len(status_codes)
+        self.size = n
+        self.status_codes = status_codes
+        self.gstins = gstins
+        self.amounts = amounts
+        self.dates = dates
+
+        self.by_status: Dict[int, array] = {}
+        self.by_gstin: Dict[str, array] = {}
+        for row, (code, gstin) in enumerate(zip(status_codes, gstins)):
+            self.by_status.setdefault(code, array("l")).append(row)
+            self.by_gstin.setdefault(gstin, array("l")).append(row)
+
+        stride = max(n, 1)
+        self._order = {
+            "amount": sorted(self.amounts[row] * stride + row for row in range(n)),
+            "date": sorted(self.dates[row] * stride + row for row in range(n)),
+        }
+
+    # Composite key helpers
+    def sort_key(self, sort: str, row: int) -> int:
+        if sort == "row":
+            return row
+        column = self.amounts if sort == "amount" else self.dates
+        return column[row] * max(self.size, 1) + row
+
+    def _row_of(self, sort: str, composite: int) -> int:
+        return composite if sort == "row" else composite % max(self.size, 1)
+
+    def _bounds(self, sort: str, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        """Positions in the sorted order whose value lies within [low, high]."""
+        stride = max(self.size, 1)
+        order = self._order[sort]
+        lo = 0 if low is None else bisect_left(order, low * stride)
+        hi = len(order) if high is None else bisect_right(order, high * stride + stride - 1)
+        return lo, hi
+
+    def _materialise(self, name: str, codes, gstin, bounds) -> Iterable[int]:
+        if name == "status":
+            if len(codes) == 1:
+                return self.by_status.get(next(iter(codes)), ())
+            return sorted(row for code in codes for row in self.by_status.get(code, ()))
+        if name == "gstin":
+            return self.by_gstin.get(gstin, ())
+        stride = max(self.size, 1)
+        lo, hi = bounds[name]
+        return [composite % stride for composite in self._order[name][lo:hi]]
+
+    def query(
+        self,
+        statuses: Optional[Iterable[ReconciliationStatus]] = None,
+        gstin: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        min_amount: Optional[int] = None,
+        max_amount: Optional[int] = None,
+        sort: str = "row",
+        descending: bool = False,
+        limit: int = 50,
+        after: Optional[int] = None
+    ) -> Tuple[List[int], Optional[int]]:
+        """
+        Keyset-paginated filter. `after` is the composite sort key of the last row
+        of the previous page. Returns (row_ids, next_after).
+        """
+        codes = None if statuses is None else {STATUS_CODES[s] for s in statuses}
+        low_date = date_from.toordinal() if date_from else None
+        high_date = date_to.toordinal() if date_to else None
+
+        # 1. Estimate each filter's candidate count and pick the most selective as driver.
+        # Drivers are only materialised when chosen, as ascending row ids.
+        bounds: Dict[str, Tuple[int, int]] = {}
+        estimates: List[Tuple[int, str]] = []
+        if codes is not None:
+            estimates.append((sum(len(self.by_status.get(code, ())) for code in codes), "status"))
+        if gstin is not None:
+            estimates.append((len(self.by_gstin.get(gstin, ())), "gstin"))
+        if min_amount is not None or max_amount is not None:
+            bounds["amount"] = self._bounds("amount", min_amount, max_amount)
+            estimates.append((bounds["amount"][1] - bounds["amount"][0], "amount"))
+        if low_date is not None or high_date is not None:
+            bounds["date"] = self._bounds("date", low_date, high_date)
+            estimates.append((bounds["date"][1] - bounds["date"][0], "date"))
+        driver_size, driver_name = min(estimates) if estimates else (self.size, None)
+
+        def matches(row: int) -> bool:
+            if codes is not None and self.status_codes[row] not in codes:
+                return False
+            if gstin is not None and self.gstins[row] != gstin:
+                return False
+            amount = self.amounts[row]
+            if (min_amount is not None and amount < min_amount) or (max_amount is not None and amount > max_amount):
+                return False
+            day = self.dates[row]
+            if (low_date is not None and day < low_date) or (high_date is not None and day > high_date):
+                return False
+            return True
+
+        # 2. Order keys: either the materialised candidates or a slice of the sort index
+        if driver_name is not None and driver_size <= MATERIALISE_LIMIT:
+            keys = sorted(self.sort_key(sort, row) for row in self._materialise(driver_name, codes, gstin, bounds) if matches(row))
+            lo, hi = 0, len(keys)
+            check = None
+        else:
+            keys = range(self.size) if sort == "row" else self._order[sort]
+            # A range filter on the sort field itself bounds the walk directly
+            lo, hi = bounds.get(sort, (0, len(keys)))
+            check = matches
+
+        # 3. Seek past the cursor and collect one page
+        if descending:
+            start = hi if after is None else bisect_left(keys, after, lo, hi)
+            positions = range(start - 1, lo - 1, -1)
+        else:
+            start = lo if after is None else bisect_right(keys, after, lo, hi)
+            positions = range(start, hi)
+
+        page: List[int] = []
+        last_key = None
+        for pos in positions:
+            composite = keys[pos]
+            row = self._row_of(sort, composite)
+            if check is not None and not check(row):
+                continue
+            if len(page) == limit:
+                return page, last_key
+            page.append(row)
+            last_key = composite
+        return page, None
+
+def dataset_index(tenant_data: dict) -> ResultsIndex:
+    """Index built at ingestion; built once on first use for datasets stored without one."""
+    index = tenant_data.get("index")
+    if index is None:
+        columns = tenant_data.get("columns")
+        if columns is not None:
+            index = ResultsIndex.from_columns(columns.status, columns.gstin, columns.taxable_value, columns.invoice_date)
+        else:
+            index = ResultsIndex(tenant_data.get("invoices", []), tenant_data["reconciliation"])
+        tenant_data["index"] = index
+    return index
+
+def status_column(tenant_data: dict) -> Sequence[int]:
+    """Status code (STATUS_CODES) per result row, without touching the results themselves."""
+    columns = tenant_data.get("columns")
+    if columns is not None:
+        return columns.status
+    return dataset_index(tenant_data).status_codes
@@ -0,0 +1,127 @@
+from typing import Any, Dict, List, Optional
+from app.schemas.invoice import Invoice
+from app.schemas.explanation import ExplainRequest
+from app.schemas.reconciliation import ReconciliationStatus
+from app.core.money import format_rupees, paise_to_rupees, to_paise
+from app.core.results_index import dataset_index
+
+# RULE-BASED EXPLANATIONS
+# Deterministic, templated explanations built from the engine's own result and diffs.
+# Computed once at ingestion for every non-MATCHED result, so interactive explain
+# requests are answered from stored data; the LLM is only used for richer narratives.
+
+FIELD_LABELS = {
+    "invoice_number": "Invoice number",
+    "taxable_value": "Taxable value",
+    "cgst": "CGST",
+    "sgst": "SGST",
+    "igst": "IGST",
+    "invoice_date": "Invoice date",
+}
+
+# Default engine wording per status, for requests that do not come from a stored result
+DEFAULT_TEXT = {
+    ReconciliationStatus.MATCHED: ("Invoice matches GSTR-2B government data.", "No action required."),
+    ReconciliationStatus.PARTIAL_MATCH: ("Invoice found in GSTR-2B but values differ.", "Reconcile amounts with vendor before claiming ITC."),
+    ReconciliationStatus.MISSING_IN_2B: ("Invoice not found in government GSTR-2B records.", "Follow up with vendor to file GSTR-1."),
+    ReconciliationStatus.RISKY_ITC: ("High value invoice not reflected in GSTR-2B.", "Hold payment until GSTR-2B reflection."),
+}
+
+def _rupees(value: Any) -> str:
+    try:
+        return f"Rs. {format_rupees(to_paise(value))}"
+    except ValueError:
+        return str(value)
+
+def _describe(field: str, diff: Dict[str, Any]) -> str:
+    label = FIELD_LABELS.get(field, field.replace("_", " ").capitalize())
+    if "delta_days" in diff:
+        return f"{label} differs by {abs(diff['delta_days'])} day(s) (customer {diff.get('customer')} vs GSTR-2B {diff.get('gstr2b')})"
+    if field == "invoice_number":
+        return f"{label} differs (customer {diff.get('customer')} vs GSTR-2B {diff.get('gstr2b')})"
+    return f"{label} differs (customer {_rupees(diff.get('customer'))} vs GSTR-2B {_rupees(diff.get('gstr2b'))})"
+
+def _root_cause(status: ReconciliationStatus, fields: List[str], diffs: Dict[str, Any]) -> str:
+    if status == ReconciliationStatus.MATCHED:
+        return "No Mismatch"
+    if status in (ReconciliationStatus.MISSING_IN_2B, ReconciliationStatus.RISKY_ITC):
+        return "Vendor Non-Compliance"
+    if not fields:
+        # Phase-1 mock rule: IGST charged alongside missing CGST/SGST
+        return "Place of Supply Mismatch"
+    if fields == ["invoice_date"]:
+        return "Timing Issue"
+    igst = diffs.get("igst")
+    if igst and bool(igst.get("customer")) != bool(igst.get("gstr2b")):
+        # IGST on one side only: inter-state vs intra-state disagreement
+        return "Place of Supply Mismatch"
+    return "Data Entry Error"
+
+def explain_diffs(
+    status: ReconciliationStatus,
+    diffs: Dict[str, Any],
+    explanation: Optional[str] = None,
+    suggested_action: Optional[str] = None
+) -> Dict[str, str]:
+    """Templated explanation for a status and a compute_diffs-shaped diff dict."""
+    status = ReconciliationStatus(status)
+    default_explanation, default_action = DEFAULT_TEXT[status]
+    fields = [f for f, d in diffs.items() if isinstance(d, dict) and ("customer" in d or "gstr2b" in d)]
+
+    sentences = [explanation or default_explanation]
+    sentences.extend(_describe(f, diffs[f]) + "." for f in fields)
+    return {
+        "explanation": " ".join(sentences),
+        "root_cause": _root_cause(status, fields, diffs),
+        "suggested_action": suggested_action or default_action,
+    }
+
+def precompute_explanation(inv: Invoice, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Ingestion-time stage: structured factual diffs plus templated text for one result."""
+    status = ReconciliationStatus(result["status"])
+    if status == ReconciliationStatus.MATCHED:
+        return None
+
+    factual_diffs = dict(result.get("diffs") or {})
+    if not factual_diffs:
+        # No GSTR-2B counterpart to diff against: state the customer's own figures
+        factual_diffs = {
+            "customer_taxable_value": paise_to_rupees(inv.taxable_value_paise),
+            "customer_cgst": paise_to_rupees(inv.cgst_paise),
+            "customer_sgst": paise_to_rupees(inv.sgst_paise),
+            "customer_igst": paise_to_rupees(inv.igst_paise),
+        }
+        if status in (ReconciliationStatus.MISSING_IN_2B, ReconciliationStatus.RISKY_ITC):
+            factual_diffs["in_gstr2b"] = False
+
+    precomputed = explain_diffs(status, result.get("diffs") or {}, result.get("explanation"), result.get("suggested_action"))
+    precomputed["factual_diffs"] = factual_diffs
+    return precomputed
+
+def find_row(tenant_data: Optional[dict], gstin: str, invoice_number: str) -> Optional[int]:
+    """Row of the stored result for (gstin, invoice_number), via the per-GSTIN postings of the results index."""
+    if not tenant_data or not tenant_data.get("reconciliation"):
+        return None
+    results = tenant_data["reconciliation"]
+    for row in dataset_index(tenant_data).by_gstin.get(gstin, ()):
+        r = results[row]
+        if r["invoice_number"] == invoice_number and r["gstin"] == gstin:
+            return row
+    return None
+
+def rule_explanation(request: ExplainRequest, tenant_data: Optional[dict]) -> Dict[str, Any]:
+    """
+    Precomputed explanation for an explain request. Uses the stored result when it
+    exists with the same status, otherwise templates the request's own diffs.
+    """
+    row = find_row(tenant_data, request.gstin, request.invoice_number)
+    stored = tenant_data["reconciliation"][row] if row is not None else None
+    if stored is not None and ReconciliationStatus(stored["status"]) == request.status:
+        # Stored beside the results, row for row (None for matched rows)
+        precomputed = tenant_data.get("precomputed")
+        return (precomputed[row] if precomputed is not None else None) or explain_diffs(
+            request.status, stored.get("diffs") or {}, stored.get("explanation"), stored.get("suggested_action")
+        )
+    precomputed = explain_diffs(request.status, request.factual_diffs)
+    precomputed["factual_diffs"] = request.factual_diffs
+    return precomputed
@@ -0,0 +1,153 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from app.core.config import settings
+from app.core.metrics import REGISTRY, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# WORK SCHEDULER
+# CPU-heavy work (upload ingestion, GSTR-2B imports, snapshot restores, report builds, PDF
+# renders, batch explanation prep) runs on a small, fixed pool of worker threads instead of
+# the event loop or an unbounded threadpool, and waiting jobs are picked by weighted fair
+# queuing rather than first come, first served:
+#   - every tenant is a flow, weighted by its plan
+#   - every job has a cost (roughly the rows it touches) and a virtual finish tag
+#         finish = max(virtual clock, tenant's previous finish) + cost / weight
+#   - a free worker always takes the smallest finish tag
+# A small BASIC upload therefore overtakes the rest of an ENTERPRISE bulk import instead
+# of queueing behind it, and a tenant submitting many jobs only pushes back its own.
+
+PLAN_WEIGHTS = {"BASIC": 1.0, "PRO": 2.0, "ENTERPRISE": 4.0}
+DEFAULT_PLAN = "BASIC"
+# Forget finished tenants' tags every this many dispatches
+PRUNE_EVERY = 256
+
+class _Job:
+    __slots__ = ("queue", "tenant_id", "start", "fn", "args", "context", "loop", "future", "submitted")
+
+    def __init__(self, queue: str, tenant_id: str, start: float, fn: Callable, args: tuple,
+                 loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.queue = queue
+        self.tenant_id = tenant_id
+        self.start = start
+        self.fn = fn
+        self.args = args
+        # Spans, trace ids and loop-monitor attribution follow the job into the worker
+        self.context = contextvars.copy_context()
+        self.loop = loop
+        self.future = future
+        self.submitted = time.perf_counter()
+
+def _settle(future: asyncio.Future, ok: bool, value: Any):
+    if future.done():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+class WorkScheduler:
+    def __init__(self, workers: int, weights: Optional[Dict[str, float]] = None):
+        self.workers = max(1, workers)
+        self.weights = weights or PLAN_WEIGHTS
+        self._cond = threading.Condition()
+        # (finish tag, sequence, job)
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._virtual = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._threads: List[threading.Thread] = []
+        self._dispatched = 0
+        self.queued: Dict[str, int] = defaultdict(int)
+        self.running: Dict[str, int] = defaultdict(int)
+
+    def weight(self, plan: Optional[str]) -> float:
+        return self.weights.get(plan or DEFAULT_PLAN, self.weights[DEFAULT_PLAN])
+
+    async def run(self, queue: str, fn: Callable, *args, tenant_id: str, plan: Optional[str] = None, cost: float = 1.0):
+        """Run fn(*args) on a worker once it is this job's turn; exceptions propagate to the caller."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            self._start_workers()
+            start = max(self._virtual, self._last_finish.get(tenant_id, 0.0))
+            finish = start + max(cost, 1.0) / self.weight(plan)
+            self._last_finish[tenant_id] = finish
+            heapq.heappush(self._heap, (finish, next(self._sequence), _Job(queue, tenant_id, start, fn, args, loop, future)))
+            self.queued[queue] += 1
+            self._cond.notify()
+        # Cancelling the caller cancels the future; a job that has not started is then skipped
+        return await future
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"scheduler-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                self.queued[job.queue] -= 1
+                if job.future.cancelled():
+                    continue
+                self._virtual = max(self._virtual, job.start)
+                self.running[job.queue] += 1
+                self._dispatched += 1
+                if self._dispatched % PRUNE_EVERY == 0:
+                    # Tags at or behind the virtual clock would be replaced by it anyway
+                    self._last_finish = {t: f for t, f in self._last_finish.items() if f > self._virtual}
+                return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            started = time.perf_counter()
+            SCHEDULER_WAIT_SECONDS.observe(started - job.submitted, queue=job.queue)
+            try:
+                ok, value = True, job.context.run(job.fn, *job.args)
+            except BaseException as e:
+                ok, value = False, e
+            finally:
+                SCHEDULER_RUN_SECONDS.observe(time.perf_counter() - started, queue=job.queue)
+                with self._cond:
+                    self.running[job.queue] -= 1
+            try:
+                job.loop.call_soon_threadsafe(_settle, job.future, ok, value)
+            except RuntimeError:
+                # The submitting loop has closed; nobody is waiting for this result
+                logger.debug(f"Dropped result of a {job.queue} job: its event loop is closed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queued": dict(self.queued),
+                "running": dict(self.running),
+                "tenants_tracked": len(self._last_finish),
+            }
+
+SCHEDULER_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "gst_scheduler_wait_seconds", "Time CPU-heavy jobs waited for a scheduler worker, by queue.", ["queue"]))
+SCHEDULER_RUN_SECONDS = REGISTRY.register(Histogram(
+    "gst_scheduler_run_seconds", "Time CPU-heavy jobs ran on a scheduler worker, by queue.", ["queue"]))
+
+# Global Accessor
+scheduler = WorkScheduler(settings.SCHEDULER_WORKERS)
+
+REGISTRY.register(Gauge(
+    "gst_scheduler_queued_jobs", "Jobs waiting for a scheduler worker, by queue.",
+    lambda: dict(scheduler.queued), ["queue"]))
+REGISTRY.register(Gauge(
+    "gst_scheduler_running_jobs", "Jobs running on scheduler workers, by queue.",
+    lambda: dict(scheduler.running), ["queue"]))
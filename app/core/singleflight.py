@@ -0,0 +1,51 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import concurrent.futures
+import threading
+from app.core.metrics import REGISTRY, Counter
+
+# SINGLE-FLIGHT
+# Concurrent callers asking for the same key share one in-flight computation: the first
+# caller starts it, later ones wait for its result (or its exception). The computation
+# runs as its own task, so a caller that disconnects does not cancel it for the others.
+# Only in-flight work is shared; once it settles the key is free again, and anything
+# worth keeping longer belongs in a cache keyed by data version.
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = {}
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result, shared): `shared` is True when the caller joined an existing computation."""
+        with self._lock:
+            shared = self._calls.get(key)
+            joined = shared is not None
+            if not joined:
+                shared = self._calls[key] = concurrent.futures.Future()
+
+        if joined:
+            SINGLEFLIGHT_COALESCED_TOTAL.inc(flight=self.name)
+        else:
+            task = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda done: self._settle(key, shared, done))
+        # Futures work across event loops; shield keeps one caller's cancellation private
+        return await asyncio.shield(asyncio.wrap_future(shared)), joined
+
+    def _settle(self, key: Hashable, shared: concurrent.futures.Future, task: asyncio.Task):
+        with self._lock:
+            self._calls.pop(key, None)
+        if task.cancelled():
+            shared.cancel()
+        elif task.exception() is not None:
+            shared.set_exception(task.exception())
+        else:
+            shared.set_result(task.result())
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+SINGLEFLIGHT_COALESCED_TOTAL = REGISTRY.register(Counter(
+    "gst_singleflight_coalesced_total", "Requests that joined an identical in-flight computation instead of starting one.",
+    ["flight"]))
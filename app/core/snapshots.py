@@ -0,0 +1,611 @@
+from datetime import date
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from app.core.config import settings
+from app.core.http_cache import tenant_data_version
+from app.core.matching import Gstr2bIndex
+from app.core.metrics import REGISTRY, Counter, Histogram
+from app.core.money import amount_columns
+from app.core.reconciliation import ENGINE_VERSION
+from app.core.results_index import ResultsIndex, STATUS_CODES
+from app.core.scheduler import scheduler
+from app.core.singleflight import SingleFlight
+from app.db.columnar import ColumnarFile, ColumnarFormatError, dict_column, int_column, str_column, write_columnar
+from app.db.memory import APP_STATE, TENANT_GSTR2B, DatasetLoader, TenantStore
+from app.schemas.invoice import Invoice
+from app.schemas.reconciliation import ReconciliationStatus
+from app.schemas.vendor import VendorRiskLevel
+
+logger = logging.getLogger(__name__)
+
+# TENANT DATASET SNAPSHOTS
+# Reconciled datasets are written to SNAPSHOT_DIR as columnar files (app.db.columnar) so
+# a restart or deploy does not lose them:
+#   - on upload the tenant is marked dirty and a background thread writes it
+#   - every SNAPSHOT_INTERVAL_SECONDS the thread also writes any dataset whose data
+#     version differs from the last one it wrote
+#   - after a restart nothing is read up front; a tenant's snapshot is restored the
+#     first time a request asks for the tenant (tenant_dataset), on a scheduler worker
+#     rather than the event loop, so startup time does not grow with tenants
+#   - tenants found to have no usable snapshot are remembered until their next upload,
+#     so requests for them do not touch the disk again
+# Snapshots from another engine version, or failing a checksum, are ignored: the
+# tenant simply has no dataset until the next upload, exactly as before snapshots.
+# A failed write is retried by the next periodic pass.
+# Only the dataset itself is stored; indexes and amount columns are rebuilt on load.
+# Large datasets are then served from the file itself (see MAPPED DATASETS below).
+# Portal GSTR-2B imports get a snapshot file of their own (see GSTR-2B IMPORTS below).
+
+SNAPSHOT_SCHEMA = 2
+SNAPSHOT_SUFFIX = ".gstsnap"
+STATUS_BY_CODE = {code: status for status, code in STATUS_CODES.items()}
+AMOUNT_FIELDS = ("taxable_value_paise", "cgst_paise", "sgst_paise", "igst_paise")
+VENDOR_COUNT_FIELDS = (
+    "total_invoices", "matched_count", "missing_in_2b_count", "risky_count",
+    "total_taxable_value_paise", "total_itc_amount_paise", "risky_itc_amount_paise",
+)
+
+def snapshot_filename(tenant_id: str, suffix: str = SNAPSHOT_SUFFIX) -> str:
+    # Tenant ids act as credentials, so they never appear in file names or headers
+    return hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:32] + suffix
+
+# ENCODING
+
+def _invoice_columns(invoices: List[Invoice]) -> Dict[str, Any]:
+    columns = {
+        "gstin": dict_column([inv.gstin for inv in invoices]),
+        "invoice_number": str_column([inv.invoice_number for inv in invoices]),
+        "invoice_date": int_column((inv.invoice_date.toordinal() for inv in invoices), "i"),
+        "source": dict_column([inv.source for inv in invoices]),
+    }
+    for field in AMOUNT_FIELDS:
+        columns[field] = int_column(getattr(inv, field) for inv in invoices)
+    # Derived, but stored so mapped datasets sum ITC from a single column
+    columns["itc_paise"] = int_column(inv.itc_paise for inv in invoices)
+    return columns
+
+def dataset_tables(tenant_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Columnar tables of a dataset: invoices with their results row by row, GSTR-2B records, vendors."""
+    invoices = tenant_data["invoices"]
+    results = tenant_data["reconciliation"]
+    if len(invoices) != len(results):
+        raise ValueError(f"{len(invoices)} invoices but {len(results)} results")
+
+    rows = _invoice_columns(invoices)
+    rows["status"] = int_column((STATUS_CODES[ReconciliationStatus(r["status"])] for r in results), "B")
+    rows["explanation"] = dict_column([r["explanation"] for r in results])
+    rows["suggested_action"] = dict_column([r["suggested_action"] for r in results])
+    rows["diffs"] = str_column([json.dumps(r["diffs"], separators=(",", ":")) for r in results])
+    # Empty string: no precomputed explanation (matched rows)
+    precomputed = tenant_data.get("precomputed") or [None] * len(results)
+    rows["precomputed"] = str_column([json.dumps(p, separators=(",", ":")) if p else "" for p in precomputed])
+
+    vendors = tenant_data.get("vendor_summary") or []
+    vendor_columns = {
+        "vendor_gstin": str_column([v["vendor_gstin"] for v in vendors]),
+        "vendor_risk_level": dict_column([VendorRiskLevel(v["vendor_risk_level"]).value for v in vendors]),
+    }
+    for field in VENDOR_COUNT_FIELDS:
+        vendor_columns[field] = int_column(v[field] for v in vendors)
+
+    return {
+        "invoices": rows,
+        "gstr2b": _invoice_columns(tenant_data.get("gstr2b") or []),
+        "vendors": vendor_columns,
+    }
+
+def write_snapshot(path: str, tenant_data: Dict[str, Any]) -> str:
+    """Write the dataset atomically; returns the data version written."""
+    version = tenant_data_version(tenant_data)
+    meta = {
+        "schema": SNAPSHOT_SCHEMA,
+        "engine_version": ENGINE_VERSION,
+        "data_version": version,
+        "timestamp": tenant_data.get("timestamp"),
+        "plan": tenant_data.get("plan"),
+        "has_vendor_summary": "vendor_summary" in tenant_data,
+        "gstr2b_source": tenant_data.get("gstr2b_source"),
+    }
+    write_columnar(path, dataset_tables(tenant_data), meta)
+    return version
+
+# DECODING & MAPPED DATASETS
+# Small datasets are decoded back into lists of objects. Datasets of COLUMNAR_MIN_ROWS
+# invoices or more are served from the mapped file instead: invoices and results are
+# sequences decoded row by row on access, and reports, vendor aggregation and exports
+# read the zero-copy column views directly, touching only the columns they need.
+
+# Attribute names of TableColumns for the paise columns
+MAPPED_COLUMNS = {
+    "taxable_value": "taxable_value_paise", "cgst": "cgst_paise", "sgst": "sgst_paise",
+    "igst": "igst_paise", "itc": "itc_paise",
+}
+
+class TableColumns:
+    """Columns of one snapshot table as attributes (columns.status, columns.taxable_value, ...)."""
+
+    def __init__(self, snapshot: ColumnarFile, table: str):
+        self._snapshot = snapshot
+        self._table = table
+        self.rows = snapshot.rows(table)
+
+    def __getattr__(self, name: str):
+        column = MAPPED_COLUMNS.get(name, name)
+        if name.startswith("_") or not self._snapshot.has_column(self._table, column):
+            raise AttributeError(name)
+        view = self._snapshot.column(self._table, column)
+        setattr(self, name, view)
+        return view
+
+def _row_index(row: int, size: int) -> int:
+    if row < 0:
+        row += size
+    if not 0 <= row < size:
+        raise IndexError("row out of range")
+    return row
+
+def _invoice(gstin, invoice_number, ordinal, source, taxable, cgst, sgst, igst) -> Invoice:
+    # Validated on upload and checksummed on disk: no need to validate again
+    return Invoice.model_construct(
+        gstin=gstin,
+        invoice_number=invoice_number,
+        invoice_date=date.fromordinal(ordinal),
+        taxable_value_paise=taxable,
+        cgst_paise=cgst,
+        sgst_paise=sgst,
+        igst_paise=igst,
+        source=source,
+    )
+
+def _result(invoice_number, gstin, code, explanation, suggested_action, diffs) -> Dict[str, Any]:
+    return {
+        "invoice_number": invoice_number,
+        "gstin": gstin,
+        "status": STATUS_BY_CODE[code],
+        "explanation": explanation,
+        "suggested_action": suggested_action,
+        "diffs": json.loads(diffs),
+    }
+
+def _precomputed(encoded: str) -> Optional[Dict[str, Any]]:
+    return json.loads(encoded) if encoded else None
+
+class MappedInvoices(Sequence):
+    """Invoices of a snapshot table, built from its columns on access."""
+
+    def __init__(self, columns: TableColumns):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return self.columns.rows
+
+    def _fields(self) -> tuple:
+        c = self.columns
+        return c.gstin, c.invoice_number, c.invoice_date, c.source, c.taxable_value, c.cgst, c.sgst, c.igst
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return list(map(_invoice, *(column[row] for column in self._fields())))
+        row = _row_index(row, len(self))
+        return _invoice(*(column[row] for column in self._fields()))
+
+    def __iter__(self) -> Iterator[Invoice]:
+        return map(_invoice, *self._fields())
+
+class MappedResults(Sequence):
+    """Reconciliation results of a snapshot's invoices table, decoded on access."""
+
+    def __init__(self, columns: TableColumns):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return self.columns.rows
+
+    def _fields(self) -> tuple:
+        c = self.columns
+        return c.invoice_number, c.gstin, c.status, c.explanation, c.suggested_action, c.diffs
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return list(map(_result, *(column[row] for column in self._fields())))
+        row = _row_index(row, len(self))
+        return _result(*(column[row] for column in self._fields()))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return map(_result, *self._fields())
+
+class MappedPrecomputed(Sequence):
+    """Precomputed explanations of a snapshot's invoices table (None for matched rows), decoded on access."""
+
+    def __init__(self, columns: TableColumns):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return self.columns.rows
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return list(map(_precomputed, self.columns.precomputed[row]))
+        return _precomputed(self.columns.precomputed[_row_index(row, len(self))])
+
+    def __iter__(self) -> Iterator[Optional[Dict[str, Any]]]:
+        return map(_precomputed, self.columns.precomputed)
+
+def _vendor_summary(snapshot: ColumnarFile) -> List[Dict[str, Any]]:
+    gstins = snapshot.column("vendors", "vendor_gstin")
+    levels = snapshot.column("vendors", "vendor_risk_level")
+    counts = {field: snapshot.column("vendors", field) for field in VENDOR_COUNT_FIELDS}
+    vendors = []
+    for row in range(snapshot.rows("vendors")):
+        vendor = {"vendor_gstin": gstins[row]}
+        vendor.update((field, column[row]) for field, column in counts.items())
+        vendor["vendor_risk_level"] = VendorRiskLevel(levels[row])
+        vendors.append(vendor)
+    return vendors
+
+def load_snapshot(path: str, map_from_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    The stored dataset, shaped like the one /invoices/upload stores. With at least
+    `map_from_rows` invoices it is served from the mapped file (no "index" until first
+    use, plus "columns"); otherwise it is decoded and the file closed.
+    """
+    snapshot = ColumnarFile(path)
+    try:
+        meta = snapshot.meta
+        if meta.get("schema") != SNAPSHOT_SCHEMA or meta.get("engine_version") != ENGINE_VERSION:
+            raise ColumnarFormatError(
+                f"{path}: snapshot from engine {meta.get('engine_version')} (schema {meta.get('schema')})")
+
+        columns = TableColumns(snapshot, "invoices")
+        mapped = map_from_rows is not None and columns.rows >= map_from_rows
+        if mapped:
+            # Verified once up front: a damaged file fails the load, never a later report
+            snapshot.verify_all()
+            tenant_data = {
+                "invoices": MappedInvoices(columns),
+                "reconciliation": MappedResults(columns),
+                "precomputed": MappedPrecomputed(columns),
+                "gstr2b": MappedInvoices(TableColumns(snapshot, "gstr2b")),
+                "amounts": {"taxable_value": columns.taxable_value, "itc": columns.itc},
+                "columns": columns,
+            }
+        else:
+            invoices = list(MappedInvoices(columns))
+            results = list(MappedResults(columns))
+            tenant_data = {
+                "invoices": invoices,
+                "reconciliation": results,
+                "precomputed": list(MappedPrecomputed(columns)),
+                "gstr2b": list(MappedInvoices(TableColumns(snapshot, "gstr2b"))),
+                "amounts": amount_columns(invoices),
+                "index": ResultsIndex(invoices, results),
+            }
+
+        tenant_data["timestamp"] = meta.get("timestamp")
+        tenant_data["data_version"] = meta["data_version"]
+        tenant_data["plan"] = meta.get("plan")
+        if meta.get("gstr2b_source"):
+            tenant_data["gstr2b_source"] = meta["gstr2b_source"]
+        if meta.get("has_vendor_summary"):
+            tenant_data["vendor_summary"] = _vendor_summary(snapshot)
+    except BaseException:
+        snapshot.close()
+        raise
+    if not mapped:
+        snapshot.close()
+    return tenant_data
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """The stored dataset decoded into memory."""
+    return load_snapshot(path)
+
+def map_snapshot(path: str) -> Dict[str, Any]:
+    """The stored dataset served from the mapped file, whatever its size."""
+    return load_snapshot(path, map_from_rows=0)
+
+# GSTR-2B IMPORTS
+# A portal GSTR-2B download (/gstr2b/upload) lives apart from the dataset, in
+# TENANT_GSTR2B, and is written to a file of its own next to the dataset's: the flattened
+# records plus what identifies the download (its content hash feeds the data version of
+# every upload matched against it). After a restart, uploads therefore match against the
+# same records under the same data version instead of falling back to mock rules.
+
+GSTR2B_SUFFIX = ".gstr2b"
+IMPORT_META_FIELDS = ("content_hash", "gstin", "return_period", "suppliers", "skipped_sections", "bytes", "timestamp")
+
+def write_gstr2b_snapshot(path: str, imported: Dict[str, Any]) -> str:
+    """Write the import atomically; returns its content hash."""
+    meta = {"schema": SNAPSHOT_SCHEMA, **{field: imported.get(field) for field in IMPORT_META_FIELDS}}
+    write_columnar(path, {"records": _invoice_columns(imported["records"])}, meta)
+    return imported["content_hash"]
+
+def read_gstr2b_snapshot(path: str) -> Dict[str, Any]:
+    """The stored import, shaped like the one parse_gstr2b returns (match index rebuilt)."""
+    with ColumnarFile(path) as snapshot:
+        meta = snapshot.meta
+        if meta.get("schema") != SNAPSHOT_SCHEMA:
+            raise ColumnarFormatError(f"{path}: GSTR-2B snapshot schema {meta.get('schema')}")
+        records = list(MappedInvoices(TableColumns(snapshot, "records")))
+    imported = {field: meta.get(field) for field in IMPORT_META_FIELDS}
+    imported["records"] = records
+    imported["index"] = Gstr2bIndex(records).fork()
+    return imported
+
+# BACKGROUND WRITER & LAZY LOADERS
+
+class ImportLoader(DatasetLoader):
+    """TENANT_GSTR2B loader: a tenant's GSTR-2B import restored from its snapshot."""
+
+    def __init__(self, manager: "SnapshotManager"):
+        self.manager = manager
+        self._lock = threading.Lock()
+        # Tenants without a usable import snapshot, until they import again
+        self._absent: set = set()
+
+    def known_absent(self, tenant_id: str) -> bool:
+        return tenant_id in self._absent
+
+    def stored(self, tenant_id: str):
+        with self._lock:
+            self._absent.discard(tenant_id)
+
+    def _mark_absent(self, tenant_id: str):
+        with self._lock:
+            self._absent.add(tenant_id)
+
+    def load(self, tenant_id: str) -> Optional[Dict[str, Any]]:
+        if not self.manager.enabled or self.known_absent(tenant_id):
+            return None
+        path = self.manager.path(tenant_id, GSTR2B_SUFFIX)
+        if not os.path.exists(path):
+            self._mark_absent(tenant_id)
+            return None
+        started = time.perf_counter()
+        try:
+            imported = read_gstr2b_snapshot(path)
+        except (ColumnarFormatError, OSError, ValueError, KeyError) as e:
+            SNAPSHOT_FAILURES_TOTAL.inc(operation="load")
+            logger.warning(f"Ignoring unusable GSTR-2B snapshot {os.path.basename(path)}: {e}")
+            self._mark_absent(tenant_id)
+            return None
+        SNAPSHOT_LOAD_SECONDS.observe(time.perf_counter() - started)
+        self.manager.imported(tenant_id, imported["content_hash"])
+        logger.info(f"Restored GSTR-2B import from snapshot: {len(imported['records'])} records")
+        return imported
+
+class SnapshotManager(DatasetLoader):
+    def __init__(self, directory: Optional[str], interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._dirty: set = set()
+        # tenant -> data version on disk, so unchanged datasets are not rewritten
+        self._written: Dict[str, str] = {}
+        # Tenants without a usable snapshot, until they upload again
+        self._absent: set = set()
+        # GSTR-2B imports: tenant -> content hash on disk, and imports waiting to be written
+        self._imports_written: Dict[str, str] = {}
+        self._dirty_imports: set = set()
+        self.imports = ImportLoader(self)
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def path(self, tenant_id: str, suffix: str = SNAPSHOT_SUFFIX) -> str:
+        return os.path.join(self.directory, snapshot_filename(tenant_id, suffix))
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopping = False
+        APP_STATE.loader = self
+        TENANT_GSTR2B.loader = self.imports
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Write whatever is still pending, then stop the writer."""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        thread.join(timeout)
+        self._thread = None
+        if APP_STATE.loader is self:
+            APP_STATE.loader = None
+        if TENANT_GSTR2B.loader is self.imports:
+            TENANT_GSTR2B.loader = None
+
+    def mark_dirty(self, tenant_id: str):
+        """Called after a dataset is stored; the write happens on the writer thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._dirty.add(tenant_id)
+            self._cond.notify()
+
+    def mark_import_dirty(self, tenant_id: str):
+        """Called after a GSTR-2B import is stored; written on the writer thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._dirty_imports.add(tenant_id)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._dirty and not self._dirty_imports and not self._stopping:
+                    self._cond.wait(self.interval)
+                stopping = self._stopping
+                dirty, self._dirty = self._dirty, set()
+                dirty_imports, self._dirty_imports = self._dirty_imports, set()
+            # Periodic pass (and final flush): anything stored without being marked
+            dirty.update(self._changed_tenants())
+            dirty_imports.update(self._changed_imports())
+            for tenant_id in dirty_imports:
+                self.write_import(tenant_id)
+            for tenant_id in dirty:
+                self.write(tenant_id)
+            if stopping:
+                return
+
+    def _changed_tenants(self) -> List[str]:
+        resident = list(dict.items(APP_STATE))
+        with self._cond:
+            written = dict(self._written)
+        return [t for t, data in resident if isinstance(data, dict) and written.get(t) != tenant_data_version(data)]
+
+    def _changed_imports(self) -> List[str]:
+        resident = list(dict.items(TENANT_GSTR2B))
+        with self._cond:
+            written = dict(self._imports_written)
+        return [t for t, imported in resident if written.get(t) != imported["content_hash"]]
+
+    def imported(self, tenant_id: str, content_hash: str):
+        """The import with this content hash is on disk for the tenant."""
+        with self._cond:
+            self._imports_written[tenant_id] = content_hash
+
+    def write_import(self, tenant_id: str) -> bool:
+        imported = dict.get(TENANT_GSTR2B, tenant_id)
+        if imported is None:
+            return False
+        try:
+            with SNAPSHOT_WRITE_SECONDS.time():
+                content_hash = write_gstr2b_snapshot(self.path(tenant_id, GSTR2B_SUFFIX), imported)
+        except Exception as e:
+            # Left unrecorded, so the periodic pass tries again
+            SNAPSHOT_FAILURES_TOTAL.inc(operation="write")
+            logger.error(f"GSTR-2B snapshot write failed: {e}")
+            return False
+        self.imported(tenant_id, content_hash)
+        self.imports.stored(tenant_id)
+        return True
+
+    def write(self, tenant_id: str) -> bool:
+        tenant_data = dict.get(APP_STATE, tenant_id)
+        if tenant_data is None:
+            return False
+        try:
+            with SNAPSHOT_WRITE_SECONDS.time():
+                version = write_snapshot(self.path(tenant_id), tenant_data)
+        except Exception as e:
+            # _written is left as it was, so the periodic pass tries again
+            SNAPSHOT_FAILURES_TOTAL.inc(operation="write")
+            logger.error(f"Snapshot write failed: {e}")
+            return False
+        with self._cond:
+            self._written[tenant_id] = version
+            self._absent.discard(tenant_id)
+        if "columns" not in tenant_data and len(tenant_data["reconciliation"]) >= settings.COLUMNAR_MIN_ROWS:
+            self._serve_mapped(tenant_id, tenant_data)
+        return True
+
+    def _serve_mapped(self, tenant_id: str, tenant_data: Dict[str, Any]):
+        """Swap a large in-memory dataset for its just-written snapshot, freeing the objects."""
+        try:
+            mapped = map_snapshot(self.path(tenant_id))
+        except (ColumnarFormatError, OSError, ValueError, KeyError) as e:
+            SNAPSHOT_FAILURES_TOTAL.inc(operation="map")
+            logger.warning(f"Keeping dataset in memory, snapshot not mappable: {e}")
+            return
+        # Same data version: reports already built for it stay valid
+        if "_report_cache" in tenant_data:
+            mapped["_report_cache"] = tenant_data["_report_cache"]
+        # Unless an upload replaced the dataset while it was being written
+        if APP_STATE.swap(tenant_id, tenant_data, mapped):
+            logger.info(f"Serving dataset from its snapshot: {len(mapped['invoices'])} invoices")
+
+    def known_absent(self, tenant_id: str) -> bool:
+        return tenant_id in self._absent
+
+    def stored(self, tenant_id: str):
+        # Via APP_STATE.__setitem__, for uploads and any other store
+        with self._cond:
+            self._absent.discard(tenant_id)
+
+    def _mark_absent(self, tenant_id: str):
+        with self._cond:
+            self._absent.add(tenant_id)
+
+    def load(self, tenant_id: str) -> Optional[Dict[str, Any]]:
+        """APP_STATE loader: the tenant's snapshot, or None if there is no usable one. Blocking."""
+        if not self.enabled or self.known_absent(tenant_id):
+            return None
+        path = self.path(tenant_id)
+        if not os.path.exists(path):
+            self._mark_absent(tenant_id)
+            return None
+        with self._cond:
+            lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+        # Concurrent first requests for a tenant load its snapshot once
+        with lock:
+            loaded = dict.get(APP_STATE, tenant_id)
+            if loaded is not None:
+                return loaded
+            started = time.perf_counter()
+            try:
+                tenant_data = load_snapshot(path, settings.COLUMNAR_MIN_ROWS)
+            except (ColumnarFormatError, OSError, ValueError, KeyError) as e:
+                SNAPSHOT_FAILURES_TOTAL.inc(operation="load")
+                logger.warning(f"Ignoring unusable snapshot {os.path.basename(path)}: {e}")
+                self._mark_absent(tenant_id)
+                return None
+            finally:
+                with self._cond:
+                    self._load_locks.pop(tenant_id, None)
+            SNAPSHOT_LOAD_SECONDS.observe(time.perf_counter() - started)
+            with self._cond:
+                self._written[tenant_id] = tenant_data["data_version"]
+            logger.info(f"Restored dataset from snapshot: {len(tenant_data['invoices'])} invoices")
+            return APP_STATE.setdefault(tenant_id, tenant_data)
+
+SNAPSHOT_WRITE_SECONDS = REGISTRY.register(Histogram(
+    "gst_snapshot_write_seconds", "Time to write one tenant dataset snapshot."))
+SNAPSHOT_LOAD_SECONDS = REGISTRY.register(Histogram(
+    "gst_snapshot_load_seconds", "Time to restore one tenant dataset from its snapshot."))
+SNAPSHOT_FAILURES_TOTAL = REGISTRY.register(Counter(
+    "gst_snapshot_failures_total", "Snapshot writes that failed and snapshots ignored on load or not mapped, by operation.",
+    ["operation"]))
+
+# Global Accessor
+snapshots = SnapshotManager(settings.SNAPSHOT_DIR, settings.SNAPSHOT_INTERVAL_SECONDS)
+
+restore_flight = SingleFlight("restore")
+
+async def _restored(store: TenantStore, kind: str, tenant_id: str) -> Optional[Dict[str, Any]]:
+    data = store.get(tenant_id)
+    if data is not None or not store.restorable(tenant_id):
+        return data
+
+    def restore():
+        return scheduler.run("restore", store.restore, tenant_id, tenant_id=tenant_id)
+
+    data, _ = await restore_flight.do((kind, tenant_id), restore)
+    return data
+
+async def tenant_dataset(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The tenant's dataset, for request handlers. A snapshot not yet restored is loaded
+    on a scheduler worker, once for concurrent first requests; on the event loop this
+    is only ever a dict lookup.
+    """
+    return await _restored(APP_STATE, "dataset", tenant_id)
+
+async def tenant_gstr2b(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """The tenant's portal GSTR-2B import, restored from its snapshot like tenant_dataset."""
+    return await _restored(TENANT_GSTR2B, "gstr2b", tenant_id)
@@ -0,0 +1,235 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# PER-REQUEST TRACING
+# Spans live in a context variable, so nesting follows the code path across awaits and
+# into worker threads (Starlette copies the context into its threadpool). Finished spans
+# are queued and written by a background thread as OTLP/JSON, the OpenTelemetry wire
+# format, either to a local file (one export request per line) or to an OTLP/HTTP
+# collector endpoint. Creating spans never blocks on I/O.
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Spans written per export request
+EXPORT_BATCH_SIZE = 512
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message} if self.status == STATUS_ERROR else {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        wrapped = {"boolValue": value}
+    elif isinstance(value, int):
+        wrapped = {"intValue": str(value)}
+    elif isinstance(value, float):
+        wrapped = {"doubleValue": value}
+    else:
+        wrapped = {"stringValue": str(value)}
+    return {"key": key, "value": wrapped}
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent_span_id) from a W3C traceparent header, or None if absent/invalid."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+def otlp_payload(spans: List[Span]) -> dict:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", settings.TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [s.to_otlp() for s in spans]}]
+        }]
+    }
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        pass
+
+class FileSpanExporter(SpanExporter):
+    """Appends one OTLP/JSON ExportTraceServiceRequest per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(otlp_payload(spans), separators=(",", ":")) + "\n")
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """POSTs OTLP/JSON to a collector, e.g. http://localhost:4318/v1/traces."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(otlp_payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+class InMemorySpanExporter(SpanExporter):
+    """Collector stand-in for tests and local debugging."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(spans)
+
+class SpanProcessor:
+    """Hands finished spans to the exporter from a single background thread."""
+
+    def __init__(self, exporter: Optional[SpanExporter]):
+        self.exporter = exporter
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def on_end(self, span: Span):
+        if self.exporter is None:
+            return
+        self._idle.clear()
+        self._queue.put(span)
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"Span export failed ({len(batch)} spans dropped): {e}")
+            if self._queue.empty():
+                self._idle.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        return self._idle.wait(timeout)
+
+def _default_exporter() -> Optional[SpanExporter]:
+    if settings.TRACE_OTLP_ENDPOINT:
+        return OtlpHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT)
+    if settings.TRACE_EXPORT_PATH:
+        return FileSpanExporter(settings.TRACE_EXPORT_PATH)
+    return None
+
+# Global Accessor
+processor = SpanProcessor(_default_exporter())
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+def trace_id_in(context: Context) -> Optional[str]:
+    """Trace id active in another context, e.g. the one a loop callback ran in."""
+    span = context.get(_current_span)
+    return span.trace_id if span is not None else None
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Iterator[Span]:
+    """
+    Open a span as a child of the current one. Without a current span a new trace is
+    started, continuing the caller's trace when a W3C `traceparent` is supplied.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        current = Span(name, parent.trace_id, parent.span_id, kind)
+    else:
+        remote = parse_traceparent(traceparent)
+        current = Span(name, remote[0] if remote else _new_id(16), remote[1] if remote else None, kind)
+    current.attributes.update(attributes)
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        processor.on_end(current)
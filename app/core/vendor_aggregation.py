@@ -1,62 +1,75 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 from app.schemas.vendor import VendorRiskSummary, VendorRiskLevel
 from app.schemas.reconciliation import ReconciliationStatus
 from app.schemas.invoice import Invoice
+from app.core.results_index import STATUS_CODES
+
+MATCHED_CODE = STATUS_CODES[ReconciliationStatus.MATCHED]
+MISSING_CODE = STATUS_CODES[ReconciliationStatus.MISSING_IN_2B]
+RISKY_CODE = STATUS_CODES[ReconciliationStatus.RISKY_ITC]
+# Statuses may be stored as enum members or plain strings
+STATUS_CODE_OF = {**STATUS_CODES, **{status.value: code for status, code in STATUS_CODES.items()}}
 
 def aggregate_vendor_risk(invoices: List[Invoice], reconciliation_results: List[Dict[str, Any]]) -> List[VendorRiskSummary]:
     """
     Aggregates existing reconciliation results by Vendor GSTIN.
     DOES NOT perform any new reconciliation logic.
     """
-    vendor_map: Dict[str, Dict[str, Any]] = {}
-    
-    for inv, result in zip(invoices, reconciliation_results):
-        gstin = inv.gstin
-        status_key = result["status"].name if hasattr(result["status"], "name") else str(result["status"])
-        
-        if gstin not in vendor_map:
-            vendor_map[gstin] = {
-                "total_invoices": 0,
-                "matched_count": 0,
-                "missing_in_2b_count": 0,
-                "risky_count": 0,
-                "total_taxable_value": 0.0,
-                "total_itc_amount": 0.0,
-                "risky_itc_amount": 0.0
-            }
-        
-        vendor_map[gstin]["total_invoices"] += 1
-        vendor_map[gstin]["total_taxable_value"] += inv.taxable_value
-        itc = inv.igst + inv.cgst + inv.sgst
-        vendor_map[gstin]["total_itc_amount"] += itc
-        
-        if status_key == "MATCHED":
-            vendor_map[gstin]["matched_count"] += 1
-        elif status_key == "MISSING_IN_2B":
-            vendor_map[gstin]["missing_in_2b_count"] += 1
-        elif status_key == "RISKY_ITC":
-            vendor_map[gstin]["risky_count"] += 1
-            vendor_map[gstin]["risky_itc_amount"] += itc
-    
+    return aggregate_vendor_columns(
+        (inv.gstin for inv in invoices),
+        (STATUS_CODE_OF[r["status"]] for r in reconciliation_results),
+        (inv.taxable_value_paise for inv in invoices),
+        (inv.itc_paise for inv in invoices),
+    )
+
+def aggregate_vendor_columns(
+    gstins: Iterable[str], status_codes: Iterable[int], taxable: Iterable[int], itc: Iterable[int]
+) -> List[VendorRiskSummary]:
+    """
+    The same aggregation over row-aligned columns, e.g. mmap views of a snapshot. A
+    dictionary-encoded GSTIN column is grouped by its integer codes, so only four
+    fixed-width columns are read per row and each GSTIN string is decoded once.
+    """
+    codes = getattr(gstins, "codes", None)
+    keys = gstins if codes is None else codes
+
+    # key -> [total, matched, missing, risky, taxable, itc, risky itc]
+    vendor_map: Dict[Any, List[int]] = {}
+    for key, code, taxable_paise, itc_paise in zip(keys, status_codes, taxable, itc):
+        totals = vendor_map.get(key)
+        if totals is None:
+            totals = vendor_map[key] = [0, 0, 0, 0, 0, 0, 0]
+        totals[0] += 1
+        totals[4] += taxable_paise
+        totals[5] += itc_paise
+
+        if code == MATCHED_CODE:
+            totals[1] += 1
+        elif code == MISSING_CODE:
+            totals[2] += 1
+        elif code == RISKY_CODE:
+            totals[3] += 1
+            totals[6] += itc_paise
+
     summaries = []
-    for gstin, data in vendor_map.items():
-        if data["risky_count"] > 0 or data["missing_in_2b_count"] > 0:
+    for key, (total, matched, missing, risky, taxable_paise, itc_paise, risky_itc_paise) in vendor_map.items():
+        if risky > 0 or missing > 0:
             risk_level = VendorRiskLevel.HIGH
-        elif data["matched_count"] < data["total_invoices"]:
+        elif matched < total:
             risk_level = VendorRiskLevel.MEDIUM
         else:
             risk_level = VendorRiskLevel.LOW
-        
+
         summaries.append(VendorRiskSummary(
-            vendor_gstin=gstin,
-            total_invoices=data["total_invoices"],
-            matched_count=data["matched_count"],
-            missing_in_2b_count=data["missing_in_2b_count"],
-            risky_count=data["risky_count"],
-            total_taxable_value=data["total_taxable_value"],
-            total_itc_amount=data["total_itc_amount"],
-            risky_itc_amount=data["risky_itc_amount"],
+            vendor_gstin=key if codes is None else gstins.values[key],
+            total_invoices=total,
+            matched_count=matched,
+            missing_in_2b_count=missing,
+            risky_count=risky,
+            total_taxable_value_paise=taxable_paise,
+            total_itc_amount_paise=itc_paise,
+            risky_itc_amount_paise=risky_itc_paise,
             vendor_risk_level=risk_level
         ))
-    
-    return sorted(summaries, key=lambda x: (x.vendor_risk_level.value, -x.risky_itc_amount))
+
+    return sorted(summaries, key=lambda x: (x.vendor_risk_level.value, -x.risky_itc_amount_paise))
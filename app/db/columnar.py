@@ -0,0 +1,327 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import mmap
+import os
+import struct
+import sys
+import uuid
+import zlib
+
+# COLUMNAR DATASET FILES
+# One file holds named tables of equal-length columns plus a small JSON header:
+#
+#   MAGIC (8) | header length u32 | header crc32 u32 | header JSON | buffers...
+#
+# Every buffer starts 8-byte aligned and carries its own crc32 in the header. Column kinds:
+#   int   fixed-width integers (typecode q/i/B), native little-endian
+#   dict  dictionary-encoded strings: u32 codes per row + the distinct values
+#   str   variable-length strings: i64 end offsets per row + one UTF-8 blob
+# Files are read through mmap: numeric columns and dictionary codes are memoryview casts
+# of the mapping (zero-copy), and a column is only touched (and checksummed) when used.
+
+MAGIC = b"GSTCOL\x00\x01"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+_PREAMBLE = struct.Struct("<8sII")
+OFFSET_TYPECODE = "q"
+CODE_TYPECODE = "I"
+
+class ColumnarFormatError(Exception):
+    """The file is not a readable columnar file: bad magic, version, byte order or checksum."""
+
+# WRITING
+
+class _Buffers:
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> list:
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        pad = -self.size % ALIGNMENT
+        if pad:
+            self.chunks.append(b"\0" * pad)
+            self.size += pad
+        # [relative offset, length, crc32]; made absolute once the header size is known
+        return [offset, len(data), zlib.crc32(data)]
+
+def int_column(values: Iterable[int], typecode: str = "q") -> Tuple[str, Any]:
+    return ("int", array(typecode, values))
+
+def dict_column(values: Iterable[str]) -> Tuple[str, Any]:
+    return ("dict", values)
+
+def str_column(values: Iterable[str]) -> Tuple[str, Any]:
+    return ("str", values)
+
+def _encode_strings(values: Iterable[str]) -> Tuple[bytes, bytes, int]:
+    ends = array(OFFSET_TYPECODE)
+    blob = bytearray()
+    for value in values:
+        blob += value.encode("utf-8")
+        ends.append(len(blob))
+    return ends.tobytes(), bytes(blob), len(ends)
+
+def _encode_column(kind: str, data: Any, buffers: _Buffers) -> Tuple[dict, int]:
+    if kind == "int":
+        return {"kind": "int", "typecode": data.typecode, "values": buffers.add(data.tobytes())}, len(data)
+    if kind == "dict":
+        codes = array(CODE_TYPECODE)
+        lookup: Dict[str, int] = {}
+        for value in data:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+            codes.append(code)
+        ends, blob, _ = _encode_strings(lookup)
+        return {
+            "kind": "dict",
+            "codes": buffers.add(codes.tobytes()),
+            "dictionary_offsets": buffers.add(ends),
+            "dictionary_data": buffers.add(blob),
+            "cardinality": len(lookup),
+        }, len(codes)
+    if kind == "str":
+        ends, blob, rows = _encode_strings(data)
+        return {"kind": "str", "offsets": buffers.add(ends), "data": buffers.add(blob)}, rows
+    raise ValueError(f"Unknown column kind '{kind}'")
+
+def write_columnar(path: str, tables: Dict[str, Dict[str, Tuple[str, Any]]], meta: Optional[Dict[str, Any]] = None):
+    """
+    Write `tables` ({table: {column: (kind, values)}}) atomically: the file is built
+    under a temporary name in the same directory, fsynced, then renamed over `path`.
+    """
+    buffers = _Buffers()
+    header_tables: Dict[str, Any] = {}
+    for table, columns in tables.items():
+        rows = None
+        encoded = {}
+        for name, (kind, data) in columns.items():
+            encoded[name], length = _encode_column(kind, data, buffers)
+            if rows is not None and length != rows:
+                raise ValueError(f"Column '{table}.{name}' has {length} rows, expected {rows}")
+            rows = length
+        header_tables[table] = {"rows": rows or 0, "columns": encoded}
+
+    header = {
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "meta": meta or {},
+        "tables": header_tables,
+    }
+    # Buffer offsets are relative until the header (whose length depends on them) is
+    # sized; a fixed-width placeholder pass keeps that to two encodings
+    data_start = _data_start(header, placeholder=True)
+    _relocate(header_tables, data_start)
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (data_start - _PREAMBLE.size - len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    temporary = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, len(header_bytes), zlib.crc32(header_bytes)))
+            f.write(header_bytes)
+            for chunk in buffers.chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    _fsync_directory(directory)
+
+def _buffer_refs(column: dict) -> Iterator[list]:
+    for key in ("values", "codes", "dictionary_offsets", "dictionary_data", "offsets", "data"):
+        if key in column:
+            yield column[key]
+
+def _data_start(header: dict, placeholder: bool) -> int:
+    if placeholder:
+        # Widest possible offsets so the real header can only be shorter
+        probe = json.loads(json.dumps(header))
+        for table in probe["tables"].values():
+            for column in table["columns"].values():
+                for ref in _buffer_refs(column):
+                    ref[0] = 2 ** 53
+        size = len(json.dumps(probe, separators=(",", ":")).encode("utf-8"))
+    else:
+        size = len(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+    end = _PREAMBLE.size + size
+    return end + (-end % ALIGNMENT)
+
+def _relocate(tables: dict, data_start: int):
+    for table in tables.values():
+        for column in table["columns"].values():
+            for ref in _buffer_refs(column):
+                ref[0] += data_start
+
+def _fsync_directory(directory: str):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# READING
+
+class StringColumn(Sequence):
+    """Variable-length strings decoded on access from the mapped blob."""
+
+    def __init__(self, ends: memoryview, data: memoryview):
+        self._ends = ends
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        start = self._ends[row - 1] if row else 0
+        return bytes(self._data[start:self._ends[row]]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data = self._data
+        start = 0
+        for end in self._ends:
+            yield bytes(data[start:end]).decode("utf-8")
+            start = end
+
+class DictColumn(Sequence):
+    """
+    Dictionary-encoded strings. `codes` is a zero-copy u32 view, `values` the distinct
+    strings: group-bys can work on codes and decode only once per distinct value.
+    """
+
+    def __init__(self, codes: memoryview, values: List[str]):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self.values[code] for code in self.codes[row]]
+        return self.values[self.codes[row]]
+
+    def __iter__(self) -> Iterator[str]:
+        values = self.values
+        return (values[code] for code in self.codes)
+
+class ColumnarFile:
+    """
+    Read-only view of a columnar file. Columns are mapped lazily and cached; their
+    checksums are verified on first access (or all at once with verify_all()).
+    Views stay valid until close(); copy values out before closing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            # The mapping holds its own descriptor: long-lived views do not pin one open
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ColumnarFormatError(f"{path}: empty file")
+        self._view = memoryview(self._map)
+        self._columns: Dict[Tuple[str, str], Any] = {}
+        try:
+            self.header = self._read_header()
+        except BaseException:
+            self.close()
+            raise
+        self.meta: Dict[str, Any] = self.header["meta"]
+
+    def _read_header(self) -> dict:
+        if len(self._map) < _PREAMBLE.size:
+            raise ColumnarFormatError(f"{self.path}: truncated")
+        magic, length, crc = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ColumnarFormatError(f"{self.path}: not a columnar file")
+        raw = bytes(self._view[_PREAMBLE.size:_PREAMBLE.size + length])
+        if len(raw) != length or zlib.crc32(raw) != crc:
+            raise ColumnarFormatError(f"{self.path}: header checksum mismatch")
+        header = json.loads(raw)
+        if header.get("format") != FORMAT_VERSION:
+            raise ColumnarFormatError(f"{self.path}: unsupported format {header.get('format')}")
+        if header.get("byteorder") != sys.byteorder:
+            raise ColumnarFormatError(f"{self.path}: written on a {header.get('byteorder')}-endian host")
+        return header
+
+    def tables(self) -> List[str]:
+        return list(self.header["tables"])
+
+    def rows(self, table: str) -> int:
+        return self.header["tables"][table]["rows"]
+
+    def has_column(self, table: str, name: str) -> bool:
+        return name in self.header["tables"].get(table, {}).get("columns", {})
+
+    def column(self, table: str, name: str):
+        """memoryview for int columns, DictColumn or StringColumn otherwise."""
+        key = (table, name)
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = self._load(self.header["tables"][table]["columns"][name], f"{table}.{name}")
+        return column
+
+    def verify_all(self):
+        for table, spec in self.header["tables"].items():
+            for name in spec["columns"]:
+                self.column(table, name)
+
+    def _buffer(self, ref: list, label: str) -> memoryview:
+        offset, length, crc = ref
+        view = self._view[offset:offset + length]
+        if len(view) != length or zlib.crc32(view) != crc:
+            raise ColumnarFormatError(f"{self.path}: checksum mismatch in {label}")
+        return view
+
+    def _load(self, spec: dict, label: str):
+        kind = spec["kind"]
+        if kind == "int":
+            return self._buffer(spec["values"], label).cast(spec["typecode"])
+        if kind == "dict":
+            ends = self._buffer(spec["dictionary_offsets"], label).cast(OFFSET_TYPECODE)
+            values = list(StringColumn(ends, self._buffer(spec["dictionary_data"], label)))
+            return DictColumn(self._buffer(spec["codes"], label).cast(CODE_TYPECODE), values)
+        if kind == "str":
+            return StringColumn(self._buffer(spec["offsets"], label).cast(OFFSET_TYPECODE), self._buffer(spec["data"], label))
+        raise ColumnarFormatError(f"{self.path}: unknown column kind '{kind}'")
+
+    def close(self):
+        columns, self._columns = self._columns, {}
+        for column in columns.values():
+            for view in (column, getattr(column, "codes", None), getattr(column, "_ends", None), getattr(column, "_data", None)):
+                if isinstance(view, memoryview):
+                    view.release()
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_map", None) is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Views handed out are still alive; the mapping goes with them
+                pass
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,7 +1,86 @@
-from typing import Dict, Any
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional
+import threading
 
 # AUTHORITATIVE GLOBAL STORE – DO NOT DUPLICATE
-# Structure: { tenant_id: { "invoices": [], "reconciliation": [], "timestamp": "" } }
-# PHASE-1 LOCKED: In-memory store only. 
+# Structure: { tenant_id: { "invoices": [], "reconciliation": [], "gstr2b": [], "timestamp": "" } }
+# PHASE-1 LOCKED: In-memory store only.
 # DO NOT add persistent database migrations or multi-tenant indexing in Phase-1.
-APP_STATE: Dict[str, Any] = {}
+# Datasets may be snapshotted to disk (app.core.snapshots) so a restart does not lose
+# them. Lookups here never touch the disk: a tenant missing here is restored through
+# `loader` by `restore`, which blocks, so request handlers go through
+# app.core.snapshots.tenant_dataset to run it off the event loop.
+# Large datasets may also be swapped for a file-backed copy of themselves (`swap`).
+
+class DatasetLoader(ABC):
+    @abstractmethod
+    def load(self, tenant_id: str) -> Optional[Dict[str, Any]]:
+        """The tenant's stored dataset, or None. May block on disk I/O."""
+        pass
+
+    @abstractmethod
+    def known_absent(self, tenant_id: str) -> bool:
+        """True when `load` is known to return None, answered without I/O."""
+        pass
+
+    @abstractmethod
+    def stored(self, tenant_id: str):
+        """A dataset was just stored for the tenant: forget it as absent."""
+        pass
+
+class TenantStore(dict):
+    """Plain dict of tenant datasets whose misses may be restored through a loader."""
+
+    def __init__(self):
+        super().__init__()
+        self.loader: Optional[DatasetLoader] = None
+        self._lock = threading.Lock()
+
+    def restorable(self, tenant_id) -> bool:
+        """Not resident, but the loader may have it. Cheap: no I/O."""
+        loader = self.loader
+        return loader is not None and not dict.__contains__(self, tenant_id) and not loader.known_absent(tenant_id)
+
+    def restore(self, tenant_id) -> Optional[Dict[str, Any]]:
+        """The tenant's dataset, loaded through `loader` if not resident. Blocking."""
+        data = dict.get(self, tenant_id)
+        loader = self.loader
+        if data is not None or loader is None:
+            return data
+        data = loader.load(tenant_id)
+        if data is None:
+            return None
+        # An upload that landed while loading wins over the snapshot
+        return self.setdefault(tenant_id, data)
+
+    def __setitem__(self, tenant_id, data):
+        with self._lock:
+            dict.__setitem__(self, tenant_id, data)
+        loader = self.loader
+        if loader is not None:
+            loader.stored(tenant_id)
+
+    def setdefault(self, tenant_id, data):
+        with self._lock:
+            return dict.setdefault(self, tenant_id, data)
+
+    def swap(self, tenant_id, expected, replacement) -> bool:
+        """Replace the tenant's dataset only if it is still `expected` (not re-uploaded since)."""
+        with self._lock:
+            if dict.get(self, tenant_id) is not expected:
+                return False
+            dict.__setitem__(self, tenant_id, replacement)
+            return True
+
+APP_STATE: TenantStore = TenantStore()
+
+# Per-tenant settings. Kept apart from APP_STATE so that a fresh upload
+# (which replaces the tenant's dataset) does not reset them.
+# Structure: { tenant_id: { "tolerance": MatchTolerance } }
+TENANT_SETTINGS: Dict[str, Any] = {}
+
+# GSTR-2B downloads loaded from the GST portal (app.core.gstr2b), matched against the
+# tenant's later invoice uploads. Kept apart from APP_STATE for the same reason, and
+# snapshotted and restored the same way.
+# Structure: { tenant_id: { "records": [Invoice], "index": Gstr2bIndex, "content_hash": "", ... } }
+TENANT_GSTR2B: TenantStore = TenantStore()
@@ -21,5 +21,17 @@ class Database:
         # Implementation for closing connection would go here
         pass
 
-# Global database instance
-db = Database()
+# Global database instance, constructed on first access so importing this
+# module stays cheap. `from app.db.session import db` keeps working.
+_db = None
+
+def get_db() -> Database:
+    global _db
+    if _db is None:
+        _db = Database()
+    return _db
+
+def __getattr__(name):
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from app.core.config import settings
-from app.api import health
+from app.api import health, metrics, debug
 # from app.db.session import db # Can be imported when needed for startup hooks
 
 app = FastAPI(title=settings.PROJECT_NAME)
@@ -17,23 +17,43 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Include routers
 app.include_router(web.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
 
-from app.api import invoices, explanation, reports
+from app.api import invoices, gstr2b, explanation, reports, reconciliation, settings as tenant_settings
 app.include_router(invoices.router)
+app.include_router(gstr2b.router)
 app.include_router(explanation.router)
 app.include_router(reports.router)
+app.include_router(reconciliation.router)
+app.include_router(tenant_settings.router)
 
 @app.on_event("startup")
 async def startup_event():
     # Placeholder for database connection
     # await db.connect()
-    pass
+    if settings.LOOP_MONITOR_ENABLED:
+        from app.core.loop_monitor import monitor
+        monitor.start()
+    if settings.SNAPSHOT_DIR:
+        # Only starts the writer; tenants are restored lazily on first access
+        from app.core.snapshots import snapshots
+        snapshots.start()
+    if settings.PREWARM_ON_STARTUP:
+        # Not awaited: startup completes and /health is served while this runs
+        import asyncio
+        from app.core.prewarm import prewarm
+        app.state.prewarm = asyncio.get_running_loop().run_in_executor(None, prewarm)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     # Placeholder for database disconnection
     # await db.disconnect()
-    pass
+    from app.core.loop_monitor import monitor
+    monitor.stop()
+    from app.core.snapshots import snapshots
+    # Flushes pending snapshots so a deploy does not lose the latest uploads
+    snapshots.stop()
 
 if __name__ == "__main__":
     import uvicorn
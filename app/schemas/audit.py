@@ -3,6 +3,7 @@ from typing import Optional
 from datetime import datetime
 import uuid
 from enum import Enum
+from app.core.tracing import current_trace_id
 
 class AuditStatus(str, Enum):
     SUCCESS = "SUCCESS"
@@ -19,3 +20,5 @@ class AuditLogEntry(BaseModel):
     input_hash: Optional[str] = None
     output_hash: Optional[str] = None
     status: AuditStatus
+    # Trace of the request that produced this entry, for correlating with exported spans
+    trace_id: Optional[str] = Field(default_factory=current_trace_id)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 from app.schemas.reconciliation import ReconciliationStatus
 
 class ExplainRequest(BaseModel):
@@ -13,3 +13,16 @@ class ExplainResponse(BaseModel):
     root_cause: str
     suggested_action: str
     original_status: ReconciliationStatus
+    # "rules" (precomputed at ingestion), "llm" or "fallback"
+    source: str = "llm"
+
+# Upper bound on items per /explain-mismatch/batch call
+MAX_BATCH_ITEMS = 100
+
+class ExplainBatchRequest(BaseModel):
+    items: List[ExplainRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+class ExplainBatchItem(ExplainResponse):
+    # Position of the item in the request; results stream in completion order
+    index: int
+    invoice_number: str
@@ -2,17 +2,23 @@ from pydantic import BaseModel, Field, field_validator, ValidationInfo
 from datetime import date, datetime
 import re
 from typing import Optional
+from app.core.money import to_paise
 
 class Invoice(BaseModel):
     gstin: str
     invoice_number: str = Field(..., validation_alias="invoice_no")
     invoice_date: date
-    taxable_value: float
-    cgst: float
-    sgst: float
-    igst: float
+    # Amounts are accepted in rupees and stored as exact integer paise
+    taxable_value_paise: int = Field(..., validation_alias="taxable_value")
+    cgst_paise: int = Field(..., validation_alias="cgst")
+    sgst_paise: int = Field(..., validation_alias="sgst")
+    igst_paise: int = Field(..., validation_alias="igst")
     source: str = "customer"
 
+    @property
+    def itc_paise(self) -> int:
+        return self.igst_paise + self.cgst_paise + self.sgst_paise
+
     @field_validator('gstin')
     @classmethod
     def validate_gstin(cls, v):
@@ -33,12 +39,16 @@ class Invoice(BaseModel):
                 raise ValueError("Date must be in YYYY-MM-DD format")
         return v
 
-    @field_validator('taxable_value', 'cgst', 'sgst', 'igst', mode='before')
+    @field_validator('taxable_value_paise', 'cgst_paise', 'sgst_paise', 'igst_paise', mode='before')
     @classmethod
     def validate_numeric(cls, v, info: ValidationInfo):
         # Strict numeric check for CSV strings
+        field_name = info.field_name.removesuffix("_paise")
         if isinstance(v, str):
             if not re.match(r'^-?\d+(\.\d+)?$', v.strip()):
-                 raise ValueError(f"{info.field_name} must be strictly numeric")
-        return v
+                 raise ValueError(f"{field_name} must be strictly numeric")
+        try:
+            return to_paise(v)
+        except (ValueError, ArithmeticError):
+            raise ValueError(f"{field_name} must be strictly numeric")
 
@@ -13,5 +13,19 @@ class ReconciliationResult(BaseModel):
     invoice_number: str
     gstin: str
     status: ReconciliationStatus
+    # Per-field deltas against the matched GSTR-2B record, e.g.
+    # {"taxable_value": {"customer": 1000.0, "gstr2b": 1000.5, "delta": -0.5}}
     diffs: Dict[str, Any] = Field(default_factory=dict)
     remarks: Optional[str] = None
+
+class MatchTolerance(BaseModel):
+    """
+    Per-tenant tolerance used when matching customer invoices against GSTR-2B.
+    A difference is accepted when it is within EITHER the absolute or the
+    percentage allowance (whichever is larger).
+    """
+    taxable_value_abs: float = Field(1.0, ge=0)
+    taxable_value_pct: float = Field(0.0, ge=0, le=100)
+    tax_abs: float = Field(1.0, ge=0)
+    tax_pct: float = Field(0.0, ge=0, le=100)
+    date_window_days: int = Field(0, ge=0, le=365)
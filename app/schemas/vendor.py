@@ -13,7 +13,8 @@ class VendorRiskSummary(BaseModel):
     matched_count: int
     missing_in_2b_count: int
     risky_count: int
-    total_taxable_value: float
-    total_itc_amount: float
-    risky_itc_amount: float
+    # Exact amounts in paise; converted to rupees only when serialised for clients
+    total_taxable_value_paise: int
+    total_itc_amount_paise: int
+    risky_itc_amount_paise: int
     vendor_risk_level: VendorRiskLevel
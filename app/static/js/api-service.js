@@ -3,17 +3,60 @@
  * No UI logic or data transformation allowed here.
  */
 const ApiService = {
+    /**
+     * Last report representation per tenant and endpoint: { etag, data }.
+     * Sent back as If-None-Match; a 304 means the cached copy is still current.
+     */
+    _reportCache: {},
+
+    /**
+     * GET with ETag revalidation against _reportCache.
+     * @param {string} url
+     * @param {string} tenantId
+     * @param {function(Response): Promise<*>} read - extracts the payload from a 200
+     * @returns {Promise<{response: Response, data: *}>}
+     */
+    async _conditionalGet(url, tenantId, read) {
+        const key = `${tenantId}:${url}`;
+        const cached = this._reportCache[key];
+        const headers = { 'X-Tenant-ID': tenantId };
+        if (cached) {
+            headers['If-None-Match'] = cached.etag;
+        }
+
+        // cache: 'no-store' keeps the browser from answering for us, so the 304 is visible here
+        const response = await fetch(url, { method: 'GET', headers, cache: 'no-store' });
+        if (response.status === 304 && cached) {
+            return { response, data: cached.data };
+        }
+        if (!response.ok) {
+            return { response, data: null };
+        }
+
+        const data = await read(response);
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            this._reportCache[key] = { etag, data };
+        } else {
+            delete this._reportCache[key];
+        }
+        return { response, data };
+    },
+
     /**
      * Upload invoices for reconciliation.
      * @param {File} file - CSV file
      * @param {string} tenantId - Tenant identifier
      * @param {string} plan - Subscription plan
+     * @param {boolean} [summaryOnly=false] - Return counts/totals/top vendors only;
+     *     fetch individual results with getReconciliationResults
      */
-    async uploadInvoices(file, tenantId, plan) {
+    async uploadInvoices(file, tenantId, plan, summaryOnly = false) {
         const formData = new FormData();
         formData.append('file', file);
 
-        const response = await fetch('/invoices/upload', {
+        const url = summaryOnly ? '/invoices/upload?response=summary' : '/invoices/upload';
+        const response = await fetch(url, {
             method: 'POST',
             headers: {
                 'X-Tenant-ID': tenantId,
@@ -30,11 +73,14 @@ const ApiService = {
     },
 
     /**
-     * Fetch the JSON risk report.
-     * @param {string} tenantId 
+     * Fetch one page of stored reconciliation results.
+     * @param {string} tenantId
+     * @param {Object} [params] - limit, cursor, status, data_version, ...
+     * @returns {Promise<{items: Array, next_cursor: ?string, data_version: string}>}
      */
-    async getRiskReportJSON(tenantId) {
-        const response = await fetch('/reports/gst-risk', {
+    async getReconciliationResults(tenantId, params = {}) {
+        const query = new URLSearchParams(params).toString();
+        const response = await fetch(`/reconciliation/results${query ? '?' + query : ''}`, {
             method: 'GET',
             headers: {
                 'X-Tenant-ID': tenantId
@@ -43,7 +89,20 @@ const ApiService = {
 
         const data = await response.json();
         if (!response.ok) {
-            throw new Error(data.detail || 'Failed to fetch report');
+            throw new Error(data.detail || 'Failed to fetch results');
+        }
+        return data;
+    },
+
+    /**
+     * Fetch the JSON risk report.
+     * @param {string} tenantId 
+     */
+    async getRiskReportJSON(tenantId) {
+        const { response, data } = await this._conditionalGet('/reports/gst-risk', tenantId, (r) => r.json());
+        if (!response.ok && response.status !== 304) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || 'Failed to fetch report');
         }
         return data;
     },
@@ -53,19 +112,13 @@ const ApiService = {
      * @param {string} tenantId 
      */
     async downloadRiskReportPDF(tenantId) {
-        const response = await fetch('/reports/gst-risk/pdf', {
-            method: 'GET',
-            headers: {
-                'X-Tenant-ID': tenantId
-            }
-        });
+        const { response, data: blob } = await this._conditionalGet('/reports/gst-risk/pdf', tenantId, (r) => r.blob());
 
-        if (!response.ok) {
+        if (!response.ok && response.status !== 304) {
             const data = await response.json().catch(() => ({}));
             throw new Error(data.detail || 'Failed to download PDF');
         }
 
-        const blob = await response.blob();
         return {
             blob,
             filename: `GST_Risk_Report_${tenantId.slice(0, 8)}.pdf`
@@ -19,9 +19,11 @@ async function handleUpload(e) {
     processingState.style.display = 'block';
 
     try {
-        // Use ApiService for upload
-        const data = await ApiService.uploadInvoices(file, CTX_TENANT_ID, CTX_PLAN);
-        renderResults(data);
+        // Summary upload: the response size no longer grows with the file.
+        // The table is filled from the paginated results endpoint instead.
+        const summary = await ApiService.uploadInvoices(file, CTX_TENANT_ID, CTX_PLAN, true);
+        const rows = await fetchResultRows(summary.data_version, TABLE_MAX_ROWS);
+        renderResults(summary, rows);
     } catch (err) {
         // Requirement 4: Propagation of errors
         errorDiv.textContent = 'Reconciliation could not be completed. ' + err.message;
@@ -32,16 +34,27 @@ async function handleUpload(e) {
     }
 }
 
-function renderResults(data) {
-    resultsArea.style.display = 'block';
+const TABLE_MAX_ROWS = 1000;
+const RESULTS_PAGE_SIZE = 500;
+
+async function fetchResultRows(dataVersion, maxRows) {
+    const rows = [];
+    let cursor = null;
+    do {
+        const params = { limit: RESULTS_PAGE_SIZE, data_version: dataVersion };
+        if (cursor) params.cursor = cursor;
+        const page = await ApiService.getReconciliationResults(CTX_TENANT_ID, params);
+        rows.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor && rows.length < maxRows);
+    return rows.slice(0, maxRows);
+}
 
-    const results = data.reconciliation_results || [];
+function renderResults(data, results) {
+    resultsArea.style.display = 'block';
 
     // 1. Update Summary Cards
-    const counts = { MATCHED: 0, PARTIAL_MATCH: 0, MISSING_IN_2B: 0, RISKY_ITC: 0 };
-    results.forEach(r => {
-        counts[r.status] = (counts[r.status] || 0) + 1;
-    });
+    const counts = Object.assign({ MATCHED: 0, PARTIAL_MATCH: 0, MISSING_IN_2B: 0, RISKY_ITC: 0 }, data.counts);
 
     document.getElementById('count-matched').textContent = counts.MATCHED;
     document.getElementById('count-partial').textContent = counts.PARTIAL_MATCH;
@@ -52,7 +65,7 @@ function renderResults(data) {
     const tbody = document.querySelector('#results-table tbody');
     tbody.innerHTML = '';
 
-    results.slice(0, 1000).forEach(r => {
+    results.slice(0, TABLE_MAX_ROWS).forEach(r => {
         const tr = document.createElement('tr');
         tr.innerHTML = `
             <td>${r.invoice_number}</td>
@@ -68,7 +81,7 @@ function renderResults(data) {
     document.getElementById('limit-usage').textContent = data.total_invoices;
 
     // Render Vendor Summary
-    const vendorSummary = data.vendor_summary || [];
+    const vendorSummary = data.vendor_top || [];
     if (vendorSummary.length > 0) {
         const vendorSection = document.getElementById('vendor-risk-section');
         vendorSection.style.display = 'block';
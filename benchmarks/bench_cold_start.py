@@ -0,0 +1,57 @@
+"""
+Cold start benchmark: wall time from spawning the API process to its first
+successful /health response.
+
+Usage:
+    python -m benchmarks.bench_cold_start [--runs 5] [--port 8765] [--no-prewarm]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+def time_to_first_health(port: int, env: dict, timeout: float = 30.0) -> float:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("API did not become healthy")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-prewarm", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.no_prewarm:
+        env["PREWARM_ON_STARTUP"] = "false"
+    samples = [time_to_first_health(args.port, env) for _ in range(args.runs)]
+    print(json.dumps({
+        "benchmark": "cold_start",
+        "runs": args.runs,
+        "prewarm": not args.no_prewarm,
+        "median_s": round(statistics.median(samples), 3),
+        "min_s": round(min(samples), 3),
+        "max_s": round(max(samples), 3)
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Money arithmetic benchmark: integer paise vs Decimal vs float.
+
+Runs the same parse + aggregate work the ingestion and reporting paths do
+(grand totals, a status-masked total and per-vendor totals) with each
+representation, and checks that the paise totals are identical to Decimal.
+
+Usage:
+    python -m benchmarks.bench_money [--rows 100000] [--vendors 500]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+from decimal import Decimal
+from app.core.money import parse_paise_column, sum_paise, format_rupees
+
+def _dataset(rows: int, vendors: int, seed: int = 42):
+    rng = random.Random(seed)
+    amounts = [f"{rng.randint(0, 2_000_000)}.{rng.randint(0, 99):02d}" for _ in range(rows)]
+    vendor_ids = [rng.randrange(vendors) for _ in range(rows)]
+    at_risk = [rng.random() < 0.2 for _ in range(rows)]
+    return amounts, vendor_ids, at_risk
+
+def _aggregate(values, vendor_ids, at_risk, zero, total_fn, masked_fn):
+    per_vendor = {}
+    for vendor, value in zip(vendor_ids, values):
+        per_vendor[vendor] = per_vendor.get(vendor, zero) + value
+    return total_fn(values), masked_fn(values, at_risk), per_vendor
+
+def _timed(fn, repeat: int = 3):
+    # Best of N with the cyclic GC paused, as timeit does
+    best, value = float("inf"), None
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return value, best
+
+def run(rows: int, vendors: int) -> dict:
+    raw, vendor_ids, at_risk = _dataset(rows, vendors)
+
+    paise, paise_parse = _timed(lambda: parse_paise_column(raw))
+    paise_agg, paise_aggregate = _timed(lambda: _aggregate(
+        paise, vendor_ids, at_risk, 0, sum_paise, sum_paise
+    ))
+
+    decimals, decimal_parse = _timed(lambda: [Decimal(v) for v in raw])
+    decimal_agg, decimal_aggregate = _timed(lambda: _aggregate(
+        decimals, vendor_ids, at_risk, Decimal(0),
+        lambda col: sum(col, Decimal(0)),
+        lambda col, mask: sum((v for v, m in zip(col, mask) if m), Decimal(0))
+    ))
+
+    floats, float_parse = _timed(lambda: [float(v) for v in raw])
+    float_agg, float_aggregate = _timed(lambda: _aggregate(
+        floats, vendor_ids, at_risk, 0.0, sum,
+        lambda col, mask: sum(v for v, m in zip(col, mask) if m)
+    ))
+
+    exact = (
+        format_rupees(paise_agg[0]) == str(decimal_agg[0])
+        and format_rupees(paise_agg[1]) == str(decimal_agg[1])
+        and all(format_rupees(paise_agg[2][k]) == str(decimal_agg[2][k]) for k in decimal_agg[2])
+    )
+    _, paise_sums = _timed(lambda: (sum_paise(paise), sum_paise(paise, at_risk)))
+    _, decimal_sums = _timed(lambda: (
+        sum(decimals, Decimal(0)), sum((v for v, m in zip(decimals, at_risk) if m), Decimal(0))
+    ))
+
+    paise_total_s = paise_parse + paise_aggregate
+    decimal_total_s = decimal_parse + decimal_aggregate
+
+    return {
+        "rows": rows,
+        "vendors": vendors,
+        "paise": {"parse_s": paise_parse, "aggregate_s": paise_aggregate, "total": format_rupees(paise_agg[0])},
+        "decimal": {"parse_s": decimal_parse, "aggregate_s": decimal_aggregate, "total": str(decimal_agg[0])},
+        "float": {"parse_s": float_parse, "aggregate_s": float_aggregate, "total": repr(float_agg[0])},
+        "exact_vs_decimal": exact,
+        "float_error": str(Decimal(repr(float_agg[0])) - decimal_agg[0]),
+        "totals_speedup_vs_decimal": decimal_sums / paise_sums,
+        "aggregate_speedup_vs_decimal": decimal_aggregate / paise_aggregate,
+        "end_to_end_speedup_vs_decimal": decimal_total_s / paise_total_s,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--vendors", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.vendors), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Detailed PDF benchmark: render time and peak Python heap for N-row tenants.
+
+Usage:
+    python -m benchmarks.bench_pdf [--rows 10000,100000] [--no-memory]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from app.db.memory import APP_STATE
+from app.api.reports import internal_get_report_data
+from app.core.pdf_report import render_report_pdf
+from benchmarks.generators import synthetic_tenant
+
+def run(rows: int, measure_memory: bool = True) -> dict:
+    tenant_id = f"bench-pdf-{rows}"
+    APP_STATE[tenant_id] = synthetic_tenant(rows)
+    try:
+        report = asyncio.run(internal_get_report_data(tenant_id))
+        if measure_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        pdf = render_report_pdf(report, APP_STATE[tenant_id])
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        if measure_memory:
+            tracemalloc.stop()
+        pdf.seek(0, 2)
+        size = pdf.tell()
+        pdf.close()
+    finally:
+        APP_STATE.pop(tenant_id, None)
+
+    return {
+        "rows": rows,
+        "render_s": elapsed,
+        "rows_per_s": rows / elapsed,
+        "peak_heap_bytes": peak,
+        "pdf_bytes": size,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak figure)")
+    args = parser.parse_args()
+    results = [run(int(n), not args.no_memory) for n in args.rows.split(",")]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
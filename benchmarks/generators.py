@@ -0,0 +1,157 @@
+"""
+Synthetic tenant generators shared by the benchmarks and load tests.
+
+Datasets are deterministic for a given seed. Each customer invoice is assigned a
+target reconciliation status from the status mix and, where the status needs one,
+a GSTR-2B counterpart is emitted so the real matching engine produces that status:
+
+    MATCHED        identical GSTR-2B record
+    PARTIAL_MATCH  same invoice number, taxable value off by more than the tolerance
+    MISSING_IN_2B  no GSTR-2B record, value at or below the high-value threshold
+    RISKY_ITC      no GSTR-2B record, value above the high-value threshold
+"""
+import csv
+import io
+import random
+import string
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.schemas.invoice import Invoice
+from app.core.reconciliation import reconcile_invoice, HIGH_VALUE_THRESHOLD_PAISE
+from app.core.matching import Gstr2bIndex
+from app.core.money import amount_columns, format_rupees
+from app.core.results_index import ResultsIndex
+from app.core.rule_explanations import precompute_explanation
+from app.core.vendor_aggregation import aggregate_vendor_risk
+
+DEFAULT_STATUS_MIX = {"MATCHED": 0.6, "PARTIAL_MATCH": 0.15, "MISSING_IN_2B": 0.15, "RISKY_ITC": 0.1}
+CSV_COLUMNS = ["invoice_no", "gstin", "taxable_value", "igst", "cgst", "sgst", "invoice_date", "source"]
+
+# Taxable value offset for PARTIAL_MATCH counterparts, well beyond the default Rs. 1 tolerance
+PARTIAL_OFFSET_PAISE = 500 * 100
+
+def parse_status_mix(text: str) -> Dict[str, float]:
+    """'MATCHED=0.7,RISKY_ITC=0.3' -> normalised mix."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip().upper()
+        if name not in DEFAULT_STATUS_MIX:
+            raise ValueError(f"Unknown status '{name}'")
+        mix[name] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Status mix weights must sum to a positive value")
+    return {k: v / total for k, v in mix.items()}
+
+def vendor_gstin(vendor: int) -> str:
+    # Valid GSTIN for any vendor id: 4 digits plus a base-26 letter block
+    letters, digits = divmod(vendor, 10000)
+    block = ""
+    for _ in range(5):
+        letters, r = divmod(letters, 26)
+        block = string.ascii_uppercase[r] + block
+    return f"27{block}{digits:04d}A1Z5"
+
+def synthetic_records(
+    rows: int,
+    vendors: int = 500,
+    status_mix: Optional[Dict[str, float]] = None,
+    seed: int = 7
+) -> Iterator[Tuple[Dict[str, object], Optional[Dict[str, object]]]]:
+    """(customer row, GSTR-2B row or None) pairs with amounts in paise."""
+    rng = random.Random(seed)
+    mix = status_mix or DEFAULT_STATUS_MIX
+    statuses, weights = list(mix), list(mix.values())
+    start = date(2024, 1, 1)
+
+    for i in range(rows):
+        status = rng.choices(statuses, weights)[0]
+        if status == "RISKY_ITC":
+            taxable = rng.randrange(HIGH_VALUE_THRESHOLD_PAISE + 100, 20 * HIGH_VALUE_THRESHOLD_PAISE)
+        elif status == "MISSING_IN_2B":
+            taxable = rng.randrange(10_000, HIGH_VALUE_THRESHOLD_PAISE)
+        else:
+            taxable = rng.randrange(10_000, 20 * HIGH_VALUE_THRESHOLD_PAISE)
+        half_tax = taxable * 9 // 100
+        row = {
+            "invoice_no": f"INV-{i:07d}",
+            "gstin": vendor_gstin(rng.randrange(vendors)),
+            "taxable_value": taxable,
+            "igst": 0,
+            "cgst": half_tax,
+            "sgst": half_tax,
+            "invoice_date": start + timedelta(days=rng.randrange(90)),
+            "source": "customer",
+        }
+        counterpart = None
+        if status in ("MATCHED", "PARTIAL_MATCH"):
+            counterpart = dict(row, source="gstr2b")
+            if status == "PARTIAL_MATCH":
+                counterpart["taxable_value"] = taxable + PARTIAL_OFFSET_PAISE
+        yield row, counterpart
+
+def _csv_row(row: Dict[str, object]) -> List[str]:
+    return [
+        row["invoice_no"], row["gstin"], format_rupees(row["taxable_value"]), format_rupees(row["igst"]),
+        format_rupees(row["cgst"]), format_rupees(row["sgst"]), row["invoice_date"].isoformat(), row["source"],
+    ]
+
+def synthetic_csv(rows: int, vendors: int = 500, status_mix: Optional[Dict[str, float]] = None, seed: int = 7) -> str:
+    """Upload-ready CSV: customer rows followed by their GSTR-2B counterparts."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS)
+    counterparts = []
+    for row, counterpart in synthetic_records(rows, vendors, status_mix, seed):
+        writer.writerow(_csv_row(row))
+        if counterpart is not None:
+            counterparts.append(counterpart)
+    for counterpart in counterparts:
+        writer.writerow(_csv_row(counterpart))
+    return buffer.getvalue()
+
+def _invoice(row: Dict[str, object]) -> Invoice:
+    # Generated rows are valid by construction; skip validation to keep setup fast
+    return Invoice.model_construct(
+        gstin=row["gstin"],
+        invoice_number=row["invoice_no"],
+        invoice_date=row["invoice_date"],
+        taxable_value_paise=row["taxable_value"],
+        cgst_paise=row["cgst"],
+        sgst_paise=row["sgst"],
+        igst_paise=row["igst"],
+        source=row["source"],
+    )
+
+def synthetic_invoices(
+    rows: int, vendors: int = 500, status_mix: Optional[Dict[str, float]] = None, seed: int = 7
+) -> Tuple[List[Invoice], List[Invoice]]:
+    """(customer invoices, GSTR-2B records)."""
+    invoices, gstr2b = [], []
+    for row, counterpart in synthetic_records(rows, vendors, status_mix, seed):
+        invoices.append(_invoice(row))
+        if counterpart is not None:
+            gstr2b.append(_invoice(counterpart))
+    return invoices, gstr2b
+
+def reconcile_all(invoices: List[Invoice], gstr2b: List[Invoice]) -> List[dict]:
+    index = Gstr2bIndex(gstr2b)
+    return [reconcile_invoice(inv, i, index) for i, inv in enumerate(invoices)]
+
+def synthetic_tenant(
+    rows: int, vendors: int = 500, status_mix: Optional[Dict[str, float]] = None, seed: int = 7
+) -> dict:
+    """An APP_STATE entry shaped exactly like the one /invoices/upload stores."""
+    invoices, gstr2b = synthetic_invoices(rows, vendors, status_mix, seed)
+    results = reconcile_all(invoices, gstr2b)
+    return {
+        "invoices": invoices,
+        "reconciliation": results,
+        "precomputed": [precompute_explanation(inv, r) for inv, r in zip(invoices, results)],
+        "gstr2b": gstr2b,
+        "amounts": amount_columns(invoices),
+        "index": ResultsIndex(invoices, results),
+        "vendor_summary": [v.model_dump() for v in aggregate_vendor_risk(invoices, results)],
+        "timestamp": "2024-04-01T00:00:00",
+    }
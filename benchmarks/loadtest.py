@@ -0,0 +1,387 @@
+"""
+Load-test harness: concurrent multi-tenant traffic against a running API.
+
+Virtual tenants onboard (tenant cookie + X-Tenant-ID, like the web UI), upload a
+synthetic month of invoices and then drive the report, PDF, results and explain
+endpoints with think time. Every phase also runs a tenant-less /health canary, so
+latency added by event-loop blocking shows up even on requests that do no work.
+
+Scenarios:
+    month_end        all tenants upload at once, then hammer reports / PDFs / results
+    explain_storm    tenants upload, then mostly narrative (LLM) explanations
+    noisy_neighbour  a quiet phase of light tenants, then the same traffic with a few
+                     heavy tenants rendering full PDFs and narratives; reports how much
+                     the light tenants' and the canary's latencies inflate
+
+Usage:
+    # Against an already running API (point it at benchmarks.stub_llm for the explain path)
+    python -m benchmarks.loadtest --scenario month_end --base-url http://127.0.0.1:8000
+
+    # Spawn uvicorn and the stub LLM locally for the run
+    python -m benchmarks.loadtest --spawn --scenario noisy_neighbour --tenants 100 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.generators import synthetic_csv
+
+PERCENTILES = (50, 90, 95, 99)
+CANARY_INTERVAL_S = 0.05
+CANARY_LABEL = "canary GET /health"
+
+# Endpoint mixes (action -> weight) per tenant role
+REPORT_MIX = {"report_json": 4, "report_pdf": 2, "results": 3, "explain_rules": 1}
+EXPLAIN_MIX = {"explain_narrative": 6, "explain_rules": 2, "report_json": 2}
+LIGHT_MIX = {"report_json": 3, "results": 3, "explain_rules": 2}
+HEAVY_MIX = {"report_pdf_full": 3, "explain_narrative": 2}
+
+# RESULTS
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def classify(response: Optional[httpx.Response] = None, error: Optional[BaseException] = None) -> str:
+    if error is not None:
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, httpx.ConnectError):
+            return "connect_error"
+        if isinstance(error, (httpx.RemoteProtocolError, httpx.ReadError)):
+            return "protocol_error"
+        return f"error:{type(error).__name__}"
+    if response.status_code < 400:
+        return "ok"
+    if response.status_code == 429:
+        return "rate_limited"
+    return f"http_{response.status_code // 100}xx:{response.status_code}"
+
+class Recorder:
+    """Latencies and outcome classes per (phase, endpoint label)."""
+
+    def __init__(self):
+        self.phase = "setup"
+        self.latencies: Dict[tuple, List[float]] = defaultdict(list)
+        self.outcomes: Dict[tuple, Counter] = defaultdict(Counter)
+        self.phase_seconds: Dict[str, float] = {}
+
+    def record(self, label: str, seconds: float, outcome: str):
+        key = (self.phase, label)
+        self.outcomes[key][outcome] += 1
+        if outcome == "ok":
+            self.latencies[key].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, dict]]:
+        phases: Dict[str, Dict[str, dict]] = defaultdict(dict)
+        for key in sorted(self.outcomes):
+            phase, label = key
+            values = sorted(self.latencies.get(key, []))
+            outcomes = self.outcomes[key]
+            total = sum(outcomes.values())
+            elapsed = self.phase_seconds.get(phase) or 0
+            entry = {
+                "requests": total,
+                "ok": outcomes.get("ok", 0),
+                "error_rate": round(1 - outcomes.get("ok", 0) / total, 4) if total else 0.0,
+                "errors": {k: v for k, v in outcomes.items() if k != "ok"},
+                "rps": round(total / elapsed, 2) if elapsed else None,
+            }
+            if values:
+                entry.update({f"p{q}_ms": round(percentile(values, q) * 1000, 2) for q in PERCENTILES})
+                entry["max_ms"] = round(values[-1] * 1000, 2)
+            phases[phase][label] = entry
+        return phases
+
+def interference(summary: Dict[str, Dict[str, dict]], quiet: str, noisy: str, q: int = 95) -> Dict[str, dict]:
+    """p-q latency of each endpoint seen in both phases, and how much it grew."""
+    report = {}
+    for label, before in summary.get(quiet, {}).items():
+        after = summary.get(noisy, {}).get(label)
+        key = f"p{q}_ms"
+        if not after or key not in before or key not in after:
+            continue
+        report[label] = {
+            f"{quiet}_{key}": before[key],
+            f"{noisy}_{key}": after[key],
+            "inflation": round(after[key] / before[key], 2) if before[key] else None,
+        }
+    return report
+
+# VIRTUAL TENANTS
+
+@dataclass
+class VirtualTenant:
+    number: int
+    tenant_id: str
+    plan: str = "ENTERPRISE"
+    cookie: str = ""
+    explain_items: List[dict] = field(default_factory=list)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"X-Tenant-ID": self.tenant_id, "X-Plan": self.plan}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        return headers
+
+@dataclass
+class Options:
+    tenants: int = 50
+    heavy_tenants: int = 5
+    rows: int = 300
+    vendors: int = 40
+    duration: float = 30.0
+    think_ms: float = 200.0
+    onboard: bool = True
+    timeout: float = 60.0
+
+class LoadContext:
+    def __init__(self, client: httpx.AsyncClient, options: Options, recorder: Recorder):
+        self.client = client
+        self.options = options
+        self.recorder = recorder
+
+    async def request(self, label: str, method: str, path: str, tenant: Optional[VirtualTenant] = None, **kwargs) -> Optional[httpx.Response]:
+        headers = dict(tenant.headers) if tenant else {}
+        headers.update(kwargs.pop("headers", {}))
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+            # Include the body transfer: PDFs and exports stream
+            await response.aread()
+        except (httpx.HTTPError, OSError) as e:
+            self.recorder.record(label, time.perf_counter() - started, classify(error=e))
+            return None
+        self.recorder.record(label, time.perf_counter() - started, classify(response))
+        return response
+
+async def onboard(ctx: LoadContext, number: int) -> VirtualTenant:
+    """Tenant session the way a browser gets one: server-issued tenant cookie, then plan."""
+    if not ctx.options.onboard:
+        return VirtualTenant(number, f"load-{uuid.uuid4()}")
+    response = await ctx.request("POST /onboarding/setup", "POST", "/onboarding/setup", data={
+        "business_name": f"Load Tenant {number}", "gstin": "27AAAAA0000A1Z5", "email": f"load{number}@example.com"
+    })
+    tenant_id = response.cookies.get("gst_tenant_id") if response is not None else None
+    if not tenant_id:
+        # Onboarding failed (already recorded); keep the tenant in the run with a local id
+        return VirtualTenant(number, f"load-{uuid.uuid4()}")
+    tenant = VirtualTenant(number, tenant_id, cookie=f"gst_tenant_id={tenant_id}")
+    await ctx.request("POST /onboarding/plan", "POST", "/onboarding/plan", tenant, data={"plan": tenant.plan})
+    tenant.cookie += f"; gst_plan={tenant.plan}"
+    return tenant
+
+async def upload(ctx: LoadContext, tenant: VirtualTenant):
+    body = synthetic_csv(ctx.options.rows, ctx.options.vendors, seed=tenant.number).encode("utf-8")
+    response = await ctx.request("POST /invoices/upload", "POST", "/invoices/upload", tenant,
+                                 files={"file": (f"tenant{tenant.number}.csv", body, "text/csv")})
+    if response is None or response.status_code != 200:
+        return
+    for r in response.json().get("reconciliation_results", []):
+        if r["status"] != "MATCHED":
+            tenant.explain_items.append({
+                "invoice_number": r["invoice_number"], "gstin": r["gstin"],
+                "status": r["status"], "factual_diffs": r.get("diffs") or {},
+            })
+            if len(tenant.explain_items) >= 20:
+                break
+
+async def act(ctx: LoadContext, tenant: VirtualTenant, action: str):
+    if action == "report_json":
+        await ctx.request("GET /reports/gst-risk", "GET", "/reports/gst-risk", tenant)
+    elif action == "report_pdf":
+        await ctx.request("GET /reports/gst-risk/pdf", "GET", "/reports/gst-risk/pdf", tenant)
+    elif action == "report_pdf_full":
+        await ctx.request("GET /reports/gst-risk/pdf?detail=full", "GET", "/reports/gst-risk/pdf", tenant, params={"detail": "full"})
+    elif action == "results":
+        await ctx.request("GET /reconciliation/results", "GET", "/reconciliation/results", tenant,
+                          params={"status": random.choice(["PARTIAL_MATCH", "MISSING_IN_2B", "RISKY_ITC"]), "limit": 50})
+    elif action in ("explain_rules", "explain_narrative") and tenant.explain_items:
+        narrative = action == "explain_narrative"
+        label = "POST /explain-mismatch?narrative=true" if narrative else "POST /explain-mismatch"
+        await ctx.request(label, "POST", "/explain-mismatch", tenant,
+                          params={"narrative": "true"} if narrative else None,
+                          json=random.choice(tenant.explain_items))
+
+async def tenant_loop(ctx: LoadContext, tenant: VirtualTenant, mix: Dict[str, float], until: float):
+    actions, weights = list(mix), list(mix.values())
+    while time.monotonic() < until:
+        await act(ctx, tenant, random.choices(actions, weights)[0])
+        # Exponential think time: Poisson arrivals per tenant
+        await asyncio.sleep(random.expovariate(1000 / ctx.options.think_ms) if ctx.options.think_ms else 0)
+
+async def canary_loop(ctx: LoadContext, until: float):
+    while time.monotonic() < until:
+        await ctx.request(CANARY_LABEL, "GET", "/health")
+        await asyncio.sleep(CANARY_INTERVAL_S)
+
+async def run_phase(ctx: LoadContext, name: str, duration: float, loops):
+    """Run `loops(until)` coroutines plus the canary for `duration` seconds."""
+    ctx.recorder.phase = name
+    started = time.monotonic()
+    until = started + duration
+    await asyncio.gather(canary_loop(ctx, until), *loops(until))
+    ctx.recorder.phase_seconds[name] = time.monotonic() - started
+
+async def setup_tenants(ctx: LoadContext, count: int, start: int = 0) -> List[VirtualTenant]:
+    """Onboard and upload concurrently: the month-end upload burst."""
+    ctx.recorder.phase = "upload"
+    started = time.monotonic()
+
+    async def one(number: int) -> VirtualTenant:
+        tenant = await onboard(ctx, number)
+        await upload(ctx, tenant)
+        return tenant
+
+    tenants = await asyncio.gather(*(one(start + i) for i in range(count)))
+    ctx.recorder.phase_seconds["upload"] = ctx.recorder.phase_seconds.get("upload", 0) + time.monotonic() - started
+    return list(tenants)
+
+# SCENARIOS
+
+async def month_end(ctx: LoadContext) -> dict:
+    tenants = await setup_tenants(ctx, ctx.options.tenants)
+    await run_phase(ctx, "reports", ctx.options.duration,
+                    lambda until: [tenant_loop(ctx, t, REPORT_MIX, until) for t in tenants])
+    return {}
+
+async def explain_storm(ctx: LoadContext) -> dict:
+    tenants = await setup_tenants(ctx, ctx.options.tenants)
+    await run_phase(ctx, "explain", ctx.options.duration,
+                    lambda until: [tenant_loop(ctx, t, EXPLAIN_MIX, until) for t in tenants])
+    return {}
+
+async def noisy_neighbour(ctx: LoadContext) -> dict:
+    heavy_count = min(ctx.options.heavy_tenants, ctx.options.tenants)
+    light = await setup_tenants(ctx, ctx.options.tenants - heavy_count)
+    heavy = await setup_tenants(ctx, heavy_count, start=len(light))
+    half = ctx.options.duration / 2
+
+    await run_phase(ctx, "quiet", half,
+                    lambda until: [tenant_loop(ctx, t, LIGHT_MIX, until) for t in light])
+    await run_phase(ctx, "noisy", half,
+                    lambda until: [tenant_loop(ctx, t, LIGHT_MIX, until) for t in light]
+                    + [tenant_loop(ctx, t, HEAVY_MIX, until) for t in heavy])
+    return {"interference": interference(ctx.recorder.summary(), "quiet", "noisy")}
+
+SCENARIOS = {
+    "month_end": month_end,
+    "explain_storm": explain_storm,
+    "noisy_neighbour": noisy_neighbour,
+}
+
+async def run_scenario(
+    name: str,
+    base_url: str,
+    options: Options,
+    connections: int = 200,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> dict:
+    """`transport` allows driving an in-process app (httpx.ASGITransport) instead of a server."""
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=options.timeout, transport=transport) as client:
+        ctx = LoadContext(client, options, recorder)
+        extra = await SCENARIOS[name](ctx)
+    return {"scenario": name, "base_url": base_url, "options": vars(options),
+            "phases": recorder.summary(), **extra}
+
+# LOCAL SERVICES
+
+def _wait_healthy(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=0.5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not become healthy")
+
+def spawn_services(port: int, stub_port: int, stub_latency_ms: float, workers: int = 1) -> List[subprocess.Popen]:
+    """uvicorn for the API, wired to a stub LLM on `stub_port`."""
+    stub_env = dict(os.environ, STUB_LLM_LATENCY_MS=str(stub_latency_ms))
+    api_env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1", OPENAI_API_KEY="stub")
+    procs = [subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_llm:app", "--port", str(stub_port), "--log-level", "warning"],
+        env=stub_env, stdout=subprocess.DEVNULL
+    )]
+    procs.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=api_env, stdout=subprocess.DEVNULL
+    ))
+    try:
+        _wait_healthy(f"http://127.0.0.1:{stub_port}/stub/stats")
+        _wait_healthy(f"http://127.0.0.1:{port}/health")
+    except Exception:
+        stop_services(procs)
+        raise
+    return procs
+
+def stop_services(procs: List[subprocess.Popen]):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="month_end")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--tenants", type=int, default=Options.tenants)
+    parser.add_argument("--heavy-tenants", type=int, default=Options.heavy_tenants, help="noisy_neighbour only")
+    parser.add_argument("--rows", type=int, default=Options.rows, help="customer invoices per tenant upload")
+    parser.add_argument("--vendors", type=int, default=Options.vendors)
+    parser.add_argument("--duration", type=float, default=Options.duration, help="seconds of steady-state traffic")
+    parser.add_argument("--think-ms", type=float, default=Options.think_ms, help="mean think time between a tenant's requests")
+    parser.add_argument("--no-onboard", action="store_true", help="skip the cookie onboarding flow; use X-Tenant-ID only")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=Options.timeout)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn and the stub LLM locally")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--stub-latency-ms", type=float, default=800)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    options = Options(
+        tenants=args.tenants, heavy_tenants=args.heavy_tenants, rows=args.rows, vendors=args.vendors,
+        duration=args.duration, think_ms=args.think_ms, onboard=not args.no_onboard, timeout=args.timeout,
+    )
+
+    procs = []
+    base_url = args.base_url
+    if args.spawn:
+        base_url = f"http://127.0.0.1:{args.port}"
+        procs = spawn_services(args.port, args.stub_port, args.stub_latency_ms)
+    try:
+        report = asyncio.run(run_scenario(args.scenario, base_url, options, args.connections))
+        if args.spawn:
+            report["stub_llm"] = httpx.get(f"http://127.0.0.1:{args.stub_port}/stub/stats").json()
+    finally:
+        stop_services(procs)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests.
+
+Responds to POST /v1/chat/completions with a canned JSON explanation after a
+configurable delay, and can inject errors, so the explanation service can be
+driven hard without calling (or paying for) the real provider.
+
+Usage:
+    STUB_LLM_LATENCY_MS=800 STUB_LLM_ERROR_RATE=0.05 uvicorn benchmarks.stub_llm:app --port 9100
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "300"))
+JITTER_MS = float(os.getenv("STUB_LLM_JITTER_MS", "100"))
+ERROR_RATE = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+
+app = FastAPI(title="Stub LLM")
+
+# Mutable at runtime (POST /stub/config) so a load test can degrade the provider mid-run
+CONFIG = {"latency_ms": LATENCY_MS, "jitter_ms": JITTER_MS, "error_rate": ERROR_RATE}
+STATS = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+CANNED = {
+    "explanation": "Stub explanation: the invoice differs from the GSTR-2B record as listed in the differences.",
+    "root_cause": "Data Entry Error",
+    "suggested_action": "Contact Vendor"
+}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    STATS["requests"] += 1
+    STATS["in_flight"] += 1
+    STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+    try:
+        delay = CONFIG["latency_ms"] + random.uniform(-CONFIG["jitter_ms"], CONFIG["jitter_ms"])
+        await asyncio.sleep(max(delay, 0) / 1000)
+
+        if random.random() < CONFIG["error_rate"]:
+            STATS["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "stub overloaded", "type": "server_error"}})
+
+        return {
+            "id": f"chatcmpl-stub-{STATS['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(CANNED)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+    finally:
+        STATS["in_flight"] -= 1
+
+@app.get("/stub/stats")
+def stats():
+    return {**STATS, **CONFIG}
+
+@app.post("/stub/config")
+def configure(update: dict):
+    for key in CONFIG:
+        if key in update:
+            CONFIG[key] = float(update[key])
+    return CONFIG
@@ -0,0 +1,372 @@
+"""
+Performance regression suite: throughput and peak memory of the hot paths at
+several tenant sizes, with JSON output and comparison against a stored baseline.
+
+Cases:
+    upload            CSV upload end-to-end through the ASGI app (middleware included)
+    reconcile         reconcile_invoice over every invoice against a GSTR-2B index
+    aggregate         aggregate_vendor_risk
+    report_data       internal_get_report_data
+    pdf_summary       PDF build, summary report
+    pdf_full          PDF build with every invoice row (capped by --pdf-max-rows)
+    middleware        AuditMiddleware overhead per request, response sized to the tenant
+
+Usage:
+    python -m benchmarks.suite [--rows 1000,10000,100000,1000000] [--cases upload,reconcile]
+        [--vendors 500] [--mix MATCHED=0.6,PARTIAL_MATCH=0.15,MISSING_IN_2B=0.15,RISKY_ITC=0.1]
+        [--repeat 3] [--no-memory] [--out results.json]
+        [--baseline baseline.json] [--threshold 0.2]
+
+A run saved with --out can later be passed as --baseline. With --baseline the exit
+status is 1 when any case is slower (or, with memory, larger) than the baseline by
+more than --threshold.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from benchmarks.generators import DEFAULT_STATUS_MIX, parse_status_mix, synthetic_csv, synthetic_invoices, synthetic_tenant, reconcile_all
+
+DEFAULT_ROWS = (1000, 10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.2
+PDF_MAX_ROWS = 100_000
+# Requests per middleware measurement; fewer for large bodies
+MIDDLEWARE_BYTES_BUDGET = 64 * 1024 * 1024
+
+class Workload:
+    """One synthetic tenant size, built lazily and shared by every case."""
+
+    def __init__(self, rows: int, vendors: int, status_mix: Dict[str, float]):
+        self.rows = rows
+        self.vendors = vendors
+        self.status_mix = status_mix
+        self._cache = {}
+
+    def _get(self, key: str, build: Callable):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def csv(self) -> bytes:
+        return self._get("csv", lambda: synthetic_csv(self.rows, self.vendors, self.status_mix).encode("utf-8"))
+
+    @property
+    def invoices(self):
+        return self._get("invoices", lambda: synthetic_invoices(self.rows, self.vendors, self.status_mix))
+
+    @property
+    def tenant(self) -> dict:
+        return self._get("tenant", lambda: synthetic_tenant(self.rows, self.vendors, self.status_mix))
+
+# CASES
+# Each case prepares its inputs outside the timed region and returns
+# (thunk, units, cleanup): `units` is what one thunk call processes (rows or requests).
+
+def case_upload(w: Workload):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.api import invoices as invoices_api
+    from app.db.memory import APP_STATE
+
+    client = TestClient(app)
+    tenant_id = f"bench-upload-{w.rows}"
+    body = w.csv
+    # Plan limits cap uploads far below benchmark sizes (and count GSTR-2B rows too);
+    # lift the cap for the run
+    original_limit = invoices_api.PLAN_LIMITS["ENTERPRISE"]
+    invoices_api.PLAN_LIMITS["ENTERPRISE"] = max(original_limit, body.count(b"\n"))
+
+    def run():
+        # Otherwise repeats would be answered from the stored, identical dataset
+        APP_STATE.pop(tenant_id, None)
+        response = client.post(
+            "/invoices/upload",
+            files={"file": ("bench.csv", body, "text/csv")},
+            headers={"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"},
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"upload failed: {response.status_code} {response.text[:200]}")
+
+    def cleanup():
+        invoices_api.PLAN_LIMITS["ENTERPRISE"] = original_limit
+        APP_STATE.pop(tenant_id, None)
+
+    return run, w.rows, cleanup
+
+def case_reconcile(w: Workload):
+    invoices, gstr2b = w.invoices
+    return (lambda: reconcile_all(invoices, gstr2b)), w.rows, None
+
+def case_aggregate(w: Workload):
+    from app.core.vendor_aggregation import aggregate_vendor_risk
+    tenant = w.tenant
+    return (lambda: aggregate_vendor_risk(tenant["invoices"], tenant["reconciliation"])), w.rows, None
+
+def _install_tenant(w: Workload, name: str) -> str:
+    from app.db.memory import APP_STATE
+    tenant_id = f"bench-{name}-{w.rows}"
+    APP_STATE[tenant_id] = w.tenant
+    return tenant_id
+
+def _uninstall(tenant_id: str):
+    from app.db.memory import APP_STATE
+    APP_STATE.pop(tenant_id, None)
+
+def case_report_data(w: Workload):
+    from app.api.reports import internal_get_report_data
+    tenant_id = _install_tenant(w, "report")
+    loop = asyncio.new_event_loop()
+
+    def cleanup():
+        loop.close()
+        _uninstall(tenant_id)
+
+    return (lambda: loop.run_until_complete(internal_get_report_data(tenant_id))), w.rows, cleanup
+
+def _pdf_case(w: Workload, full: bool):
+    from app.api.reports import internal_get_report_data
+    from app.core.pdf_report import render_report_pdf
+    tenant_id = _install_tenant(w, "pdf")
+    report = asyncio.run(internal_get_report_data(tenant_id))
+    tenant_data = w.tenant if full else None
+
+    def run():
+        render_report_pdf(report, tenant_data).close()
+
+    return run, w.rows, lambda: _uninstall(tenant_id)
+
+def case_pdf_summary(w: Workload):
+    return _pdf_case(w, full=False)
+
+def case_pdf_full(w: Workload):
+    return _pdf_case(w, full=True)
+
+def case_middleware(w: Workload):
+    """
+    Same endpoint served with and without AuditMiddleware; the thunk returns the
+    per-request difference. The response is the tenant's results as NDJSON, so the
+    hashing / buffering cost scales with the dataset.
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+    from fastapi.testclient import TestClient
+    from app.core.export import iter_ndjson, export_rows
+    from app.core.middleware import AuditMiddleware
+    from app.core.admission import admission, Budget
+
+    tenant = w.tenant
+    payload = b"".join(iter_ndjson(export_rows(tenant)))
+
+    def build(with_middleware: bool) -> TestClient:
+        app = FastAPI()
+        if with_middleware:
+            app.add_middleware(AuditMiddleware)
+
+        @app.get("/bench/results")
+        async def results():
+            return Response(content=payload, media_type="application/x-ndjson")
+
+        return TestClient(app)
+
+    bare, audited = build(False), build(True)
+    requests = max(3, min(200, MIDDLEWARE_BYTES_BUDGET // max(1, len(payload))))
+    headers = {"X-Tenant-ID": "bench-middleware"}
+
+    def timed(client: TestClient) -> float:
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get("/bench/results", headers=headers)
+        return time.perf_counter() - started
+
+    def run():
+        return (timed(audited) - timed(bare)) / requests
+
+    # The admission check stays in the measured path; only its budget is lifted
+    original_budgets = admission.budgets
+    admission.budgets = {"BASIC": {cls: Budget(1e9, 10 ** 9) for cls in original_budgets["BASIC"]}}
+
+    def cleanup():
+        admission.budgets = original_budgets
+
+    return run, 1, cleanup
+
+CASES: Dict[str, Callable] = {
+    "upload": case_upload,
+    "reconcile": case_reconcile,
+    "aggregate": case_aggregate,
+    "report_data": case_report_data,
+    "pdf_summary": case_pdf_summary,
+    "pdf_full": case_pdf_full,
+    "middleware": case_middleware,
+}
+
+# RUNNER
+
+def _measure(run: Callable, repeat: int):
+    """Best of N wall times; a thunk returning a float reports its own measurement."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        reported = run()
+        elapsed = time.perf_counter() - started
+        best = min(best, reported if isinstance(reported, float) else elapsed)
+    return best
+
+def _peak_memory(run: Callable) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_case(name: str, w: Workload, repeat: int, measure_memory: bool) -> dict:
+    run, units, cleanup = CASES[name](w)
+    try:
+        seconds = _measure(run, repeat)
+        # Separate pass: tracemalloc slows allocation-heavy code several-fold
+        peak = _peak_memory(run) if measure_memory else None
+    finally:
+        if cleanup:
+            cleanup()
+
+    result = {"case": name, "rows": w.rows, "seconds": seconds, "peak_bytes": peak}
+    if name == "middleware":
+        result["overhead_ms_per_request"] = seconds * 1000
+    else:
+        result["rows_per_s"] = units / seconds if seconds > 0 else None
+    return result
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(
+    rows: List[int],
+    cases: List[str],
+    vendors: int = 500,
+    status_mix: Optional[Dict[str, float]] = None,
+    repeat: int = 3,
+    measure_memory: bool = True,
+    pdf_max_rows: int = PDF_MAX_ROWS,
+    log: Callable[[str], None] = lambda line: None
+) -> dict:
+    from app.core.reconciliation import ENGINE_VERSION
+    status_mix = status_mix or DEFAULT_STATUS_MIX
+    results = []
+    for n in rows:
+        workload = Workload(n, vendors, status_mix)
+        for name in cases:
+            if name == "pdf_full" and n > pdf_max_rows:
+                log(f"skip  {name:<12} {n:>9} rows (> --pdf-max-rows)")
+                continue
+            result = run_case(name, workload, repeat, measure_memory)
+            log(_format_result(result))
+            results.append(result)
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "engine_version": ENGINE_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "vendors": vendors,
+            "status_mix": status_mix,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def _format_result(r: dict) -> str:
+    rate = f"{r['overhead_ms_per_request']:.3f} ms/req" if "overhead_ms_per_request" in r else f"{r['rows_per_s']:,.0f} rows/s"
+    peak = f"{r['peak_bytes'] / 1e6:,.1f} MB peak" if r.get("peak_bytes") is not None else ""
+    return f"ok    {r['case']:<12} {r['rows']:>9} rows  {r['seconds']:.4f}s  {rate}  {peak}"
+
+# BASELINE COMPARISON
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    Per (case, rows) ratios against the baseline. Time and peak memory regress
+    when they exceed the baseline by more than `threshold` (0.2 = 20%).
+    """
+    previous = {(r["case"], r["rows"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        base = previous.get((r["case"], r["rows"]))
+        if base is None:
+            continue
+        entry = {"case": r["case"], "rows": r["rows"], "regressions": []}
+        for metric in ("seconds", "peak_bytes"):
+            now, before = r.get(metric), base.get(metric)
+            if now is None or not before or before <= 0:
+                continue
+            ratio = now / before
+            entry[f"{metric}_ratio"] = ratio
+            if ratio > 1 + threshold:
+                entry["regressions"].append(metric)
+        rows.append(entry)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default=",".join(str(n) for n in DEFAULT_ROWS))
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--vendors", type=int, default=500)
+    parser.add_argument("--mix", default=None, help="status mix, e.g. MATCHED=0.6,PARTIAL_MATCH=0.15,MISSING_IN_2B=0.15,RISKY_ITC=0.1")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass (no peak figures)")
+    parser.add_argument("--pdf-max-rows", type=int, default=PDF_MAX_ROWS)
+    parser.add_argument("--out", help="write results JSON here (usable later as --baseline)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    report = run_suite(
+        [int(n) for n in args.rows.split(",")],
+        cases,
+        vendors=args.vendors,
+        status_mix=parse_status_mix(args.mix) if args.mix else None,
+        repeat=args.repeat,
+        measure_memory=not args.no_memory,
+        pdf_max_rows=args.pdf_max_rows,
+        log=lambda line: print(line, file=sys.stderr, flush=True),
+    )
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            comparison = compare(report, json.load(f), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "results": comparison}
+        for entry in comparison:
+            ratios = "  ".join(f"{m.split('_ratio')[0]} x{entry[m]:.2f}" for m in entry if m.endswith("_ratio"))
+            flag = "REGRESSION" if entry["regressions"] else "ok"
+            print(f"{flag:<10} {entry['case']:<12} {entry['rows']:>9} rows  {ratios}", file=sys.stderr)
+        if any(entry["regressions"] for entry in comparison):
+            exit_code = 1
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.admission import (
+    AdmissionBackend, AdmissionController, Budget, InMemoryAdmissionBackend, admission, endpoint_class
+)
+from app.core.audit import audit_repo
+import asyncio
+import uuid
+
+client = TestClient(app)
+
+CSV = "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date\nA-1,27AAAAA0000A1Z5,100.00,0,9,9,2024-01-01\n"
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def budgets(**overrides):
+    classes = {cls: Budget(100, 100) for cls in ("upload", "pdf", "export", "explain", "report", "api")}
+    classes.update(overrides)
+    return {"BASIC": classes}
+
+def test_endpoint_classes():
+    assert endpoint_class("POST", "/invoices/upload") == "upload"
+    assert endpoint_class("GET", "/reports/gst-risk/pdf") == "pdf"
+    assert endpoint_class("GET", "/reports/gst-risk/export") == "export"
+    assert endpoint_class("POST", "/explain-mismatch/batch") == "explain"
+    assert endpoint_class("GET", "/explain-mismatch/cache") == "api"
+    assert endpoint_class("GET", "/reports/gst-risk") == "report"
+    assert endpoint_class("GET", "/reconciliation/results") == "api"
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    controller = AdmissionController(InMemoryAdmissionBackend(clock=clock), budgets(upload=Budget(0.5, 2)))
+
+    async def admit():
+        return await controller.admit("t1", "BASIC", "POST", "/invoices/upload")
+
+    assert asyncio.run(admit()).allowed
+    assert asyncio.run(admit()).allowed
+    refused = asyncio.run(admit())
+    assert not refused.allowed and refused.reason == "rate"
+    assert refused.retry_after_header == "2"
+
+    clock.now += 2
+    assert asyncio.run(admit()).allowed
+    # Other tenants and classes have their own buckets
+    assert asyncio.run(controller.admit("t2", "BASIC", "POST", "/invoices/upload")).allowed
+    assert asyncio.run(controller.admit("t1", "BASIC", "GET", "/reports/gst-risk")).allowed
+
+def test_concurrency_cap_and_lease_expiry():
+    clock = Clock()
+    controller = AdmissionController(
+        InMemoryAdmissionBackend(clock=clock), budgets(pdf=Budget(100, 100, 2)), lease_seconds=60
+    )
+
+    async def admit():
+        return await controller.admit("t1", "BASIC", "GET", "/reports/gst-risk/pdf")
+
+    first, second = asyncio.run(admit()), asyncio.run(admit())
+    refused = asyncio.run(admit())
+    assert first.allowed and second.allowed
+    assert not refused.allowed and refused.reason == "concurrency"
+
+    asyncio.run(controller.release(first))
+    assert asyncio.run(admit()).allowed
+    assert not asyncio.run(admit()).allowed
+
+    # Slots that are never released free themselves
+    clock.now += 61
+    assert asyncio.run(admit()).allowed
+
+def test_backend_failure_admits():
+    class Broken(AdmissionBackend):
+        async def take(self, key, rate, burst):
+            raise ConnectionError("down")
+
+        async def acquire(self, key, limit, lease, ttl):
+            raise ConnectionError("down")
+
+        async def release(self, key, lease):
+            raise ConnectionError("down")
+
+    controller = AdmissionController(Broken(), budgets(upload=Budget(1, 1, 1)))
+    assert asyncio.run(controller.admit("t1", "BASIC", "POST", "/invoices/upload")).allowed
+
+def test_refused_before_body_is_read(monkeypatch):
+    monkeypatch.setattr(admission, "budgets", budgets(upload=Budget(0.01, 1)))
+    tenant_id = f"admit-{uuid.uuid4().hex[:6]}"
+    headers = {"X-Tenant-ID": tenant_id}
+    files = {"file": ("a.csv", CSV, "text/csv")}
+
+    assert client.post("/invoices/upload", files=files, headers=headers).status_code == 200
+    refused = client.post("/invoices/upload", files=files, headers=headers)
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+
+    entries = [e for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == "/invoices/upload"]
+    assert entries[-1].status.value == "FAILURE"
+    assert entries[-1].input_hash is None
+
+    # Other tenants and public endpoints are unaffected
+    other = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": f"admit-{uuid.uuid4().hex[:6]}"})
+    assert other.status_code == 200
+    assert client.get("/health").status_code == 200
+
+def test_streamed_pdf_releases_its_slot(monkeypatch):
+    monkeypatch.setattr(admission, "budgets", budgets(pdf=Budget(100, 100, 1)))
+    tenant_id = f"admit-{uuid.uuid4().hex[:6]}"
+    headers = {"X-Tenant-ID": tenant_id}
+    client.post("/invoices/upload", files={"file": ("a.csv", CSV, "text/csv")}, headers=headers)
+
+    for _ in range(3):
+        response = client.get("/reports/gst-risk/pdf", headers=headers)
+        assert response.status_code == 200
+    assert not admission.backend._leases
+
+def test_budget_follows_the_recorded_plan_not_the_request(monkeypatch):
+    plans = {"BASIC": budgets(api=Budget(0.01, 2))["BASIC"], "ENTERPRISE": budgets()["BASIC"]}
+    monkeypatch.setattr(admission, "budgets", plans)
+
+    def results(tenant_id, claimed):
+        headers = {"X-Tenant-ID": tenant_id, "X-Plan": claimed}
+        return [client.get("/reconciliation/results", headers=headers).status_code for _ in range(3)]
+
+    basic = f"admit-{uuid.uuid4().hex[:6]}"
+    client.post("/invoices/upload", files={"file": ("a.csv", CSV, "text/csv")}, headers={"X-Tenant-ID": basic, "X-Plan": "BASIC"})
+    # Claiming ENTERPRISE on later requests does not buy a bigger budget
+    assert results(basic, "ENTERPRISE")[-1] == 429
+    # Nor does it for a tenant with no dataset yet
+    assert results(f"admit-{uuid.uuid4().hex[:6]}", "ENTERPRISE")[-1] == 429
+
+    enterprise = f"admit-{uuid.uuid4().hex[:6]}"
+    client.post("/invoices/upload", files={"file": ("a.csv", CSV, "text/csv")}, headers={"X-Tenant-ID": enterprise, "X-Plan": "ENTERPRISE"})
+    assert results(enterprise, "BASIC") == [200, 200, 200]
+
+def test_backend_failure_after_acquire_still_releases_the_slot():
+    class FlakyRate(InMemoryAdmissionBackend):
+        async def take(self, key, rate, burst):
+            raise ConnectionError("blip")
+
+    backend = FlakyRate()
+    controller = AdmissionController(backend, budgets(pdf=Budget(100, 100, 1)), lease_seconds=300)
+
+    async def admit_and_release():
+        admitted = await controller.admit("t1", "BASIC", "GET", "/reports/gst-risk/pdf")
+        assert admitted.allowed
+        await controller.release(admitted)
+
+    for _ in range(3):
+        asyncio.run(admit_and_release())
+    assert not backend._leases
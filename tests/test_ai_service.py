@@ -0,0 +1,266 @@
+from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from app.core.ai import ExplanationService, CircuitBreaker
+from app.core.explanation_cache import ExplanationCache
+from app.core.config import settings
+from app.schemas.explanation import ExplainRequest
+from app.schemas.reconciliation import ReconciliationStatus
+from benchmarks import stub_llm
+import asyncio
+import json
+
+REQUEST = ExplainRequest(
+    invoice_number="INV-001",
+    gstin="29ABCDE1234F1Z5",
+    status=ReconciliationStatus.PARTIAL_MATCH,
+    factual_diffs={"taxable_value": {"customer": 1000.0, "gstr2b": 1005.0}}
+)
+
+class FakeLLM:
+    """Async client double exposing chat.completions.create like AsyncOpenAI."""
+
+    def __init__(self, delay=0.0, fail=False, content=None):
+        self.delay = delay
+        self.fail = fail
+        self.content = content or json.dumps({
+            "explanation": "Vendor reported a different taxable value.",
+            "root_cause": "Data Entry Error",
+            "suggested_action": "Contact Vendor",
+            "status": "MATCHED"
+        })
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("provider down")
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+        finally:
+            self.in_flight -= 1
+
+def test_success_keeps_original_status():
+    service = ExplanationService(FakeLLM())
+    response = asyncio.run(service.explain(REQUEST, "t1"))
+    assert response.root_cause == "Data Entry Error"
+    # The model's "status" field is ignored
+    assert response.original_status == ReconciliationStatus.PARTIAL_MATCH
+
+def test_global_and_tenant_concurrency_limits():
+    llm = FakeLLM(delay=0.02)
+    service = ExplanationService(llm, max_concurrency=4, tenant_concurrency=2)
+
+    async def run(tenants):
+        return await asyncio.gather(*(service.explain(REQUEST, t) for t in tenants))
+
+    asyncio.run(run(["solo"] * 10))
+    assert llm.max_in_flight == 2
+
+    llm.max_in_flight = 0
+    asyncio.run(run([f"t{i % 5}" for i in range(20)]))
+    assert llm.max_in_flight == 4
+    # Idle tenant semaphores are released
+    assert service._tenants == {}
+
+def test_calls_run_concurrently_not_serially():
+    llm = FakeLLM(delay=0.1)
+    service = ExplanationService(llm, max_concurrency=16, tenant_concurrency=16)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(service.explain(REQUEST, "t1") for _ in range(10)))
+        return loop.time() - started
+
+    assert asyncio.run(run()) < 0.5
+
+def test_timeout_returns_fallback(monkeypatch):
+    monkeypatch.setattr(settings, "AI_TIMEOUT_SECONDS", 0.05)
+    service = ExplanationService(FakeLLM(delay=1.0))
+    response = asyncio.run(service.explain(REQUEST, "t1"))
+    assert response.root_cause == "System Limitation"
+    assert response.original_status == ReconciliationStatus.PARTIAL_MATCH
+    assert service.stats["timeouts"] == 1
+    assert service.breaker.failures == 1
+
+def test_breaker_opens_then_recovers():
+    clock = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=lambda: clock[0])
+    llm = FakeLLM(fail=True)
+    service = ExplanationService(llm, breaker=breaker)
+
+    for _ in range(5):
+        assert asyncio.run(service.explain(REQUEST, "t1")).root_cause == "System Limitation"
+    # Only the first three reach the provider; the rest are short-circuited
+    assert llm.calls == 3
+    assert breaker.state == CircuitBreaker.OPEN
+    assert service.stats["short_circuited"] == 2
+
+    # After the reset window a half-open probe succeeds and closes the breaker
+    clock[0] = 31
+    llm.fail = False
+    assert asyncio.run(service.explain(REQUEST, "t1")).root_cause == "Data Entry Error"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_slow_calls_trip_breaker(monkeypatch):
+    monkeypatch.setattr(settings, "AI_SLOW_CALL_SECONDS", 0.01)
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    service = ExplanationService(FakeLLM(delay=0.03), breaker=breaker)
+    asyncio.run(service.explain(REQUEST, "t1"))
+    asyncio.run(service.explain(REQUEST, "t1"))
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_invalid_json_falls_back():
+    service = ExplanationService(FakeLLM(content="not json"))
+    assert asyncio.run(service.explain(REQUEST, "t1")).root_cause == "System Limitation"
+
+def test_stub_llm_speaks_chat_completions():
+    stub_llm.CONFIG.update(latency_ms=0, jitter_ms=0, error_rate=0)
+    stub = TestClient(stub_llm.app)
+    response = stub.post("/v1/chat/completions", json={"model": "gpt-3.5-turbo", "messages": []})
+    assert response.status_code == 200
+    content = json.loads(response.json()["choices"][0]["message"]["content"])
+    assert set(content) == {"explanation", "root_cause", "suggested_action"}
+
+    stub.post("/stub/config", json={"error_rate": 1})
+    assert stub.post("/v1/chat/completions", json={"messages": []}).status_code == 503
+    stub.post("/stub/config", json={"error_rate": 0})
+
+def test_cache_serves_repeat_patterns_without_llm():
+    llm = FakeLLM()
+    cache = ExplanationCache(max_entries=10, ttl_seconds=60)
+    service = ExplanationService(llm, cache=cache)
+
+    first = asyncio.run(service.explain(REQUEST, "t1"))
+    # Different invoice, same status and same shape of difference
+    similar = REQUEST.model_copy(update={
+        "invoice_number": "INV-999",
+        "factual_diffs": {"taxable_value": {"customer": 1100.0, "gstr2b": 1106.0}}
+    })
+    second = asyncio.run(service.explain(similar, "t1"))
+    assert llm.calls == 1
+    # Same cached narrative, each with its own invoice facts
+    assert first.explanation.endswith(": Vendor reported a different taxable value.")
+    assert second.explanation == f"Invoice INV-999 (GSTIN: {REQUEST.gstin}), differences " \
+        '{"taxable_value": {"customer": 1100.0, "gstr2b": 1106.0}}: Vendor reported a different taxable value.'
+    assert cache.stats()["hits"] == 1 and cache.stats()["hit_rate"] == 0.5
+
+    # A different tenant never sees another tenant's cached narrative
+    asyncio.run(service.explain(REQUEST, "t2"))
+    assert llm.calls == 2
+
+class EchoLLM(FakeLLM):
+    """Quotes its whole prompt back as the explanation, as a careless model might."""
+
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        content = json.dumps({"explanation": messages[-1]["content"], "root_cause": "Echo", "suggested_action": "Review"})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def test_shared_narratives_never_carry_another_invoices_facts():
+    llm = EchoLLM()
+    service = ExplanationService(llm, cache=ExplanationCache(max_entries=10, ttl_seconds=60))
+    other = REQUEST.model_copy(update={
+        "invoice_number": "INV-777", "gstin": "27ZZZZZ9999Z1Z5",
+        "factual_diffs": {"taxable_value": {"customer": 2000.0, "gstr2b": 2010.0}}
+    })
+    first = asyncio.run(service.explain(REQUEST, "t1"))
+    second = asyncio.run(service.explain(other, "t1"))
+    assert llm.calls == 1
+    # The prompt never held the first invoice's identifiers or amounts
+    for fact in ("INV-001", REQUEST.gstin, "1000.0", "1005.0"):
+        assert fact in first.explanation
+        assert fact not in second.explanation
+    assert "INV-777" in second.explanation and "2010.0" in second.explanation
+
+def test_cache_does_not_store_fallbacks():
+    cache = ExplanationCache(max_entries=10, ttl_seconds=60)
+    service = ExplanationService(FakeLLM(fail=True), cache=cache)
+    asyncio.run(service.explain(REQUEST, "t1"))
+    assert cache.stats()["size"] == 0
+
+class PackLLM(FakeLLM):
+    """Answers packed prompts with one item per 'Item N:' block, optionally dropping some ids."""
+
+    def __init__(self, drop=()):
+        super().__init__()
+        self.drop = set(drop)
+        self.pack_sizes = []
+        self.prompts = []
+
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        user = messages[-1]["content"]
+        self.prompts.append(user)
+        count = user.count("Item ")
+        self.pack_sizes.append(count)
+        items = [
+            {"id": i, "explanation": f"explained {i}", "root_cause": "Timing Issue", "suggested_action": "Verify Date"}
+            for i in range(count) if i not in self.drop
+        ]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"items": items})))])
+
+def collect(service, requests, tenant_id="t1"):
+    async def run():
+        return [pair async for pair in service.explain_batch(requests, tenant_id)]
+    return asyncio.run(run())
+
+def batch_requests(distinct, copies=1):
+    statuses = list(ReconciliationStatus)
+    requests = []
+    for i in range(distinct):
+        for _ in range(copies):
+            requests.append(ExplainRequest(
+                invoice_number=f"INV-{i}-{len(requests)}",
+                gstin="29ABCDE1234F1Z5",
+                status=statuses[i % len(statuses)],
+                factual_diffs={f"field_{i}": {"customer": 100.0, "gstr2b": 150.0}}
+            ))
+    return requests
+
+def test_batch_dedups_packs_and_keeps_each_status(monkeypatch):
+    monkeypatch.setattr(settings, "AI_BATCH_PACK_SIZE", 4)
+    llm = PackLLM()
+    service = ExplanationService(llm, cache=ExplanationCache(100, 60))
+    requests = batch_requests(distinct=10, copies=3)
+
+    results = collect(service, requests)
+    assert sorted(index for index, _ in results) == list(range(30))
+    # 10 distinct signatures packed 4 per prompt
+    assert sorted(llm.pack_sizes) == [2, 4, 4]
+    for index, response in results:
+        assert response.original_status == requests[index].status
+        assert response.root_cause == "Timing Issue"
+
+    # Second pass is served entirely from cache
+    collect(service, requests)
+    assert llm.calls == 3
+
+def test_batch_falls_back_per_missing_item(monkeypatch):
+    monkeypatch.setattr(settings, "AI_BATCH_PACK_SIZE", 8)
+    service = ExplanationService(PackLLM(drop={1}))
+    requests = batch_requests(distinct=3)
+    results = dict(collect(service, requests))
+    assert results[1].root_cause == "System Limitation"
+    assert results[1].original_status == requests[1].status
+    assert results[0].root_cause == results[2].root_cause == "Timing Issue"
+
+def test_batch_items_sharing_a_signature_keep_their_own_facts(monkeypatch):
+    monkeypatch.setattr(settings, "AI_BATCH_PACK_SIZE", 8)
+    llm = PackLLM()
+    service = ExplanationService(llm)
+    requests = batch_requests(distinct=2, copies=3)
+
+    results = collect(service, requests)
+    assert llm.pack_sizes == [2]
+    assert not any(r.invoice_number in prompt for r in requests for prompt in llm.prompts)
+    for index, response in results:
+        own = requests[index]
+        assert response.explanation.startswith(f"Invoice {own.invoice_number} (GSTIN: {own.gstin})")
+        assert not any(r.invoice_number in response.explanation for r in requests if r is not own)
@@ -0,0 +1,30 @@
+from collections import Counter
+from benchmarks.generators import synthetic_csv, synthetic_tenant, parse_status_mix, vendor_gstin
+from benchmarks.suite import run_suite, compare
+from app.schemas.invoice import Invoice
+import csv
+import io
+
+def test_generator_hits_requested_status_mix():
+    mix = parse_status_mix("MATCHED=2,PARTIAL_MATCH=1,MISSING_IN_2B=1")
+    tenant = synthetic_tenant(400, vendors=20, status_mix=mix, seed=3)
+    counts = Counter(r["status"].name for r in tenant["reconciliation"])
+    assert set(counts) == {"MATCHED", "PARTIAL_MATCH", "MISSING_IN_2B"}
+    assert 150 < counts["MATCHED"] < 250
+    assert len({inv.gstin for inv in tenant["invoices"]}) <= 20
+
+def test_generated_csv_passes_upload_validation():
+    rows = list(csv.DictReader(io.StringIO(synthetic_csv(50, vendors=5))))
+    assert all(Invoice(**row) for row in rows)
+    assert Invoice(gstin=vendor_gstin(987_654_321), invoice_no="X", invoice_date="2024-01-01",
+                   taxable_value="1", cgst="0", sgst="0", igst="0")
+
+def test_suite_runs_and_flags_regressions():
+    report = run_suite([200], ["reconcile", "report_data"], vendors=10, repeat=1, measure_memory=False)
+    assert [(r["case"], r["rows"]) for r in report["results"]] == [("reconcile", 200), ("report_data", 200)]
+    assert all(r["rows_per_s"] > 0 for r in report["results"])
+
+    slower = {"results": [dict(r, seconds=r["seconds"] / 2) for r in report["results"]]}
+    faster = {"results": [dict(r, seconds=r["seconds"] * 2) for r in report["results"]]}
+    assert all(entry["regressions"] == ["seconds"] for entry in compare(report, slower, threshold=0.2))
+    assert all(entry["regressions"] == [] for entry in compare(report, faster, threshold=0.2))
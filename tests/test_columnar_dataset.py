@@ -0,0 +1,87 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.core.export import iter_csv, iter_ndjson, export_rows
+from app.core.snapshots import SnapshotManager, load_snapshot, map_snapshot, write_snapshot
+from app.core.vendor_aggregation import aggregate_vendor_columns, aggregate_vendor_risk
+from app.db.columnar import DictColumn
+from app.db.memory import APP_STATE
+from benchmarks.generators import synthetic_tenant
+import mmap
+import uuid
+
+client = TestClient(app)
+
+CSV = "\n".join(
+    ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date,source"]
+    + [f"C-{i},27AAAAA000{i % 4}A1Z5,{100 + i * 991}.75,0,9,9,2024-02-0{1 + i % 9},customer" for i in range(40)]
+    + [f"C-{i},27AAAAA000{i % 4}A1Z5,{100 + i * 991}.75,0,9,9,2024-02-0{1 + i % 9},gstr2b" for i in range(0, 40, 3)]
+    + ["C-1,27AAAAA0001A1Z5,105.00,0,9,9,2024-02-02,gstr2b"]
+)
+
+def outputs(tenant_id):
+    headers = {"X-Tenant-ID": tenant_id}
+    report = client.get("/reports/gst-risk", headers=headers).json()
+    report["audit"].pop("generated_at")
+    report["audit"].pop("report_id")
+    pages = [
+        client.get("/reconciliation/results", headers=headers, params=params).json()
+        for params in ({"limit": 500}, {"status": "MATCHED", "sort": "amount", "limit": 5}, {"gstin": "27AAAAA0002A1Z5"})
+    ]
+    exports = [
+        client.get("/reports/gst-risk/export", headers=headers, params={"format": fmt}).content
+        for fmt in ("csv", "ndjson")
+    ]
+    return report, pages, exports
+
+def test_large_datasets_are_served_from_their_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "COLUMNAR_MIN_ROWS", 10)
+    manager = SnapshotManager(str(tmp_path), interval=3600)
+    tenant_id = f"col-{uuid.uuid4().hex[:6]}"
+    headers = {"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"}
+    upload = lambda: client.post("/invoices/upload", files={"file": ("c.csv", CSV, "text/csv")}, headers=headers)
+    uploaded = upload().json()
+    before = outputs(tenant_id)
+    in_memory = dict.get(APP_STATE, tenant_id)
+
+    assert manager.write(tenant_id)
+    mapped = dict.get(APP_STATE, tenant_id)
+    assert mapped is not in_memory and "columns" in mapped and "index" not in mapped
+    # The report built for this data version carries over; drop it to rebuild from columns
+    assert mapped["_report_cache"] is in_memory["_report_cache"]
+    del mapped["_report_cache"]
+
+    assert outputs(tenant_id) == before
+    again = upload().json()
+    assert again["deduplicated"] and again["reconciliation_results"] == uploaded["reconciliation_results"]
+
+def test_mapped_columns_are_zero_copy_views(tmp_path):
+    data = synthetic_tenant(300, vendors=40)
+    data["data_version"] = "c" * 64
+    path = str(tmp_path / "t.gstsnap")
+    write_snapshot(path, data)
+    mapped = map_snapshot(path)
+    columns = mapped["columns"]
+
+    assert isinstance(columns.taxable_value.obj, mmap.mmap)
+    assert isinstance(columns.status.obj, mmap.mmap)
+    assert isinstance(columns.gstin, DictColumn) and isinstance(columns.gstin.codes.obj, mmap.mmap)
+    assert list(columns.itc) == list(data["amounts"]["itc"])
+
+    assert len(mapped["invoices"]) == len(mapped["reconciliation"]) == 300
+    assert mapped["invoices"][-1] == data["invoices"][-1]
+    assert mapped["reconciliation"][5:9] == data["reconciliation"][5:9]
+    assert list(mapped["reconciliation"]) == data["reconciliation"]
+    assert list(mapped["precomputed"]) == data["precomputed"] and mapped["precomputed"][5:9] == data["precomputed"][5:9]
+    assert list(mapped["gstr2b"]) == data["gstr2b"]
+    assert b"".join(iter_csv(export_rows(mapped))) == b"".join(iter_csv(export_rows(data)))
+    assert b"".join(iter_ndjson(export_rows(mapped))) == b"".join(iter_ndjson(export_rows(data)))
+
+    # Vendors grouped by dictionary codes match the object path
+    from_columns = aggregate_vendor_columns(columns.gstin, columns.status, columns.taxable_value, columns.itc)
+    from_objects = aggregate_vendor_risk(data["invoices"], data["reconciliation"])
+    assert [v.model_dump() for v in from_columns] == [v.model_dump() for v in from_objects]
+
+    # Below the threshold the same file is decoded into lists
+    decoded = load_snapshot(path, map_from_rows=301)
+    assert isinstance(decoded["invoices"], list) and "columns" not in decoded
@@ -0,0 +1,61 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.audit import audit_repo
+from app.core.encoding import dumps, negotiate_encoding
+from app.schemas.reconciliation import ReconciliationStatus
+from datetime import date
+import hashlib
+import json
+import uuid
+
+client = TestClient(app)
+
+def big_csv(rows):
+    lines = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    lines += [f"Z-{i},27AAAAA0000A1Z5,{100 + i}.00,0,9,9,2024-01-01" for i in range(rows)]
+    return "\n".join(lines)
+
+def test_dumps_handles_engine_types():
+    body = dumps({"status": ReconciliationStatus.RISKY_ITC, "date": date(2024, 1, 2), "amount": 10.5})
+    assert json.loads(body) == {"status": "RISKY_ITC", "date": "2024-01-02", "amount": 10.5}
+
+def test_encoding_negotiation():
+    assert negotiate_encoding("gzip, deflate", ("br", "gzip")) == "gzip"
+    assert negotiate_encoding("br;q=1.0, gzip;q=0.5", ("br", "gzip")) == "br"
+    assert negotiate_encoding("gzip;q=0", ("gzip",)) is None
+    assert negotiate_encoding("*", ("gzip",)) == "gzip"
+    assert negotiate_encoding(None, ("gzip",)) is None
+    assert negotiate_encoding("identity", ("gzip",)) is None
+
+def test_upload_response_is_compressed_and_audited_uncompressed():
+    tenant_id = f"enc-{uuid.uuid4().hex[:6]}"
+    response = client.post(
+        "/invoices/upload",
+        files={"file": ("z.csv", big_csv(80), "text/csv")},
+        headers={"X-Tenant-ID": tenant_id, "Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "X-Audit-Output-Hash" not in response.headers
+    # httpx decodes transparently; the raw size on the wire is much smaller
+    assert int(response.headers["Content-Length"]) < len(response.content) / 3
+
+    entry = [e for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == "/invoices/upload"][-1]
+    assert entry.output_hash == hashlib.sha256(response.content).hexdigest()
+    assert entry.input_hash is not None
+    assert response.json()["reconciliation_results"][0]["status"] in {s.value for s in ReconciliationStatus}
+
+def test_small_or_identity_responses_are_not_compressed():
+    tenant_id = f"enc-{uuid.uuid4().hex[:6]}"
+    identity = client.post(
+        "/invoices/upload",
+        files={"file": ("z.csv", big_csv(80), "text/csv")},
+        headers={"X-Tenant-ID": tenant_id, "Accept-Encoding": "identity"},
+    )
+    assert "Content-Encoding" not in identity.headers
+
+    report = client.get("/reports/gst-risk", headers={"X-Tenant-ID": tenant_id, "Accept-Encoding": "gzip"})
+    plain = client.get("/reports/gst-risk", headers={"X-Tenant-ID": tenant_id, "Accept-Encoding": "identity"})
+    assert report.json() == plain.json()
+    # One representation per content-coding, each with its own strong ETag
+    assert report.headers["ETag"] != plain.headers["ETag"]
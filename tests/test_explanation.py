@@ -1,6 +1,7 @@
 from fastapi.testclient import TestClient
 from app.main import app
 from app.schemas.reconciliation import ReconciliationStatus
+import json
 
 client = TestClient(app)
 
@@ -32,5 +33,34 @@ def test_explain_fallback():
     
     print("PASSED: Fallback triggered and status preserved.")
 
+def test_explain_batch_streams_ndjson_with_status_guardrail():
+    from app.core.audit import audit_repo
+    items = [
+        {"invoice_number": f"INV-{i}", "gstin": "29ABCDE1234F1Z5",
+         "status": status, "factual_diffs": {"taxable_value": {"customer": 1000.0, "gstr2b": 1005.0}}}
+        for i, status in enumerate(["PARTIAL_MATCH", "RISKY_ITC", "PARTIAL_MATCH"])
+    ]
+    response = client.post("/explain-mismatch/batch", json={"items": items}, params={"narrative": "true"},
+                           headers={"X-Tenant-ID": "batch-tenant"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "x-audit-captured" not in response.headers
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    for line in lines:
+        assert line["original_status"] == items[line["index"]]["status"]
+        assert line["invoice_number"] == items[line["index"]]["invoice_number"]
+
+    entry = [e for e in audit_repo.get_all() if e.endpoint == "/explain-mismatch/batch"][-1]
+    assert entry.tenant_id == "batch-tenant" and entry.output_hash is not None
+
+def test_explain_batch_rejects_oversized_batches():
+    from app.schemas.explanation import MAX_BATCH_ITEMS
+    item = {"invoice_number": "INV", "gstin": "29ABCDE1234F1Z5", "status": "RISKY_ITC", "factual_diffs": {}}
+    response = client.post("/explain-mismatch/batch", json={"items": [item] * (MAX_BATCH_ITEMS + 1)},
+                           headers={"X-Tenant-ID": "batch-tenant"})
+    assert response.status_code == 422
+
 if __name__ == "__main__":
     test_explain_fallback()
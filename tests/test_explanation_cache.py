@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from app.core.explanation_cache import ExplanationCache, SqliteExplanationStore, mismatch_signature
+from app.schemas.explanation import ExplainRequest
+from app.schemas.reconciliation import ReconciliationStatus
+
+def make_request(diffs, status=ReconciliationStatus.PARTIAL_MATCH, invoice_number="INV-1"):
+    return ExplainRequest(invoice_number=invoice_number, gstin="29ABCDE1234F1Z5", status=status, factual_diffs=diffs)
+
+def test_signature_ignores_identifiers_and_buckets_values():
+    a = make_request({"gstr2b_invoice_number": "A-1", "taxable_value": {"customer": 1000.0, "gstr2b": 1005.0, "delta": 5.0}})
+    b = make_request({"gstr2b_invoice_number": "B-7", "taxable_value": {"customer": 2000.0, "gstr2b": 2012.0, "delta": 12.0}},
+                     invoice_number="INV-2")
+    assert mismatch_signature(a, "t1") == mismatch_signature(b, "t1")
+
+def test_signature_separates_status_direction_size_and_categories():
+    base = make_request({"taxable_value": {"customer": 1000.0, "gstr2b": 1005.0}})
+    variants = [
+        make_request({"taxable_value": {"customer": 1000.0, "gstr2b": 1005.0}}, status=ReconciliationStatus.RISKY_ITC),
+        make_request({"taxable_value": {"customer": 1000.0, "gstr2b": 995.0}}),
+        make_request({"taxable_value": {"customer": 1000.0, "gstr2b": 1500.0}}),
+        make_request({"igst": {"customer": 1000.0, "gstr2b": 1005.0}}),
+    ]
+    signatures = {mismatch_signature(r, "t1") for r in variants}
+    assert mismatch_signature(base, "t1") not in signatures
+    assert len(signatures) == len(variants)
+    assert mismatch_signature(base, "t1") != mismatch_signature(base, "t2")
+    assert mismatch_signature(base, "t1", "model-a") != mismatch_signature(base, "t1", "model-b")
+
+def test_lru_and_ttl_eviction():
+    now = [0.0]
+    cache = ExplanationCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.set("a", {"explanation": "A"})
+    cache.set("b", {"explanation": "B"})
+    assert cache.get("a") == {"explanation": "A"}
+    cache.set("c", {"explanation": "C"})
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+def test_persistent_store_survives_restart(tmp_path):
+    path = str(tmp_path / "explanations.db")
+    cache = ExplanationCache(10, 60, store=SqliteExplanationStore(path))
+    cache.set("k", {"explanation": "persisted"})
+    cache.flush()
+
+    restarted = ExplanationCache(10, 60, store=SqliteExplanationStore(path))
+    assert restarted.get("k") == {"explanation": "persisted"}
+    assert restarted.stats()["size"] == 1
+
+class RecordingStore(SqliteExplanationStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(("get", threading.current_thread()))
+        return super().get(key)
+
+    def set(self, key, expires_at, value):
+        self.threads.append(("set", threading.current_thread()))
+        super().set(key, expires_at, value)
+
+def test_async_lookup_keeps_store_io_off_the_event_loop(tmp_path):
+    store = RecordingStore(str(tmp_path / "explanations.db"))
+    cache = ExplanationCache(10, 60, store=store)
+
+    async def scenario():
+        loop_thread = threading.current_thread()
+        cache.set("k", {"explanation": "persisted"})
+        cache.flush()
+        cache.clear()
+        return loop_thread, await cache.lookup("k"), await cache.lookup("missing")
+
+    loop_thread, found, missing = asyncio.run(scenario())
+    assert found == {"explanation": "persisted"} and missing is None
+    assert [action for action, _ in store.threads] == ["set", "get", "get"]
+    assert all(thread is not loop_thread for _, thread in store.threads)
@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.audit import audit_repo
+import csv
+import gzip
+import hashlib
+import io
+import json
+import uuid
+
+client = TestClient(app)
+
+def upload(tenant_id, rows=1200):
+    lines = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    for i in range(rows):
+        lines.append(f"EXP-{i},27AAAAA0000A1Z5,{1000 + i}.25,0,90.10,90.10,2024-02-01")
+    files = {"file": ("export.csv", "\n".join(lines), "text/csv")}
+    assert client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"}).status_code == 200
+
+def test_csv_export_streams_every_row_and_audits_hash():
+    tenant_id = f"export-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id, rows=1000)
+
+    response = client.get("/reports/gst-risk/export", params={"format": "csv"},
+                          headers={"X-Tenant-ID": tenant_id, "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert "x-audit-captured" not in response.headers
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1000
+    assert rows[1]["taxable_value"] == "1001.25"
+    assert rows[1]["itc_amount"] == "180.20"
+
+    logs = [l for l in audit_repo.get_all() if l.tenant_id == tenant_id and l.endpoint == "/reports/gst-risk/export"]
+    assert len(logs) == 1
+    assert logs[0].action_type == "EXPORT"
+    assert logs[0].output_hash == hashlib.sha256(response.content).hexdigest()
+
+def test_ndjson_export_with_gzip():
+    tenant_id = f"export-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id, rows=1000)
+
+    response = client.get("/reports/gst-risk/export", params={"format": "ndjson"},
+                          headers={"X-Tenant-ID": tenant_id, "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+
+    # httpx decodes gzip transparently; the payload is one JSON object per line
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 1000
+    assert records[0]["taxable_value"] == 1000.25
+
+def test_export_without_results_is_404():
+    response = client.get("/reports/gst-risk/export", headers={"X-Tenant-ID": "export-nothing"})
+    assert response.status_code == 404
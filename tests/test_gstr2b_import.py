@@ -0,0 +1,220 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import gstr2b as gstr2b_module
+from app.api import gstr2b as gstr2b_api
+from app.core.gstr2b import parse_gstr2b, Gstr2bFormatError, Gstr2bLimitError
+from app.core.audit import audit_repo
+from app.core.snapshots import GSTR2B_SUFFIX, SnapshotManager
+from app.db.memory import APP_STATE, TENANT_GSTR2B
+from app.schemas.reconciliation import MatchTolerance
+import hashlib
+import io
+import json
+import os
+import pytest
+import uuid
+
+client = TestClient(app)
+
+SUPPLIER_A = "27AAAAA0000A1Z5"
+SUPPLIER_B = "29BBBBB1111B1Z5"
+
+def portal_document(extra_invoice=None):
+    b2b = [
+        {
+            "ctin": SUPPLIER_A, "trdnm": "Śrī Traders [\"Pune\"]", "supfildt": "11-04-2024",
+            "inv": [
+                {"inum": "G-1", "dt": "05-03-2024", "val": 354.36, "pos": "27", "rev": "N", "itcavl": "Y",
+                 "items": [
+                     {"num": 1, "rt": 18, "txval": 100.10, "igst": 0, "cgst": 9.01, "sgst": 9.01, "cess": 0},
+                     {"num": 2, "rt": 18, "txval": 200.20, "igst": 0, "cgst": 18.02, "sgst": 18.02, "cess": 0},
+                 ]},
+                {"inum": "G-2", "dt": "06-03-2024", "val": 1180,
+                 "items": [{"num": 1, "rt": 18, "txval": 1000, "igst": 180, "cgst": 0, "sgst": 0}]},
+            ],
+        },
+        {
+            # Invoices before the supplier GSTIN: keys are unordered in JSON
+            "inv": [{"inum": "H-1", "dt": "31-03-2024", "txval": 50.5, "igst": 9.09, "cgst": 0, "sgst": 0}],
+            "ctin": SUPPLIER_B,
+        },
+    ]
+    if extra_invoice:
+        b2b[0]["inv"].append(extra_invoice)
+    return {
+        "chksum": "abc",
+        "data": {
+            "gstin": "27ZZZZZ9999Z1Z5", "rtnprd": "032024", "gendt": "14-04-2024",
+            "docdata": {
+                "cdnr": [{"ctin": SUPPLIER_A, "nt": [{"ntnum": "C-1", "note": "brace } and quote \\\" and [bracket"}]}],
+                "b2b": b2b,
+                "impg": [],
+            },
+        },
+    }
+
+def encoded(document) -> bytes:
+    return json.dumps(document, ensure_ascii=False, indent=1).encode("utf-8")
+
+def test_flattens_b2b_invoices_across_chunk_boundaries(monkeypatch):
+    content = encoded(portal_document())
+    expected = None
+    # Tiny chunks split keys, numbers, escapes and multi-byte characters
+    for chunk_size in (3, 7, 64, 1 << 20):
+        monkeypatch.setattr(gstr2b_module, "CHUNK_SIZE", chunk_size)
+        imported = parse_gstr2b(io.BytesIO(content))
+        rows = [
+            (r.gstin, r.invoice_number, r.invoice_date.isoformat(), r.taxable_value_paise, r.cgst_paise, r.sgst_paise, r.igst_paise, r.source)
+            for r in imported["records"]
+        ]
+        if expected is None:
+            expected = rows
+        assert rows == expected
+
+    assert expected == [
+        (SUPPLIER_A, "G-1", "2024-03-05", 30030, 2703, 2703, 0, "gstr2b"),
+        (SUPPLIER_A, "G-2", "2024-03-06", 100000, 0, 0, 18000, "gstr2b"),
+        (SUPPLIER_B, "H-1", "2024-03-31", 5050, 0, 0, 909, "gstr2b"),
+    ]
+    assert imported["gstin"] == "27ZZZZZ9999Z1Z5" and imported["return_period"] == "032024"
+    assert imported["suppliers"] == 2
+    assert imported["skipped_sections"] == ["cdnr", "impg"]
+    assert imported["content_hash"] == hashlib.sha256(content).hexdigest()
+    # The match index is built and ready to use
+    assert len(imported["index"]) == 3
+    assert imported["index"].same_number(imported["records"][2]) == 2
+
+def test_rejects_malformed_documents():
+    with pytest.raises(Gstr2bFormatError, match=r"b2b\[0\]\.inv\[2\]"):
+        parse_gstr2b(io.BytesIO(encoded(portal_document({"inum": "G-3", "dt": "2024/03/07", "txval": 1}))))
+    with pytest.raises(Gstr2bFormatError):
+        parse_gstr2b(io.BytesIO(encoded(portal_document())[:-40]))
+    with pytest.raises(Gstr2bFormatError):
+        parse_gstr2b(io.BytesIO(b'{"docdata": {"b2b": [{"inv": []}]}}'))
+
+def test_invoice_uploads_match_against_the_portal_download():
+    tenant_id = f"g2b-{uuid.uuid4().hex[:6]}"
+    headers = {"X-Tenant-ID": tenant_id, "X-Plan": "PRO"}
+    content = encoded(portal_document())
+    response = client.post("/gstr2b/upload", files={"file": ("2b.json", content, "application/json")}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_records"] == 3 and body["suppliers"] == 2
+
+    entry = [e for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == "/gstr2b/upload"][-1]
+    assert entry.input_hash == hashlib.sha256(content).hexdigest()
+
+    csv = "\n".join([
+        "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date",
+        f"G-1,{SUPPLIER_A},300.30,0,27.03,27.03,2024-03-05",
+        f"H-1,{SUPPLIER_B},55.00,0,0,9.09,2024-03-31",
+        f"X-9,{SUPPLIER_B},20.00,0,1,1,2024-03-31",
+    ])
+    upload = lambda: client.post("/invoices/upload", files={"file": ("inv.csv", csv, "text/csv")}, headers=headers).json()
+    first = upload()
+    statuses = {r["invoice_number"]: r["status"] for r in first["reconciliation_results"]}
+    assert statuses == {"G-1": "MATCHED", "H-1": "PARTIAL_MATCH", "X-9": "MISSING_IN_2B"}
+
+    # Each upload matches against its own claim-free copy of the index
+    again = upload()
+    assert again["deduplicated"]
+    report = client.get("/reports/gst-risk", headers=headers).json()
+    assert report["audit"]["data_sources"] == ["User_Upload", "GSTR2B_Portal_JSON"]
+
+    # A new download is a new dataset for the same CSV
+    other = portal_document({"inum": "G-3", "dt": "07-03-2024", "txval": 1, "igst": 0, "cgst": 0, "sgst": 0})
+    client.post("/gstr2b/upload", files={"file": ("2b.json", encoded(other), "application/json")}, headers=headers)
+    changed = upload()
+    assert not changed["deduplicated"] and changed["data_version"] != first["data_version"]
+    assert {r["invoice_number"]: r["status"] for r in changed["reconciliation_results"]} == statuses
+
+def test_upload_validates_file_type():
+    headers = {"X-Tenant-ID": f"g2b-{uuid.uuid4().hex[:6]}"}
+    response = client.post("/gstr2b/upload", files={"file": ("2b.csv", b"{}", "text/csv")}, headers=headers)
+    assert response.status_code == 400
+    response = client.post("/gstr2b/upload", files={"file": ("2b.json", b"[1, 2]", "application/json")}, headers=headers)
+    assert response.status_code == 400
+
+def test_portal_download_survives_a_restart(tmp_path):
+    manager = SnapshotManager(str(tmp_path), interval=3600)
+    manager.start()
+    tenant_id = f"g2b-{uuid.uuid4().hex[:6]}"
+    headers = {"X-Tenant-ID": tenant_id, "X-Plan": "PRO"}
+    imported = client.post("/gstr2b/upload", files={"file": ("2b.json", encoded(portal_document()), "application/json")}, headers=headers)
+    assert imported.status_code == 200
+    csv = "\n".join([
+        "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date",
+        f"G-1,{SUPPLIER_A},300.30,0,27.03,27.03,2024-03-05",
+        f"X-9,{SUPPLIER_B},20.00,0,1,1,2024-03-31",
+    ])
+    upload = lambda content: client.post("/invoices/upload", files={"file": ("inv.csv", content, "text/csv")}, headers=headers).json()
+    first = upload(csv)
+    manager.stop()
+    assert os.path.exists(manager.path(tenant_id, GSTR2B_SUFFIX))
+
+    # Restart: neither the dataset nor the import is resident
+    dict.pop(APP_STATE, tenant_id)
+    before = dict.pop(TENANT_GSTR2B, tenant_id)
+    manager.start()
+    try:
+        again = upload(csv)
+        assert again["deduplicated"] and again["data_version"] == first["data_version"]
+
+        # A new upload still matches against the portal records, not mock rules
+        changed = upload(csv + f"\nH-1,{SUPPLIER_B},50.50,9.09,0,0,2024-03-31")
+        assert not changed["deduplicated"]
+        statuses = {r["invoice_number"]: r["status"] for r in changed["reconciliation_results"]}
+        assert statuses == {"G-1": "MATCHED", "X-9": "MISSING_IN_2B", "H-1": "MATCHED"}
+        report = client.get("/reports/gst-risk", headers=headers).json()
+        assert report["audit"]["data_sources"] == ["User_Upload", "GSTR2B_Portal_JSON"]
+
+        restored = dict.get(TENANT_GSTR2B, tenant_id)
+        assert restored["records"] == before["records"]
+        for field in ("content_hash", "gstin", "return_period", "suppliers", "skipped_sections", "timestamp"):
+            assert restored[field] == before[field]
+    finally:
+        manager.stop()
+
+def large_document(invoices, ctin_last=False):
+    inv = [
+        {"inum": f"L-{i}", "dt": "05-03-2024", "items": [{"txval": 100 + i, "igst": 0, "cgst": 9, "sgst": 9}]}
+        for i in range(invoices)
+    ]
+    supplier = {"inv": inv, "ctin": SUPPLIER_A} if ctin_last else {"ctin": SUPPLIER_A, "inv": inv}
+    return {"data": {"gstin": "27ZZZZZ9999Z1Z5", "rtnprd": "032024", "docdata": {"b2b": [supplier]}}}
+
+def test_records_are_capped_per_plan(monkeypatch):
+    # Stops at the first record over the cap, without reading the rest of the document
+    monkeypatch.setattr(gstr2b_module, "CHUNK_SIZE", 64)
+    content = encoded(portal_document())
+    source = io.BytesIO(content)
+    with pytest.raises(Gstr2bLimitError):
+        parse_gstr2b(source, max_records=1)
+    assert source.tell() < len(content)
+    assert len(parse_gstr2b(io.BytesIO(content), max_records=3)["records"]) == 3
+
+    # Invoices held back until their supplier's ctin count against the cap as they are read
+    content = encoded(large_document(200, ctin_last=True))
+    source = io.BytesIO(content)
+    with pytest.raises(Gstr2bLimitError):
+        parse_gstr2b(source, max_records=10)
+    assert source.tell() < len(content) // 4
+
+    tenant_id = f"g2b-{uuid.uuid4().hex[:6]}"
+    monkeypatch.setitem(gstr2b_api.GSTR2B_RECORD_LIMITS, "BASIC", 2)
+    response = client.post(
+        "/gstr2b/upload", files={"file": ("2b.json", encoded(portal_document()), "application/json")},
+        headers={"X-Tenant-ID": tenant_id, "X-Plan": "BASIC"}
+    )
+    assert response.status_code == 413
+    assert dict.get(TENANT_GSTR2B, tenant_id) is None
+
+def test_large_portal_downloads_fit_every_plan():
+    # Far past the CSV upload limits (PLAN_LIMITS): GSTR-2B has its own, per plan
+    content = encoded(large_document(20_000))
+    response = client.post(
+        "/gstr2b/upload", files={"file": ("2b.json", content, "application/json")},
+        headers={"X-Tenant-ID": f"g2b-{uuid.uuid4().hex[:6]}", "X-Plan": "BASIC"}
+    )
+    assert response.status_code == 200
+    assert response.json()["total_records"] == 20_000
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import asyncio
+from app.core.ai import ExplanationService
+from app.core.prewarm import prewarm
+from app.schemas.explanation import ExplainRequest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy optional dependencies that must not load on `import app.main`
+LAZY_MODULES = ("reportlab", "openai", "jinja2")
+# Generous ceiling for the whole app import; the profile is printed for inspection
+IMPORT_BUDGET_SECONDS = 3.0
+
+def import_profile(module: str = "app.main"):
+    """(cumulative_seconds, {top-level package: cumulative_us}) from `python -X importtime`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    packages = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.strip()
+        packages[name.split(".")[0]] = max(packages.get(name.split(".")[0], 0), int(cumulative))
+        if name == module:
+            total = int(cumulative) / 1e6
+    return total, packages
+
+def test_app_import_skips_heavy_dependencies():
+    total, packages = import_profile()
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:10]
+    print(f"import app.main: {total:.3f}s; slowest packages: {[(n, round(us / 1e6, 3)) for n, us in slowest]}")
+
+    assert not [m for m in LAZY_MODULES if m in packages]
+    assert total < IMPORT_BUDGET_SECONDS
+
+def test_prewarm_loads_lazy_dependencies():
+    timings = prewarm()
+    assert set(timings) == {"reportlab", "openai", "templates"}
+    assert "reportlab" in sys.modules
+
+def test_client_factory_runs_once_on_first_use():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return None
+
+    service = ExplanationService(client_factory=factory)
+    request = ExplainRequest(invoice_number="INV-1", gstin="29ABCDE1234F1Z5", status="RISKY_ITC", factual_diffs={})
+    asyncio.run(service.explain(request, "t1"))
+    asyncio.run(service.explain(request, "t1"))
+    assert calls == [1]
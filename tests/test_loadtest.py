@@ -0,0 +1,39 @@
+from benchmarks.loadtest import Options, Recorder, classify, interference, percentile, run_scenario
+from app.main import app
+import asyncio
+import httpx
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([0.2], 95) == 0.2
+    assert percentile([], 95) == 0.0
+
+def test_errors_are_classified():
+    request = httpx.Request("GET", "http://test/")
+    assert classify(httpx.Response(200)) == "ok"
+    assert classify(httpx.Response(429)) == "rate_limited"
+    assert classify(httpx.Response(503)) == "http_5xx:503"
+    assert classify(error=httpx.ReadTimeout("slow", request=request)) == "timeout"
+    assert classify(error=httpx.ConnectError("refused", request=request)) == "connect_error"
+
+def test_interference_compares_shared_endpoints():
+    recorder = Recorder()
+    for phase, seconds in (("quiet", 0.01), ("noisy", 0.04)):
+        recorder.phase = phase
+        for _ in range(10):
+            recorder.record("GET /health", seconds, "ok")
+    recorder.record("GET /reports/gst-risk/pdf", 1.0, "http_5xx:500")
+    summary = recorder.summary()
+    assert summary["noisy"]["GET /reports/gst-risk/pdf"]["errors"] == {"http_5xx:500": 1}
+    assert interference(summary, "quiet", "noisy")["GET /health"]["inflation"] == 4.0
+
+def test_month_end_scenario_runs_in_process():
+    options = Options(tenants=2, rows=20, vendors=3, duration=0.3, think_ms=10)
+    report = asyncio.run(run_scenario("month_end", "http://testserver", options, transport=httpx.ASGITransport(app=app)))
+    upload = report["phases"]["upload"]
+    assert upload["POST /invoices/upload"]["ok"] == 2
+    assert upload["POST /onboarding/setup"]["ok"] == 2
+    assert report["phases"]["reports"]["canary GET /health"]["ok"] > 0
+    assert all(entry["error_rate"] == 0 for entry in report["phases"]["reports"].values())
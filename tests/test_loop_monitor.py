@@ -0,0 +1,81 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import loop_monitor
+from app.core.config import settings
+from app.core.loop_monitor import monitor, tenant_fingerprint
+import asyncio
+import time
+import uuid
+
+def blocking_handler():
+    time.sleep(0.25)
+
+def test_slow_callback_is_attributed_to_request_with_stack(monkeypatch):
+    monkeypatch.setattr(monitor, "slow_callback_seconds", 0.1)
+    monkeypatch.setattr(monitor, "sample_seconds", 0.02)
+
+    async def scenario():
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            scope = {"type": "http", "method": "GET", "path": "/reports/gst-risk/pdf"}
+            token = loop_monitor.bind_request(scope, "tenant-secret")
+            try:
+                async def endpoint():
+                    blocking_handler()
+                await asyncio.create_task(endpoint())
+            finally:
+                loop_monitor.unbind_request(token)
+            await asyncio.sleep(0.05)
+        finally:
+            monitor.stop()
+
+    asyncio.run(scenario())
+    stall = monitor.snapshot()["slow_callbacks"][0]
+    assert stall["duration_ms"] >= 200
+    assert stall["path"] == "/reports/gst-risk/pdf"
+    assert stall["tenant"] == tenant_fingerprint("tenant-secret")
+    assert "tenant-secret" not in str(stall)
+    # Captured by the watchdog while the loop was still blocked
+    assert any("blocking_handler" in line for line in stall["stack"])
+    # The sampler woke up late while the loop was blocked
+    assert max(monitor.lags) >= 0.15
+
+def test_stalls_surface_in_metrics_and_debug_endpoint(monkeypatch):
+    # Zero threshold: every callback counts, so the upload's own steps are recorded
+    monkeypatch.setattr(monitor, "slow_callback_seconds", 0.0)
+    monkeypatch.setattr(settings, "DEBUG_ENDPOINTS_ENABLED", True)
+    tenant_id = f"loop-{uuid.uuid4().hex[:6]}"
+    csv_content = "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date\nL-1,27AAAAA0000A1Z5,100.00,0,9,9,2024-01-01"
+    with TestClient(app) as client:
+        assert monitor.running
+        client.post("/invoices/upload", files={"file": ("l.csv", csv_content, "text/csv")}, headers={"X-Tenant-ID": tenant_id})
+        status = client.get("/debug/event-loop", headers={"X-Tenant-ID": tenant_id}).json()
+        metrics = client.get("/metrics").text
+    assert not monitor.running
+
+    upload_stalls = [s for s in status["slow_callbacks"] if s["route"] == "/invoices/upload"]
+    assert upload_stalls and upload_stalls[0]["tenant"] == tenant_fingerprint(tenant_id)
+    assert upload_stalls[0]["trace_id"]
+    assert 'gst_event_loop_slow_callbacks_total{route="/invoices/upload"}' in metrics
+
+def test_debug_endpoint_is_off_by_default_and_never_public():
+    client = TestClient(app)
+    assert client.get("/debug/event-loop").status_code == 400
+    assert client.get("/debug/event-loop", headers={"X-Tenant-ID": "loop-t"}).status_code == 404
+
+def test_callback_hook_is_installed_only_while_running():
+    original = asyncio.Handle._run
+
+    async def scenario():
+        monitor.start()
+        monitor.start()
+        assert asyncio.Handle._run is loop_monitor._timed_run
+        # Installing twice never wraps the wrapper
+        loop_monitor._install_hook()
+        assert loop_monitor._original_run is original
+        monitor.stop()
+
+    asyncio.run(scenario())
+    assert asyncio.Handle._run is original
+    assert loop_monitor._original_run is None
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.metrics import Histogram, Counter, UPLOAD_STAGE_SECONDS
+import threading
+import uuid
+
+client = TestClient(app)
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("test_seconds", "Test histogram.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        h.observe(value, stage="a")
+    text = h.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 3' in text
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 4' in text
+    assert 'test_seconds_count{stage="a"} 4' in text
+    assert 'test_seconds_sum{stage="a"} 6.05' in text
+
+def test_counter_is_consistent_under_threads():
+    c = Counter("test_total", "Test counter.")
+
+    def work():
+        for _ in range(10000):
+            c.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c.value() == 40000
+
+def test_metrics_endpoint_is_public_and_covers_hot_paths():
+    tenant_id = f"metrics-{uuid.uuid4().hex[:6]}"
+    csv_content = "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date\nM-1,27AAAAA0000A1Z5,100.00,0,9,9,2024-01-01"
+    before = UPLOAD_STAGE_SECONDS.count(stage="reconcile")
+    client.post("/invoices/upload", files={"file": ("m.csv", csv_content, "text/csv")}, headers={"X-Tenant-ID": tenant_id})
+    client.get("/reports/gst-risk", headers={"X-Tenant-ID": tenant_id})
+    assert UPLOAD_STAGE_SECONDS.count(stage="reconcile") == before + 1
+
+    # No tenant header needed, like /health
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    for stage in ("parse", "validate", "reconcile", "explain", "index"):
+        assert f'gst_upload_stage_seconds_count{{stage="{stage}"}}' in body
+    assert "gst_report_build_seconds_count" in body
+    assert "gst_audit_save_seconds_count" in body
+    assert "gst_middleware_overhead_seconds_count" in body
+    assert 'gst_http_request_seconds_count{method="POST",route="/invoices/upload",status="200"}' in body
+    assert "# TYPE gst_resident_tenants gauge" in body
+    app_state_bytes = [line for line in body.splitlines() if line.startswith("gst_app_state_bytes ")]
+    assert int(app_state_bytes[0].split()[1]) > 0
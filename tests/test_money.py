@@ -0,0 +1,58 @@
+import pytest
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.money import to_paise, format_rupees, paise_to_rupees, paise_column, sum_paise
+from app.schemas.invoice import Invoice
+import uuid
+
+client = TestClient(app)
+
+def test_to_paise_is_exact():
+    assert to_paise("1000.00") == 100000
+    assert to_paise("0.1") == 10
+    assert to_paise("12.345") == 1235  # half-up on the sub-paisa digit
+    assert to_paise("-7.5") == -750
+    assert to_paise(0.1) == 10
+    assert to_paise(1e-05) == 0  # exponent form, rounds below half a paisa
+    assert to_paise(0.005) == 1
+    assert to_paise(1e16) == 10 ** 18
+    assert to_paise(250) == 25000
+    assert to_paise(Decimal("19.999")) == 2000
+    with pytest.raises(ValueError):
+        to_paise("1,000")
+    with pytest.raises(ValueError):
+        to_paise(float("nan"))
+
+def test_format_and_json_boundary():
+    assert format_rupees(123456) == "1234.56"
+    assert format_rupees(-5) == "-0.05"
+    assert paise_to_rupees(10) == 0.1
+
+def test_masked_column_sum():
+    column = paise_column([10, 20, 30])
+    assert sum_paise(column) == 60
+    assert sum_paise(column, [True, False, True]) == 40
+
+def test_invoice_amounts_stored_as_paise():
+    inv = Invoice(gstin="27AAAAA0000A1Z5", invoice_no="M-1", invoice_date="2024-01-01",
+                  taxable_value="100.10", cgst="9.01", sgst="9.01", igst="0")
+    assert inv.taxable_value_paise == 10010
+    assert inv.itc_paise == 1802
+
+def test_report_totals_have_no_float_drift():
+    tenant_id = f"money-{uuid.uuid4().hex[:6]}"
+    rows = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    for i in range(500):
+        rows.append(f"M-{i},27AAAAA0000A1Z5,0.10,0.01,0,0,2024-01-01")
+    files = {"file": ("drift.csv", "\n".join(rows), "text/csv")}
+    upload = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"})
+    assert upload.status_code == 200
+
+    # Naive float summation of 0.1 five hundred times is 49.999999999999...
+    assert sum([0.1] * 500) != 50.0
+
+    from app.db.memory import APP_STATE
+    amounts = APP_STATE[tenant_id]["amounts"]
+    assert sum_paise(amounts["taxable_value"]) == 5000
+    assert sum_paise(amounts["itc"]) == 500
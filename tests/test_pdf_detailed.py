@@ -0,0 +1,46 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.reports import router as reports_router
+from app.api.invoices import router as invoices_router
+from app.core.pdf_report import LazyFlowables
+import uuid
+
+# Clean app WITHOUT AuditMiddleware, as in test_pdf_iso
+app = FastAPI()
+app.include_router(invoices_router)
+app.include_router(reports_router)
+
+client = TestClient(app)
+
+def test_detailed_pdf_contains_all_pages():
+    tenant_id = f"pdf-full-{uuid.uuid4().hex[:6]}"
+    lines = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    for i in range(400):
+        lines.append(f"FULL-{i},27AAAAA000{i % 10}A1Z5,{100 + i}.50,18.09,0,0,2024-01-01")
+    files = {"file": ("full.csv", "\n".join(lines), "text/csv")}
+    client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "PRO"})
+
+    summary = client.get("/reports/gst-risk/pdf", headers={"X-Tenant-ID": tenant_id})
+    full = client.get("/reports/gst-risk/pdf", params={"detail": "full"}, headers={"X-Tenant-ID": tenant_id})
+
+    assert full.status_code == 200
+    assert full.content.startswith(b"%PDF")
+    assert int(full.headers["content-length"]) == len(full.content)
+    # 400 invoice rows + vendor table need several extra pages over the summary
+    assert full.content.count(b"/Type /Page\n") >= summary.content.count(b"/Type /Page\n") + 8
+
+def test_lazy_flowables_only_materialises_a_window():
+    pulled = []
+
+    def source():
+        for i in range(1000):
+            pulled.append(i)
+            yield i
+
+    flowables = LazyFlowables(source())
+    assert flowables[0] == 0
+    del flowables[0]
+    flowables[0:0] = ["split-rest"]
+    flowables.insert(0, "postponed")
+    assert flowables[0] == "postponed" and flowables[1] == "split-rest"
+    assert len(pulled) <= 3
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.audit import audit_repo
+from app.core.http_cache import etag_matches
+from app.core.metrics import REPORT_BUILD_SECONDS, PDF_RENDER_SECONDS
+from app.core.config import settings
+from app.api import reports as reports_module
+import uuid
+
+client = TestClient(app)
+
+CSV = "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date\nE-1,27AAAAA0000A1Z5,100.00,0,9,9,2024-01-01\n"
+
+def upload(tenant_id, content=CSV):
+    response = client.post("/invoices/upload", files={"file": ("e.csv", content, "text/csv")}, headers={"X-Tenant-ID": tenant_id})
+    assert response.status_code == 200
+
+def audit_entries(tenant_id, endpoint):
+    return [e for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == endpoint]
+
+def test_etag_matching_rules():
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('"x", W/"a-1"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
+
+def test_report_is_stable_and_revalidates_with_304():
+    tenant_id = f"etag-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+    headers = {"X-Tenant-ID": tenant_id}
+
+    first = client.get("/reports/gst-risk", headers=headers)
+    second = client.get("/reports/gst-risk", headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.content == second.content
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert "X-Tenant-ID" in first.headers["Vary"]
+
+    builds = REPORT_BUILD_SECONDS.count()
+    revalidated = client.get("/reports/gst-risk", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == first.headers["ETag"]
+    assert REPORT_BUILD_SECONDS.count() == builds
+
+    # Every request is audited once, 304s included, with the report's hash
+    entries = audit_entries(tenant_id, "/reports/gst-risk")
+    assert len(entries) == 3
+    assert len({e.output_hash for e in entries}) == 1
+
+    # New data, new version: the old ETag no longer matches
+    upload(tenant_id, CSV + "E-2,27AAAAA0000A1Z5,200.00,0,18,18,2024-01-02\n")
+    changed = client.get("/reports/gst-risk", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert changed.json()["summary"]["total_invoices"] == 2
+
+def test_pdf_revalidates_without_rendering():
+    tenant_id = f"etag-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+    headers = {"X-Tenant-ID": tenant_id}
+
+    first = client.get("/reports/gst-risk/pdf", headers=headers)
+    assert first.status_code == 200
+    assert first.headers["ETag"].startswith('W/"')
+
+    renders = PDF_RENDER_SECONDS.count(detail="summary")
+    revalidated = client.get("/reports/gst-risk/pdf", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert PDF_RENDER_SECONDS.count(detail="summary") == renders
+
+    entries = audit_entries(tenant_id, "/reports/gst-risk/pdf")
+    assert [e.action_type for e in entries] == ["PDF_DOWNLOAD", "PDF_DOWNLOAD"]
+    assert entries[0].output_hash == entries[1].output_hash
+
+    # The full report is a different representation
+    full = client.get("/reports/gst-risk/pdf", params={"detail": "full"}, headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert full.status_code == 200
+
+def test_report_is_compressed_once_across_200s_and_304s(monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_BYTES", 0)
+    calls = []
+    original = reports_module.compress
+    monkeypatch.setattr(reports_module, "compress", lambda body, encoding: calls.append(encoding) or original(body, encoding))
+    tenant_id = f"etag-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+    headers = {"X-Tenant-ID": tenant_id, "Accept-Encoding": "gzip"}
+
+    first = client.get("/reports/gst-risk", headers=headers)
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert client.get("/reports/gst-risk", headers=headers).content == first.content
+    for _ in range(3):
+        revalidated = client.get("/reports/gst-risk", headers={**headers, "If-None-Match": first.headers["ETag"]})
+        assert revalidated.status_code == 304
+    assert calls == ["gzip"]
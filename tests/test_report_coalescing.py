@@ -0,0 +1,128 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import reports
+from app.core.audit import audit_repo
+from app.core.metrics import REPORT_BUILD_SECONDS, PDF_RENDER_SECONDS
+from app.db.memory import APP_STATE
+from starlette.requests import ClientDisconnect
+import asyncio
+import httpx
+import pytest
+import tempfile
+import time
+import uuid
+
+client = TestClient(app)
+
+def upload(tenant_id, rows=60):
+    lines = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    lines += [f"C-{i},27AAAAA0000A1Z5,{100 + i}.00,0,9,9,2024-01-0{1 + i % 9}" for i in range(rows)]
+    files = {"file": ("c.csv", "\n".join(lines), "text/csv")}
+    response = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"})
+    assert response.status_code == 200
+
+def slowed(fn):
+    # Keeps the first computation in flight while the other requests arrive
+    def wrapper(*args):
+        time.sleep(0.2)
+        return fn(*args)
+    return wrapper
+
+def concurrent_gets(tenant_id, path, count, **params):
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            headers = {"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"}
+            return await asyncio.gather(*[http.get(path, params=params, headers=headers) for _ in range(count)])
+    return asyncio.run(burst())
+
+def audit_count(tenant_id, endpoint):
+    return sum(1 for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == endpoint)
+
+def test_concurrent_json_reports_share_one_build(monkeypatch):
+    monkeypatch.setattr(reports, "build_report_entry", slowed(reports.build_report_entry))
+    tenant_id = f"coalesce-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+    builds = REPORT_BUILD_SECONDS.count()
+
+    responses = concurrent_gets(tenant_id, "/reports/gst-risk", 5)
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.content for r in responses}) == 1
+    assert REPORT_BUILD_SECONDS.count() == builds + 1
+    assert audit_count(tenant_id, "/reports/gst-risk") == 5
+
+def test_concurrent_pdf_downloads_share_one_render(monkeypatch):
+    monkeypatch.setattr(reports, "render_pdf_hashed", slowed(reports.render_pdf_hashed))
+    tenant_id = f"coalesce-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+    renders = PDF_RENDER_SECONDS.count(detail="full")
+
+    responses = concurrent_gets(tenant_id, "/reports/gst-risk/pdf", 4, detail="full")
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.content.startswith(b"%PDF") for r in responses)
+    assert len({r.content for r in responses}) == 1
+    assert all(int(r.headers["Content-Length"]) == len(r.content) for r in responses)
+    assert PDF_RENDER_SECONDS.count(detail="full") == renders + 1
+    assert audit_count(tenant_id, "/reports/gst-risk/pdf") == 4
+
+    # Once settled, a later download renders afresh
+    later = client.get("/reports/gst-risk/pdf", params={"detail": "full"}, headers={"X-Tenant-ID": tenant_id})
+    assert later.status_code == 200
+    assert PDF_RENDER_SECONDS.count(detail="full") == renders + 2
+
+def test_pdf_file_is_closed_after_the_last_coalesced_download(monkeypatch):
+    rendered = []
+    def capture(*args):
+        time.sleep(0.2)
+        pdf = render_pdf_hashed(*args)
+        rendered.append(pdf)
+        return pdf
+    render_pdf_hashed = reports.render_pdf_hashed
+    monkeypatch.setattr(reports, "render_pdf_hashed", capture)
+    tenant_id = f"coalesce-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+
+    responses = concurrent_gets(tenant_id, "/reports/gst-risk/pdf", 3)
+    assert all(r.status_code == 200 and r.content.startswith(b"%PDF") for r in responses)
+    assert len(rendered) == 1 and rendered[0].file.closed
+
+def test_upload_during_a_pdf_download_does_not_relabel_it(monkeypatch):
+    tenant_id = f"coalesce-{uuid.uuid4().hex[:6]}"
+    upload(tenant_id)
+    old = dict.get(APP_STATE, tenant_id)
+    build_report_entry = reports.build_report_entry
+    def upload_meanwhile(*args):
+        upload(tenant_id, rows=61)
+        return build_report_entry(*args)
+    monkeypatch.setattr(reports, "build_report_entry", upload_meanwhile)
+
+    response = client.get("/reports/gst-risk/pdf", headers={"X-Tenant-ID": tenant_id})
+    assert response.status_code == 200
+    new = dict.get(APP_STATE, tenant_id)
+    assert new is not old
+    # The PDF is labelled with (and its hash recorded against) the dataset its report was built from
+    assert response.headers["ETag"] == reports.weak_etag(old["data_version"], "pdf-summary")
+    assert "pdf_hash:summary" in reports.report_cache(old)
+    assert "pdf_hash:summary" not in reports.report_cache(new)
+
+def test_pdf_readers_that_never_stream_still_release_the_file():
+    pdf_file = tempfile.SpooledTemporaryFile()
+    pdf_file.write(b"%PDF" + b"x" * (reports.PDF_CHUNK_BYTES + 10))
+    rendered = reports.RenderedPdf(pdf_file, pdf_file.tell(), "hash")
+    streamed, idle, disconnected = rendered.reader(), rendered.reader(), rendered.reader()
+
+    assert b"".join(streamed).startswith(b"%PDF")
+    idle.close()
+    idle.close()
+    assert not pdf_file.closed
+
+    # A client gone before the body starts: the response still closes its reader
+    async def gone(message):
+        raise OSError("client disconnected")
+    async def receive():
+        return {"type": "http.disconnect"}
+    response = reports.PdfResponse(disconnected, media_type="application/pdf")
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(response(scope, receive, gone))
+    assert pdf_file.closed
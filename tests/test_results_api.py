@@ -0,0 +1,61 @@
+from fastapi.testclient import TestClient
+from app.main import app
+import uuid
+
+client = TestClient(app)
+
+def upload_sample(tenant_id, rows=40):
+    lines = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    for i in range(rows):
+        gstin = "27AAAAA0000A1Z5" if i % 2 else "27BBBBB1111B1Z5"
+        lines.append(f"R-{i:03d},{gstin},{(i % 10) * 1000 + 500}.00,0,45,45,2024-01-{(i % 28) + 1:02d}")
+    files = {"file": ("results.csv", "\n".join(lines), "text/csv")}
+    response = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "PRO"})
+    assert response.status_code == 200
+    return response.json()["reconciliation_results"]
+
+def fetch_all(tenant_id, **params):
+    items, cursor = [], None
+    while True:
+        query = dict(params, limit=7)
+        if cursor:
+            query["cursor"] = cursor
+        page = client.get("/reconciliation/results", params=query, headers={"X-Tenant-ID": tenant_id}).json()
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return items
+
+def test_keyset_pagination_returns_every_row_once():
+    tenant_id = f"results-{uuid.uuid4().hex[:6]}"
+    uploaded = upload_sample(tenant_id)
+
+    items = fetch_all(tenant_id)
+    assert [i["invoice_number"] for i in items] == [r["invoice_number"] for r in uploaded]
+
+def test_filters_and_sorting():
+    tenant_id = f"results-{uuid.uuid4().hex[:6]}"
+    uploaded = upload_sample(tenant_id)
+
+    missing = fetch_all(tenant_id, status="MISSING_IN_2B")
+    assert {i["invoice_number"] for i in missing} == {r["invoice_number"] for r in uploaded if r["status"] == "MISSING_IN_2B"}
+
+    vendor = fetch_all(tenant_id, vendor_gstin="27AAAAA0000A1Z5", min_amount=2500, max_amount=6500, sort="amount", order="desc")
+    amounts = [i["taxable_value"] for i in vendor]
+    assert amounts == sorted(amounts, reverse=True)
+    assert all(i["gstin"] == "27AAAAA0000A1Z5" and 2500 <= i["taxable_value"] <= 6500 for i in vendor)
+    assert len(vendor) == 8
+
+    dated = fetch_all(tenant_id, date_from="2024-01-05", date_to="2024-01-10", sort="date")
+    dates = [i["invoice_date"] for i in dated]
+    assert dates == sorted(dates) and all("2024-01-05" <= d <= "2024-01-10" for d in dates)
+
+def test_invalid_cursor_and_missing_tenant_data():
+    tenant_id = f"results-{uuid.uuid4().hex[:6]}"
+    upload_sample(tenant_id, rows=3)
+
+    response = client.get("/reconciliation/results", params={"cursor": "bogus"}, headers={"X-Tenant-ID": tenant_id})
+    assert response.status_code == 400
+
+    response = client.get("/reconciliation/results", headers={"X-Tenant-ID": "no-data-tenant"})
+    assert response.status_code == 404
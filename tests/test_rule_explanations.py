@@ -0,0 +1,77 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.rule_explanations import explain_diffs
+from app.db.memory import APP_STATE
+from app.schemas.reconciliation import ReconciliationStatus
+import json
+import uuid
+
+client = TestClient(app)
+
+CSV = "\n".join([
+    "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date,source",
+    "INV-1,27AAAAA0000A1Z5,1000.00,0,90.00,90.00,2024-01-10,customer",
+    "INV-2,27AAAAA0000A1Z5,5000.00,0,450.00,450.00,2024-01-10,customer",
+    "INV-3,27BBBBB0000B1Z5,2000.00,0,180.00,180.00,2024-01-10,customer",
+    "INV-1,27AAAAA0000A1Z5,1000.00,0,90.00,90.00,2024-01-10,gstr2b",
+    "INV-2,27AAAAA0000A1Z5,5400.00,0,486.00,486.00,2024-01-10,gstr2b",
+])
+
+def upload():
+    tenant_id = f"rules-{uuid.uuid4().hex[:6]}"
+    files = {"file": ("rules.csv", CSV, "text/csv")}
+    response = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id})
+    assert response.status_code == 200
+    return tenant_id, response.json()["reconciliation_results"]
+
+def test_mismatches_get_precomputed_explanations_at_ingestion():
+    tenant_id, results = upload()
+    # Stored beside the results: the upload response keeps its shape
+    assert not any("precomputed" in r for r in results)
+    stored = APP_STATE[tenant_id]
+    by_number = {r["invoice_number"]: p for r, p in zip(stored["reconciliation"], stored["precomputed"])}
+
+    assert by_number["INV-1"] is None
+    partial = by_number["INV-2"]
+    assert partial["root_cause"] == "Data Entry Error"
+    assert "Taxable value differs (customer Rs. 5000.00 vs GSTR-2B Rs. 5400.00)" in partial["explanation"]
+    assert partial["factual_diffs"]["taxable_value"]["delta"] == -400.0
+
+    missing = by_number["INV-3"]
+    assert missing["root_cause"] == "Vendor Non-Compliance"
+    assert missing["factual_diffs"]["in_gstr2b"] is False
+
+def test_explain_answers_from_precomputed_without_llm():
+    tenant_id, _ = upload()
+    payload = {"invoice_number": "INV-2", "gstin": "27AAAAA0000A1Z5", "status": "PARTIAL_MATCH", "factual_diffs": {}}
+    data = client.post("/explain-mismatch", json=payload, headers={"X-Tenant-ID": tenant_id}).json()
+    assert data["source"] == "rules"
+    assert data["root_cause"] == "Data Entry Error"
+    assert data["original_status"] == "PARTIAL_MATCH"
+
+    # Explicit escalation goes to the AI service (fallback here, no provider configured)
+    data = client.post("/explain-mismatch", json=payload, params={"narrative": "true"},
+                       headers={"X-Tenant-ID": tenant_id}).json()
+    assert data["source"] == "fallback"
+    assert data["original_status"] == "PARTIAL_MATCH"
+
+def test_explain_templates_ad_hoc_requests_and_keeps_status():
+    payload = {"invoice_number": "UNKNOWN", "gstin": "29ABCDE1234F1Z5", "status": "PARTIAL_MATCH",
+               "factual_diffs": {"invoice_date": {"customer": "2024-01-01", "gstr2b": "2024-01-04", "delta_days": -3}}}
+    data = client.post("/explain-mismatch", json=payload, headers={"X-Tenant-ID": "rules-ad-hoc"}).json()
+    assert data["root_cause"] == "Timing Issue"
+    assert "3 day(s)" in data["explanation"]
+
+def test_batch_defaults_to_precomputed_explanations():
+    tenant_id, _ = upload()
+    items = [{"invoice_number": n, "gstin": g, "status": s, "factual_diffs": {}}
+             for n, g, s in [("INV-2", "27AAAAA0000A1Z5", "PARTIAL_MATCH"), ("INV-3", "27BBBBB0000B1Z5", "MISSING_IN_2B")]]
+    response = client.post("/explain-mismatch/batch", json={"items": items}, headers={"X-Tenant-ID": tenant_id})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["source"] for line in lines] == ["rules", "rules"]
+    assert [line["root_cause"] for line in lines] == ["Data Entry Error", "Vendor Non-Compliance"]
+
+def test_place_of_supply_root_cause():
+    diffs = {"igst": {"customer": 180.0, "gstr2b": 0.0, "delta": 180.0},
+             "cgst": {"customer": 0.0, "gstr2b": 90.0, "delta": -90.0}}
+    assert explain_diffs(ReconciliationStatus.PARTIAL_MATCH, diffs)["root_cause"] == "Place of Supply Mismatch"
@@ -0,0 +1,95 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.scheduler import WorkScheduler, SCHEDULER_WAIT_SECONDS
+from app.core.tracing import span, current_trace_id
+import asyncio
+import pytest
+import threading
+import uuid
+
+client = TestClient(app)
+
+async def run_gated(scheduler, submissions):
+    """Hold the only worker while `submissions` queue up, then record their run order."""
+    gate = threading.Event()
+    order = []
+    blocker = asyncio.ensure_future(scheduler.run("upload", gate.wait, tenant_id="gate"))
+    while not scheduler.running["upload"]:
+        await asyncio.sleep(0.001)
+    jobs = [
+        asyncio.ensure_future(scheduler.run(queue, order.append, label, tenant_id=tenant, plan=plan, cost=cost))
+        for label, queue, tenant, plan, cost in submissions
+    ]
+    await asyncio.sleep(0.01)
+    gate.set()
+    await asyncio.gather(blocker, *jobs)
+    return order
+
+def test_small_job_overtakes_bulk_import():
+    bulk = [(f"enterprise-{i}", "upload", "ent", "ENTERPRISE", 1000) for i in range(5)]
+    order = asyncio.run(run_gated(WorkScheduler(1), bulk + [("basic", "upload", "basic", "BASIC", 100)]))
+    assert order[0] == "basic"
+    assert order[1:] == [f"enterprise-{i}" for i in range(5)]
+
+def test_tenants_share_workers_fairly_across_queues():
+    flood = [(f"a-{i}", "pdf", "a", "PRO", 10) for i in range(10)]
+    late = [("b-0", "explain", "b", "PRO", 10), ("b-1", "upload", "b", "PRO", 10)]
+    order = asyncio.run(run_gated(WorkScheduler(1), flood + late))
+    # b's jobs interleave with a's instead of waiting for all ten
+    assert order.index("b-0") <= 1
+    assert order.index("b-1") <= 3
+
+def test_results_exceptions_and_context_propagate():
+    scheduler = WorkScheduler(2)
+
+    def fail():
+        raise ValueError("bad row")
+
+    async def scenario():
+        with span("parent"):
+            trace_id = current_trace_id()
+            seen = await scheduler.run("upload", current_trace_id, tenant_id="t")
+        assert seen == trace_id
+        assert await scheduler.run("pdf", sum, [1, 2, 3], tenant_id="t") == 6
+        with pytest.raises(ValueError):
+            await scheduler.run("pdf", fail, tenant_id="t")
+
+    asyncio.run(scenario())
+    snapshot = scheduler.snapshot()
+    assert snapshot["running"] == {"upload": 0, "pdf": 0}
+    assert all(count == 0 for count in snapshot["queued"].values())
+
+def test_cancelled_job_never_runs():
+    scheduler = WorkScheduler(1)
+    ran = []
+
+    async def scenario():
+        gate = threading.Event()
+        blocker = asyncio.ensure_future(scheduler.run("upload", gate.wait, tenant_id="gate"))
+        while not scheduler.running["upload"]:
+            await asyncio.sleep(0.001)
+        job = asyncio.ensure_future(scheduler.run("upload", ran.append, "x", tenant_id="t"))
+        await asyncio.sleep(0.01)
+        job.cancel()
+        gate.set()
+        await blocker
+        await scheduler.run("upload", ran.append, "y", tenant_id="t")
+
+    asyncio.run(scenario())
+    assert ran == ["y"]
+
+def test_upload_runs_through_scheduler():
+    before = SCHEDULER_WAIT_SECONDS.count(queue="upload")
+    csv = "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date\nW-1,27AAAAA0000A1Z5,100.00,0,9,9,2024-01-01\n"
+    response = client.post(
+        "/invoices/upload", files={"file": ("w.csv", csv, "text/csv")},
+        headers={"X-Tenant-ID": f"sched-{uuid.uuid4().hex[:6]}", "X-Plan": "PRO"}
+    )
+    assert response.status_code == 200
+    assert SCHEDULER_WAIT_SECONDS.count(queue="upload") == before + 1
+
+    bad = client.post(
+        "/invoices/upload", files={"file": ("w.csv", b"\xff\xfe", "text/csv")},
+        headers={"X-Tenant-ID": f"sched-{uuid.uuid4().hex[:6]}"}
+    )
+    assert bad.status_code == 400
@@ -0,0 +1,181 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import snapshots as snapshot_module
+from app.core.snapshots import SnapshotManager, read_snapshot, snapshot_filename, tenant_dataset, write_snapshot
+from app.db.memory import APP_STATE
+from benchmarks.generators import synthetic_tenant
+import asyncio
+import os
+import pytest
+import threading
+import uuid
+
+client = TestClient(app)
+
+CSV = "\n".join(
+    ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date,source"]
+    + [f"S-{i},27AAAAA0000A1Z5,{100 + i * 997}.25,0,9,9,2024-01-0{1 + i % 9},customer" for i in range(30)]
+    + [f"S-{i},27AAAAA0000A1Z5,{100 + i * 997}.25,0,9,9,2024-01-0{1 + i % 9},gstr2b" for i in range(0, 30, 3)]
+    + ["S-1,27AAAAA0000A1Z5,105.00,0,9,9,2024-01-02,gstr2b"]
+)
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SnapshotManager(str(tmp_path), interval=3600)
+    manager.start()
+    yield manager
+    manager.stop()
+
+def upload(tenant_id):
+    files = {"file": ("snap.csv", CSV, "text/csv")}
+    response = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "ENTERPRISE"})
+    assert response.status_code == 200
+    return response.json()
+
+def outputs(tenant_id):
+    headers = {"X-Tenant-ID": tenant_id}
+    report = client.get("/reports/gst-risk", headers=headers).json()
+    # Per-request audit fields
+    report["audit"].pop("generated_at")
+    report["audit"].pop("report_id")
+    results = client.get("/reconciliation/results", headers=headers, params={"limit": 500}).json()
+    export = client.get("/reports/gst-risk/export", headers=headers)
+    assert export.status_code == 200
+    return report, results, export.content
+
+def test_dataset_round_trip(tmp_path):
+    data = synthetic_tenant(300, vendors=40)
+    data["data_version"] = "v" * 64
+    data["plan"] = "PRO"
+    path = str(tmp_path / "t.gstsnap")
+    write_snapshot(path, data)
+    restored = read_snapshot(path)
+
+    assert restored["invoices"] == data["invoices"]
+    assert restored["gstr2b"] == data["gstr2b"]
+    assert restored["reconciliation"] == data["reconciliation"]
+    assert [list(r) for r in restored["reconciliation"]] == [list(r) for r in data["reconciliation"]]
+    assert restored["precomputed"] == data["precomputed"] and any(data["precomputed"])
+    assert restored["vendor_summary"] == data["vendor_summary"]
+    assert restored["amounts"] == data["amounts"]
+    assert bytes(restored["index"].status_codes) == bytes(data["index"].status_codes)
+    assert restored["data_version"] == data["data_version"] and restored["plan"] == "PRO"
+
+def test_upload_is_snapshotted_and_lazily_restored(manager):
+    tenant_id = f"snap-{uuid.uuid4().hex[:6]}"
+    uploaded = upload(tenant_id)
+    before = outputs(tenant_id)
+    manager.stop()
+
+    path = manager.path(tenant_id)
+    assert os.path.exists(path)
+    assert tenant_id not in open(path, "rb").read().decode("latin-1")
+    # Atomic writes leave no temporary files behind
+    names = os.listdir(manager.directory)
+    assert snapshot_filename(tenant_id) in names
+    assert not [name for name in names if name.endswith(".tmp")]
+
+    # Restart: nothing resident, nothing loaded until the tenant is looked up
+    dict.pop(APP_STATE, tenant_id)
+    manager.start()
+    assert not dict.__contains__(APP_STATE, tenant_id)
+    after = outputs(tenant_id)
+    assert dict.__contains__(APP_STATE, tenant_id)
+    assert after == before
+    assert APP_STATE[tenant_id]["data_version"] == uploaded["data_version"]
+
+    # The restored dataset still deduplicates a repeat upload
+    assert upload(tenant_id)["deduplicated"]
+
+def test_periodic_pass_writes_changed_datasets_only(manager):
+    tenant_id = f"snap-{uuid.uuid4().hex[:6]}"
+    APP_STATE[tenant_id] = synthetic_tenant(50, vendors=5)
+    assert manager._changed_tenants().count(tenant_id) == 1
+    assert manager.write(tenant_id)
+    assert tenant_id not in manager._changed_tenants()
+    dict.pop(APP_STATE, tenant_id)
+
+def test_unusable_snapshots_are_ignored(manager, monkeypatch):
+    failures = snapshot_module.SNAPSHOT_FAILURES_TOTAL.value(operation="load")
+
+    corrupt = f"snap-{uuid.uuid4().hex[:6]}"
+    APP_STATE[corrupt] = synthetic_tenant(50, vendors=5)
+    assert manager.write(corrupt)
+    dict.pop(APP_STATE, corrupt)
+    with open(manager.path(corrupt), "r+b") as f:
+        f.seek(-16, os.SEEK_END)
+        f.write(b"\xff" * 8)
+    assert asyncio.run(tenant_dataset(corrupt)) is None
+
+    stale = f"snap-{uuid.uuid4().hex[:6]}"
+    monkeypatch.setattr(snapshot_module, "ENGINE_VERSION", "0.9.0")
+    APP_STATE[stale] = synthetic_tenant(50, vendors=5)
+    assert manager.write(stale)
+    dict.pop(APP_STATE, stale)
+    monkeypatch.undo()
+    assert asyncio.run(tenant_dataset(stale)) is None
+    # Remembered as unusable: later requests do not read the file again
+    assert client.get("/reports/gst-risk", headers={"X-Tenant-ID": stale}).status_code == 404
+
+    assert snapshot_module.SNAPSHOT_FAILURES_TOTAL.value(operation="load") == failures + 2
+
+def test_restore_runs_on_a_scheduler_worker(manager, monkeypatch):
+    tenant_id = f"snap-{uuid.uuid4().hex[:6]}"
+    APP_STATE[tenant_id] = synthetic_tenant(50, vendors=5)
+    assert manager.write(tenant_id)
+    dict.pop(APP_STATE, tenant_id)
+
+    # Plain lookups never reach the disk
+    assert APP_STATE.get(tenant_id) is None and tenant_id not in APP_STATE
+
+    threads = []
+    load = manager.load
+    def recording_load(tenant):
+        threads.append(threading.current_thread().name)
+        return load(tenant)
+    monkeypatch.setattr(manager, "load", recording_load)
+
+    async def first_requests():
+        return await asyncio.gather(*[tenant_dataset(tenant_id) for _ in range(3)])
+
+    restored = asyncio.run(first_requests())
+    assert restored[0] is not None and all(data is restored[0] for data in restored)
+    # Concurrent first requests share one restore, off the event loop
+    assert len(threads) == 1 and threads[0].startswith("scheduler-worker-")
+    assert dict.get(APP_STATE, tenant_id) is restored[0]
+    dict.pop(APP_STATE, tenant_id)
+
+def test_missing_snapshots_are_looked_up_once_per_upload(manager, monkeypatch):
+    tenant_id = f"snap-{uuid.uuid4().hex[:6]}"
+    lookups = []
+    exists = os.path.exists
+    monkeypatch.setattr(snapshot_module.os.path, "exists", lambda path: lookups.append(path) or exists(path))
+
+    for _ in range(3):
+        assert asyncio.run(tenant_dataset(tenant_id)) is None
+    assert len(lookups) == 1
+    assert manager.known_absent(tenant_id)
+
+    # An upload forgets the miss; the dataset is resident anyway
+    upload(tenant_id)
+    assert not manager.known_absent(tenant_id)
+    manager.stop()
+    dict.pop(APP_STATE, tenant_id)
+    manager.start()
+    assert asyncio.run(tenant_dataset(tenant_id)) is not None
+    dict.pop(APP_STATE, tenant_id)
+
+def test_failed_writes_are_retried(manager, monkeypatch):
+    tenant_id = f"snap-{uuid.uuid4().hex[:6]}"
+    APP_STATE[tenant_id] = synthetic_tenant(50, vendors=5)
+
+    def full_disk(path, tenant_data):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(snapshot_module, "write_snapshot", full_disk)
+    assert not manager.write(tenant_id)
+    assert tenant_id in manager._changed_tenants()
+
+    monkeypatch.undo()
+    assert manager.write(tenant_id)
+    assert tenant_id not in manager._changed_tenants()
+    dict.pop(APP_STATE, tenant_id)
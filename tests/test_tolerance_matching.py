@@ -0,0 +1,85 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.invoice import Invoice
+from app.schemas.reconciliation import MatchTolerance, ReconciliationStatus
+from app.core.matching import Gstr2bIndex
+from app.core.reconciliation import reconcile_invoice
+import uuid
+
+client = TestClient(app)
+
+def make_invoice(number, value, tax=90.0, date="2024-01-10", gstin="27AAAAA0000A1Z5", source="customer"):
+    return Invoice(
+        gstin=gstin, invoice_no=number, invoice_date=date,
+        taxable_value=value, cgst=tax, sgst=tax, igst=0, source=source
+    )
+
+def test_exact_match_has_no_deltas():
+    index = Gstr2bIndex([make_invoice("INV-1", 1000.0, source="gstr2b")])
+    result = reconcile_invoice(make_invoice("INV-1", 1000.0), 0, index, MatchTolerance())
+
+    assert result["status"] == ReconciliationStatus.MATCHED
+    assert result["diffs"] == {"gstr2b_invoice_number": "INV-1"}
+
+def test_within_tolerance_reports_precise_deltas():
+    index = Gstr2bIndex([make_invoice("INV-1", 1000.5, tax=90.25, date="2024-01-12", source="gstr2b")])
+    tolerance = MatchTolerance(taxable_value_abs=1.0, tax_abs=0.5, date_window_days=3)
+    result = reconcile_invoice(make_invoice("INV-1", 1000.0), 0, index, tolerance)
+
+    assert result["status"] == ReconciliationStatus.MATCHED
+    assert result["diffs"]["taxable_value"] == {"customer": 1000.0, "gstr2b": 1000.5, "delta": -0.5}
+    assert result["diffs"]["cgst"]["delta"] == -0.25
+    assert result["diffs"]["invoice_date"]["delta_days"] == -2
+
+def test_percentage_tolerance_and_date_window():
+    index = Gstr2bIndex([make_invoice("X-9", 1010.0, date="2024-01-20", source="gstr2b")])
+
+    strict = reconcile_invoice(make_invoice("INV-1", 1000.0), 1, index, MatchTolerance(taxable_value_pct=2.0))
+    assert strict["status"] == ReconciliationStatus.MISSING_IN_2B
+
+    index = Gstr2bIndex([make_invoice("X-9", 1010.0, date="2024-01-20", source="gstr2b")])
+    loose = reconcile_invoice(make_invoice("INV-1", 1000.0), 1, index, MatchTolerance(taxable_value_pct=2.0, date_window_days=10))
+    assert loose["status"] == ReconciliationStatus.MATCHED
+    assert loose["diffs"]["invoice_number"] == {"customer": "INV-1", "gstr2b": "X-9"}
+
+def test_same_number_beyond_tolerance_is_partial():
+    index = Gstr2bIndex([make_invoice("INV-1", 1200.0, source="gstr2b")])
+    result = reconcile_invoice(make_invoice("INV-1", 1000.0), 0, index, MatchTolerance())
+
+    assert result["status"] == ReconciliationStatus.PARTIAL_MATCH
+    assert result["diffs"]["taxable_value"]["delta"] == -200.0
+
+def test_matching_is_deterministic_and_one_to_one():
+    records = [make_invoice("B", 1000.0, source="gstr2b"), make_invoice("A", 1000.0, source="gstr2b")]
+    customers = [make_invoice("C-1", 1000.0), make_invoice("C-2", 1000.0), make_invoice("C-3", 1000.0)]
+
+    runs = []
+    for _ in range(2):
+        index = Gstr2bIndex(records)
+        runs.append([reconcile_invoice(inv, i + 1, index, MatchTolerance()) for i, inv in enumerate(customers)])
+
+    assert runs[0] == runs[1]
+    assert [r["diffs"].get("gstr2b_invoice_number") for r in runs[0]] == ["A", "B", None]
+    assert runs[0][2]["status"] == ReconciliationStatus.MISSING_IN_2B
+
+def test_upload_uses_tenant_tolerance():
+    tenant_id = f"tol-{uuid.uuid4().hex[:6]}"
+    headers = {"X-Tenant-ID": tenant_id}
+
+    response = client.put("/settings/tolerance", json={"taxable_value_abs": 5.0, "tax_abs": 1.0}, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/settings/tolerance", headers=headers).json()["taxable_value_abs"] == 5.0
+
+    csv_content = (
+        "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date,source\n"
+        "INV-1,27AAAAA0000A1Z5,1000.00,0,90,90,2024-01-01,customer\n"
+        "INV-1,27AAAAA0000A1Z5,1003.00,0,90,90,2024-01-01,gstr2b\n"
+    )
+    files = {"file": ("tol.csv", csv_content, "text/csv")}
+    upload = client.post("/invoices/upload", files=files, headers=headers)
+    assert upload.status_code == 200
+
+    data = upload.json()
+    assert data["total_invoices"] == 1
+    assert data["reconciliation_results"][0]["status"] == "MATCHED"
+    assert data["reconciliation_results"][0]["diffs"]["taxable_value"]["delta"] == -3.0
@@ -0,0 +1,83 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import tracing
+from app.core.tracing import span, FileSpanExporter, InMemorySpanExporter
+from app.core.audit import audit_repo
+import json
+import pytest
+import uuid
+
+client = TestClient(app)
+
+CSV = "invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date\nT-1,27AAAAA0000A1Z5,100.00,0,9,9,2024-01-01"
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = InMemorySpanExporter()
+    monkeypatch.setattr(tracing.processor, "exporter", exporter)
+    return exporter
+
+def spans_for(exporter, trace_id):
+    assert tracing.processor.flush()
+    return {s.name: s for s in exporter.spans if s.trace_id == trace_id}
+
+def test_upload_produces_one_nested_trace(exported):
+    tenant_id = f"trace-{uuid.uuid4().hex[:6]}"
+    response = client.post("/invoices/upload", files={"file": ("t.csv", CSV, "text/csv")}, headers={"X-Tenant-ID": tenant_id})
+    assert response.status_code == 200
+    trace_id = response.headers["X-Trace-ID"]
+
+    spans = spans_for(exported, trace_id)
+    root = spans["HTTP POST /invoices/upload"]
+    assert root.parent_span_id is None
+    assert root.attributes["http.status_code"] == 200
+    for name in ("audit.hash_request_body", "response.encode", "upload.decode", "upload.parse",
+                 "upload.validate", "upload.reconcile", "upload.explain", "upload.index"):
+        assert spans[name].parent_span_id == root.span_id
+        assert spans[name].start_ns >= root.start_ns and spans[name].end_ns <= root.end_ns
+
+    # The audit entry written for the request is linked to the same trace
+    entry = [e for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == "/invoices/upload"][-1]
+    assert entry.trace_id == trace_id
+
+def test_report_spans_and_incoming_traceparent(exported):
+    tenant_id = f"trace-{uuid.uuid4().hex[:6]}"
+    client.post("/invoices/upload", files={"file": ("t.csv", CSV, "text/csv")}, headers={"X-Tenant-ID": tenant_id})
+
+    remote_trace, remote_span = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    response = client.get("/reports/gst-risk/pdf", headers={
+        "X-Tenant-ID": tenant_id, "traceparent": f"00-{remote_trace}-{remote_span}-01"
+    })
+    assert response.status_code == 200
+    assert response.headers["X-Trace-ID"] == remote_trace
+
+    spans = spans_for(exported, remote_trace)
+    root = spans["HTTP GET /reports/gst-risk/pdf"]
+    assert root.parent_span_id == remote_span
+    assert spans["report.build"].parent_span_id == root.span_id
+    # Rendered in the threadpool; the span context follows it there
+    assert spans["report.render_pdf"].parent_span_id == root.span_id
+
+def test_errors_are_recorded_on_the_span(exported):
+    with pytest.raises(ValueError):
+        with span("failing") as s:
+            raise ValueError("boom")
+    assert tracing.processor.flush()
+    assert s.status == tracing.STATUS_ERROR
+    assert s.status_message == "ValueError: boom"
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    with span("outer", **{"rows": 3}) as outer:
+        with span("inner") as inner:
+            pass
+    FileSpanExporter(str(path)).export([inner, outer])
+
+    payload = json.loads(path.read_text().splitlines()[0])
+    resource_spans = payload["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": "gst-agent"}}
+    exported_inner, exported_outer = resource_spans["scopeSpans"][0]["spans"]
+    assert exported_inner["parentSpanId"] == exported_outer["spanId"]
+    assert exported_inner["traceId"] == exported_outer["traceId"] == outer.trace_id
+    assert exported_outer["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
+    assert int(exported_outer["endTimeUnixNano"]) >= int(exported_outer["startTimeUnixNano"])
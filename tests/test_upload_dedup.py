@@ -0,0 +1,104 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.audit import audit_repo
+from app.core.metrics import UPLOAD_STAGE_SECONDS
+from app.core.singleflight import SingleFlight
+import asyncio
+import httpx
+import uuid
+
+client = TestClient(app)
+
+CSV = "\n".join(
+    ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    + [f"D-{i},27AAAAA0000A1Z5,{100 + i}.00,0,9,9,2024-01-0{1 + i % 9}" for i in range(20)]
+)
+
+def upload(tenant_id, content=CSV, plan="PRO"):
+    files = {"file": ("dup.csv", content, "text/csv")}
+    response = client.post("/invoices/upload", files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": plan})
+    assert response.status_code == 200
+    return response.json()
+
+def test_repeat_upload_skips_ingestion_but_is_audited():
+    tenant_id = f"dedup-{uuid.uuid4().hex[:6]}"
+    first = upload(tenant_id)
+    parses = UPLOAD_STAGE_SECONDS.count(stage="parse")
+
+    second = upload(tenant_id)
+    assert UPLOAD_STAGE_SECONDS.count(stage="parse") == parses
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert second["data_version"] == first["data_version"]
+    assert second["reconciliation_results"] == first["reconciliation_results"]
+    assert second["vendor_summary"] == first["vendor_summary"]
+
+    entries = [e for e in audit_repo.get_all() if e.tenant_id == tenant_id and e.endpoint == "/invoices/upload"]
+    assert len(entries) == 2
+    assert all(e.status.value == "SUCCESS" and e.input_hash and e.output_hash for e in entries)
+
+def test_changed_content_or_plan_is_ingested_again():
+    tenant_id = f"dedup-{uuid.uuid4().hex[:6]}"
+    first = upload(tenant_id)
+    other_plan = upload(tenant_id, plan="ENTERPRISE")
+    assert not other_plan["deduplicated"]
+    assert other_plan["data_version"] != first["data_version"]
+
+    changed = upload(tenant_id, content=CSV + "\nD-99,27AAAAA0000A1Z5,5.00,0,1,1,2024-01-09")
+    assert not changed["deduplicated"] and changed["total_invoices"] == 21
+
+def test_concurrent_duplicates_share_one_ingestion():
+    tenant_id = f"dedup-{uuid.uuid4().hex[:6]}"
+    # Admission follows the recorded plan: a PRO dataset allows four concurrent uploads
+    upload(tenant_id, CSV.replace("D-1,", "X-1,"))
+    parses = UPLOAD_STAGE_SECONDS.count(stage="parse")
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            return await asyncio.gather(*[
+                http.post(
+                    "/invoices/upload", params={"response": "summary"},
+                    files={"file": ("dup.csv", CSV, "text/csv")},
+                    headers={"X-Tenant-ID": tenant_id, "X-Plan": "PRO"}
+                )
+                for _ in range(4)
+            ])
+
+    responses = asyncio.run(burst())
+    assert all(r.status_code == 200 for r in responses)
+    bodies = [r.json() for r in responses]
+    assert UPLOAD_STAGE_SECONDS.count(stage="parse") == parses + 1
+    assert sorted(b["deduplicated"] for b in bodies) == [False, True, True, True]
+    assert len({b["data_version"] for b in bodies}) == 1
+
+def test_single_flight_shares_results_and_errors():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(*[flight.do("k", compute) for _ in range(3)])
+        assert [r for r, _ in results] == ["done"] * 3
+        assert sorted(joined for _, joined in results) == [False, True, True]
+        assert len(calls) == 1 and flight.in_flight() == 0
+
+        # A caller that goes away does not cancel the shared computation
+        leader = asyncio.ensure_future(flight.do("c", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("c", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == ("done", True)
+
+        errors = await asyncio.gather(flight.do("e", failing), flight.do("e", failing), return_exceptions=True)
+        assert all(isinstance(e, ValueError) for e in errors)
+
+    asyncio.run(scenario())
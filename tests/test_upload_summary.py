@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+from app.main import app
+import uuid
+
+client = TestClient(app)
+
+def sample_csv(rows=30, offset=0):
+    lines = ["invoice_no,gstin,taxable_value,igst,cgst,sgst,invoice_date"]
+    for i in range(rows):
+        gstin = ["27AAAAA0000A1Z5", "27BBBBB1111B1Z5", "27CCCCC2222C1Z5"][i % 3]
+        lines.append(f"S-{i + offset:03d},{gstin},{(i % 10) * 1000 + 500}.00,0,45,45,2024-01-{(i % 28) + 1:02d}")
+    return "\n".join(lines)
+
+def upload(tenant_id, csv, mode=None, **params):
+    if mode:
+        params["response"] = mode
+    files = {"file": ("summary.csv", csv, "text/csv")}
+    return client.post("/invoices/upload", params=params, files=files, headers={"X-Tenant-ID": tenant_id, "X-Plan": "PRO"})
+
+def test_summary_matches_full_upload():
+    tenant_id = f"summary-{uuid.uuid4().hex[:6]}"
+    full = upload(tenant_id, sample_csv()).json()
+    summary_response = upload(tenant_id, sample_csv(), mode="summary")
+    assert summary_response.status_code == 200
+    summary = summary_response.json()
+
+    assert summary["response"] == "summary"
+    assert "reconciliation_results" not in summary and "vendor_summary" not in summary
+    assert summary["data_version"] == full["data_version"]
+    assert summary["total_invoices"] == 30
+    assert sum(summary["counts"].values()) == 30
+    for status, count in summary["counts"].items():
+        assert count == sum(1 for r in full["reconciliation_results"] if r["status"] == status)
+
+    report = client.get("/reports/gst-risk", headers={"X-Tenant-ID": tenant_id}).json()["summary"]
+    assert summary["counts"]["RISKY_ITC"] == report["risky_itc_count"]
+    assert summary["totals"]["taxable_value"] == report["total_taxable_value"]
+    assert summary["totals"]["itc_available"] == report["total_itc_available"]
+    assert summary["totals"]["risky_itc_amount"] == report["risky_itc_amount"]
+
+    top = summary["vendor_top"]
+    assert len(top) == summary["vendor_count"] == 3
+    assert {v["vendor_gstin"] for v in top} == {v["vendor_gstin"] for v in full["vendor_summary"]}
+    assert summary["results_url"].startswith("/reconciliation/results")
+
+def test_top_vendors_limit_and_invalid_mode():
+    tenant_id = f"summary-{uuid.uuid4().hex[:6]}"
+    summary = upload(tenant_id, sample_csv(), mode="summary", top_vendors=1).json()
+    assert len(summary["vendor_top"]) == 1 and summary["vendor_count"] == 3
+
+    assert upload(tenant_id, sample_csv(), mode="partial").status_code == 422
+
+def test_results_pinned_to_data_version():
+    tenant_id = f"summary-{uuid.uuid4().hex[:6]}"
+    summary = upload(tenant_id, sample_csv(), mode="summary").json()
+    headers = {"X-Tenant-ID": tenant_id}
+
+    page = client.get("/reconciliation/results", params={"data_version": summary["data_version"], "limit": 500}, headers=headers)
+    assert page.status_code == 200
+    assert len(page.json()["items"]) == 30
+    assert page.json()["data_version"] == summary["data_version"]
+
+    upload(tenant_id, sample_csv(offset=100), mode="summary")
+    stale = client.get("/reconciliation/results", params={"data_version": summary["data_version"]}, headers=headers)
+    assert stale.status_code == 409